@@ -6,5 +6,11 @@ set -e
 # download the Django static content and clear eventual leftover files
 python manage.py collectstatic --noinput --clear
 
+# create the database table of the cache shared by the processes (if missing)
+python manage.py createcachetable
+
 # run a TCP socket
-uwsgi --socket :8000 --master --module delfitlm.wsgi --enable-threads --processes 1 --threads 2 --harakiri 5
+# requests are killed after 5 seconds, except the frame exports which stream large downloads
+# (EXPORT_HARAKIRI seconds, 1 hour by default)
+uwsgi --socket :8000 --master --module delfitlm.wsgi --enable-threads --processes 1 --threads 2 --harakiri 5 \
+    --route "^/transmission/export/ harakiri:${EXPORT_HARAKIRI:-3600}"
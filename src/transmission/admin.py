@@ -1,9 +1,12 @@
 """Admin page for managing the database models"""
 
 from django.contrib import admin
-from .models import Downlink, Uplink, TLE, Satellite
+from .models import Downlink, Uplink, TLE, Satellite, FrameSubmission, QueuedFrame, ReprocessingShard
 
 admin.site.register(Downlink)
 admin.site.register(Uplink)
 admin.site.register(TLE)
 admin.site.register(Satellite)
+admin.site.register(FrameSubmission)
+admin.site.register(QueuedFrame)
+admin.site.register(ReprocessingShard)
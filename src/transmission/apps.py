@@ -1,4 +1,5 @@
 """Apps config file"""
+import os
 
 from django.apps import AppConfig
 
@@ -7,3 +8,17 @@ from django.apps import AppConfig
 class TransmissionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'transmission'
+
+    def ready(self):
+        # register the signals invalidating the API key cache
+        import transmission.processing.api_key_cache
+
+        # load the XTCE parsers at startup instead of when the first frame is processed
+        if os.environ.get('XTCE_WARM_UP', '0') == '1':
+            from transmission.processing.XTCEParser import warm_up_parsers
+            try:
+                # under uwsgi, load the parsers in each worker after forking
+                from uwsgidecorators import postfork
+                postfork(warm_up_parsers)
+            except ImportError:
+                warm_up_parsers()
@@ -11,6 +11,7 @@ satellites = [
 
 jobs = [
     (None, '-'),
+    ('submission_processing', 'Submission Queue Processing'),
     ('buffer_processing', 'Frame Buffer Processing'),
     ('scraper', 'Scrape'),
     ('raw_bucket_processing', 'Bucket Processing (new frames)'),
@@ -38,3 +39,4 @@ class SubmitJob(forms.Form):
         required=False
     )
     interval = forms.IntegerField(min_value=1, label="Time Interval (minutes)", required=False)
+    restart = forms.BooleanField(label="Restart reprocessing [3]", required=False)
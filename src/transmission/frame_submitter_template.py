@@ -1,5 +1,6 @@
 """Frame submitter example"""
 from datetime import datetime
+import gzip
 import json
 from typing import Union
 
@@ -30,6 +31,26 @@ def send_packet(packet: Union[list, dict], api_key: str) -> None:
         print(exception)
 
 
+def send_packets_ndjson(packets: list, api_key: str) -> None:
+    """Submits a list of packets (e.g. a whole log file) as gzip compressed newline delimited JSON.
+    Invalid packets are rejected individually and listed in the response."""
+    url = "http://localhost:8000/submit/"
+
+    header = {'AUTHORIZATION': api_key, "User-Agent": "gr-satellite",
+              "Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"}
+    data = gzip.compress("\n".join(json.dumps(packet) for packet in packets).encode())
+    try:
+        response = requests.post(url, data=data, headers=header, timeout=30)
+        if response.status_code != 201:
+            print(f"Error {response.status_code}: {response.text}")
+        elif "errors" in response.json():
+            print(f"Rejected lines: {response.json()['errors']}")
+        else:
+            print("Success")
+    except requests.exceptions.RequestException as exception:
+        print(exception)
+
+
 def create_batched_submission(frame_timestamp_tuple_list: list) -> list:
     """Creates a list of json frame packets to batch frames into one submission."""
     packet = []
@@ -49,7 +49,11 @@ class Command(BaseCommand):
                     for frame in json_objects:
                         frame_entry = Downlink()
                         frame_entry.observer = Member.objects.all().filter(username="admin")[0]
-                        frame_entry.frame = frame["packet"]
+                        try:
+                            frame_entry.set_frame(frame["packet"])
+                        except ValueError as e:
+                            print(f"Error parsing frame: {frame['packet']}\n{e}")
+                            continue
                         frame_entry.timestamp = frame["timestamp"]
                         frame_entry.frequency = frame["frequency"]
                         frame_entry.save()
@@ -57,7 +61,11 @@ class Command(BaseCommand):
                     for frame in json_objects:
                         frame_entry = Uplink()
                         frame_entry.operator = Member.objects.all().filter(username="admin")[0]
-                        frame_entry.frame = frame["packet"]
+                        try:
+                            frame_entry.set_frame(frame["packet"])
+                        except ValueError as e:
+                            print(f"Error parsing frame: {frame['packet']}\n{e}")
+                            continue
                         frame_entry.timestamp = frame["timestamp"]
                         frame_entry.frequency = frame["frequency"]
                         frame_entry.save()
@@ -0,0 +1,35 @@
+"""Custom command to (re)compute the rollup buckets from the parsed telemetry.
+Run with 'python manage.py backfillrollups [satellite ...] [--link downlink] [--start 2022-01-01] [--stop 2023-01-01]' """
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from transmission.processing.influxdb_api import get_influx_db_read_and_query_api
+from transmission.processing.rollups import backfill_rollups
+from transmission.processing.satellites import SATELLITES
+
+
+class Command(BaseCommand):
+    """Django command class"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("satellites", nargs="*", help="satellites to roll up, all satellites if omitted")
+        parser.add_argument("--link", choices=["uplink", "downlink"], help="link to roll up, both if omitted")
+        parser.add_argument("--start", type=datetime.fromisoformat,
+                            help="start of the time range (ISO 8601), the first parsed point if omitted")
+        parser.add_argument("--stop", type=datetime.fromisoformat,
+                            help="end of the time range (ISO 8601), the last parsed point if omitted")
+
+    def handle(self, *args, **options):
+        """Recompute the hourly and daily rollups of the uplink and downlink telemetry."""
+
+        satellites = options["satellites"] or list(SATELLITES)
+        for satellite in satellites:
+            if satellite not in SATELLITES:
+                raise CommandError(f"Unknown satellite: {satellite}")
+
+        links = [options["link"]] if options["link"] else ["uplink", "downlink"]
+        _, query_api = get_influx_db_read_and_query_api()
+
+        for satellite in satellites:
+            for link in links:
+                slices_count = backfill_rollups(query_api, satellite, link, options["start"], options["stop"])
+                print(f"{satellite} {link}: {slices_count} time slices rolled up")
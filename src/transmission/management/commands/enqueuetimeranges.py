@@ -0,0 +1,27 @@
+"""Custom command to queue the frames of the time ranges of new and failed data left by the previous releases.
+Run with 'python manage.py enqueuetimeranges' after upgrading an existing deployment"""
+from django.core.management.base import BaseCommand
+from transmission.models import PendingTimeRange
+from transmission.processing.frame_queue import enqueue_time_range
+from transmission.processing.influxdb_api import get_influx_db_read_and_query_api
+
+
+class Command(BaseCommand):
+    """Django command class"""
+
+    def handle(self, *args, **options):
+        """Add the raw frames of every pending time range to the frame queue and remove the time range."""
+
+        _, query_api = get_influx_db_read_and_query_api()
+
+        time_ranges = PendingTimeRange.objects.order_by("satellite", "link", "start")
+        if not time_ranges.exists():
+            print("No pending time ranges")
+            return
+
+        for time_range in time_ranges:
+            frames_count = enqueue_time_range(query_api, time_range.satellite, time_range.link,
+                                              time_range.start, time_range.end)
+            # the time range is removed once its frames are queued, the command can be run again if interrupted
+            time_range.delete()
+            print(f"{time_range}: {frames_count} frames queued")
@@ -4,6 +4,8 @@ from django.core.management.base import BaseCommand
 from influxdb_client import BucketRetentionRules
 from transmission.processing.satellites import SATELLITES
 from transmission.processing.influxdb_api import get_influxdb_bucket_api
+from transmission.processing.rollups import get_rollup_buckets
+from transmission.processing.telemetry_schema import FRAME_SCHEMA, get_telemetry_bucket
 
 class Command(BaseCommand):
     """Django command class"""
@@ -12,7 +14,9 @@ class Command(BaseCommand):
         """Create influxdb buckets for each satellite:
          - 1 raw data bucket
          - 1 bucket for uplink data
-         - 1 bucket for downlink data"""
+         - 1 bucket for downlink data
+         - rollup buckets of the uplink and downlink data (1h and 1d)
+         - frame schema buckets of the uplink and downlink data"""
 
         buckets_api = get_influxdb_bucket_api()
         buckets = []
@@ -20,6 +24,9 @@ class Command(BaseCommand):
             buckets.append(sat + "_raw_data")
             buckets.append(sat + "_downlink")
             buckets.append(sat + "_uplink")
+            buckets += get_rollup_buckets(sat)
+            buckets.append(get_telemetry_bucket(sat, "downlink", FRAME_SCHEMA))
+            buckets.append(get_telemetry_bucket(sat, "uplink", FRAME_SCHEMA))
 
         for bucket in buckets:
             retention_rules = BucketRetentionRules(type="expire", every_seconds=0)
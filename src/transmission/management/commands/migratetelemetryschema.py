@@ -0,0 +1,54 @@
+"""Custom command to rewrite the parsed telemetry of the (field schema) <satellite>_<link> buckets
+into the frame schema <satellite>_<link>_frames buckets, one point per frame.
+Run with 'python manage.py migratetelemetryschema [satellite ...] [--link downlink] [--start 2022-01-01] [--stop 2023-01-01]'
+and set TELEMETRY_SCHEMA=frame afterwards to store and query new telemetry in the frame schema."""
+from datetime import datetime, timedelta, timezone
+from django.core.management.base import BaseCommand, CommandError
+from transmission.processing.influxdb_api import get_bucket_time_range, get_influx_db_read_and_query_api
+from transmission.processing.satellites import SATELLITES
+from transmission.processing.telemetry_schema import FIELD_SCHEMA, get_telemetry_bucket, migrate_to_frame_schema
+
+
+def parse_utc_time(value: str) -> datetime:
+    """Parse an ISO 8601 timestamp, naive timestamps are in UTC."""
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+class Command(BaseCommand):
+    """Django command class"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("satellites", nargs="*", help="satellites to migrate, all satellites if omitted")
+        parser.add_argument("--link", choices=["uplink", "downlink"], help="link to migrate, both if omitted")
+        parser.add_argument("--start", type=parse_utc_time,
+                            help="start of the time range (ISO 8601), the first parsed point if omitted")
+        parser.add_argument("--stop", type=parse_utc_time,
+                            help="end of the time range (ISO 8601), the last parsed point if omitted")
+
+    def handle(self, *args, **options):
+        """Rewrite the field schema telemetry into the frame schema buckets."""
+
+        satellites = options["satellites"] or list(SATELLITES)
+        for satellite in satellites:
+            if satellite not in SATELLITES:
+                raise CommandError(f"Unknown satellite: {satellite}")
+
+        links = [options["link"]] if options["link"] else ["uplink", "downlink"]
+        write_api, query_api = get_influx_db_read_and_query_api()
+
+        for satellite in satellites:
+            for link in links:
+                start, stop = options["start"], options["stop"]
+                if start is None or stop is None:
+                    time_range = get_bucket_time_range(query_api, get_telemetry_bucket(satellite, link, FIELD_SCHEMA))
+                    if time_range is None:
+                        print(f"{satellite} {link}: no telemetry to migrate")
+                        continue
+                    start = start or time_range[0]
+                    stop = stop or time_range[1] + timedelta(seconds=1)
+
+                frames_count = migrate_to_frame_schema(query_api, write_api, satellite, link, start, stop)
+                print(f"{satellite} {link}: {frames_count} frames migrated")
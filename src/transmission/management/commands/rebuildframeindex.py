@@ -0,0 +1,28 @@
+"""Custom command to rebuild the local index of the frames stored in the influxdb raw data buckets.
+Run with 'python manage.py rebuildframeindex [satellite]' """
+from django.core.management.base import BaseCommand, CommandError
+from transmission.processing.frame_index import rebuild_frame_index
+from transmission.processing.influxdb_api import get_influx_db_read_and_query_api
+from transmission.processing.satellites import SATELLITES
+
+
+class Command(BaseCommand):
+    """Django command class"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("satellites", nargs="*", help="satellites to index, all satellites if omitted")
+
+    def handle(self, *args, **options):
+        """Add the fingerprints of all raw uplink and downlink frames to the frame index."""
+
+        satellites = options["satellites"] or list(SATELLITES)
+        for satellite in satellites:
+            if satellite not in SATELLITES:
+                raise CommandError(f"Unknown satellite: {satellite}")
+
+        _, query_api = get_influx_db_read_and_query_api()
+
+        for satellite in satellites:
+            for link in ["uplink", "downlink"]:
+                frames_count = rebuild_frame_index(query_api, satellite, link)
+                print(f"{satellite} {link}: {frames_count} frames indexed")
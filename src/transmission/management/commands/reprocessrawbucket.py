@@ -0,0 +1,42 @@
+"""Custom command to reprocess the entire raw data bucket of satellites in parallel time shards,
+e.g. after a fix of the XTCE definitions. An interrupted reprocessing is resumed from its checkpoints.
+Run with 'python manage.py reprocessrawbucket [satellite ...] [--link downlink] [--restart]' """
+from django.core.management.base import BaseCommand, CommandError
+from transmission.processing.process_raw_bucket import process_retrieved_frames, query_api
+from transmission.processing.reprocessing import ReprocessingError, reprocess_raw_bucket
+from transmission.processing.satellites import SATELLITES
+
+
+class Command(BaseCommand):
+    """Django command class"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("satellites", nargs="*", help="satellites to reprocess, all satellites if omitted")
+        parser.add_argument("--link", choices=["uplink", "downlink"], help="link to reprocess, both if omitted")
+        parser.add_argument("--restart", action="store_true",
+                            help="discard the checkpoints of an interrupted reprocessing and start over")
+
+    def handle(self, *args, **options):
+        """Reprocess the uplink and downlink raw frames of the satellites."""
+
+        satellites = options["satellites"] or list(SATELLITES)
+        for satellite in satellites:
+            if satellite not in SATELLITES:
+                raise CommandError(f"Unknown satellite: {satellite}")
+
+        links = [options["link"]] if options["link"] else ["uplink", "downlink"]
+
+        failed = False
+        for satellite in satellites:
+            for link in links:
+                try:
+                    processed, total = reprocess_raw_bucket(query_api, satellite, link, process_retrieved_frames,
+                                                            restart=options["restart"])
+                except ReprocessingError as ex:
+                    print(ex.message)
+                    processed, total = ex.processed_frames, ex.total_frames
+                    failed = True
+                print(f"{satellite} {link}: {processed} out of {total} frames reprocessed")
+
+        if failed:
+            raise CommandError("Some shards failed, run the command again to resume the reprocessing")
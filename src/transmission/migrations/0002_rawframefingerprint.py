@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transmission', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RawFrameFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=64, unique=True)),
+            ],
+        ),
+    ]
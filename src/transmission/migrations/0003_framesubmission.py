@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:36
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transmission', '0002_rawframefingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FrameSubmission',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('username', models.CharField(max_length=32)),
+                ('application', models.TextField(blank=True, null=True)),
+                ('body', models.BinaryField()),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('processed', 'Processed'), ('failed', 'Failed')], db_index=True, default='queued', max_length=16)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('frames_saved', models.IntegerField(default=0)),
+                ('message', models.TextField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transmission', '0003_framesubmission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='framesubmission',
+            name='content_encoding',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='framesubmission',
+            name='content_type',
+            field=models.CharField(default='application/json', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='framesubmission',
+            name='errors',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
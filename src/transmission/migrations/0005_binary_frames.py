@@ -0,0 +1,112 @@
+"""Store the buffered uplink/downlink frames as bytes with a content hash instead of HEX text."""
+import hashlib
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def frames_to_binary(apps, schema_editor):
+    """Convert the HEX frames of the existing rows to bytes"""
+    for model_name in ("Downlink", "Uplink"):
+        model = apps.get_model("transmission", model_name)
+        batch = []
+        for frame_entry in model.objects.only("id", "frame").iterator(chunk_size=BATCH_SIZE):
+            try:
+                frame_entry.frame_data = bytes.fromhex(frame_entry.frame)
+            except ValueError:
+                # frames inserted without validation are kept as text and flagged as invalid
+                frame_entry.frame_data = frame_entry.frame.encode()
+                frame_entry.invalid = True
+            frame_entry.frame_hash = hashlib.sha256(frame_entry.frame_data).hexdigest()
+            batch.append(frame_entry)
+
+            if len(batch) == BATCH_SIZE:
+                model.objects.bulk_update(batch, ["frame_data", "frame_hash", "invalid"])
+                batch = []
+        model.objects.bulk_update(batch, ["frame_data", "frame_hash", "invalid"])
+
+
+def frames_to_hex(apps, schema_editor):
+    """Convert the binary frames back to HEX"""
+    for model_name in ("Downlink", "Uplink"):
+        model = apps.get_model("transmission", model_name)
+        batch = []
+        for frame_entry in model.objects.only("id", "frame_data").iterator(chunk_size=BATCH_SIZE):
+            frame_entry.frame = bytes(frame_entry.frame_data).hex().upper()
+            batch.append(frame_entry)
+
+            if len(batch) == BATCH_SIZE:
+                model.objects.bulk_update(batch, ["frame"])
+                batch = []
+        model.objects.bulk_update(batch, ["frame"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transmission', '0004_framesubmission_format'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='downlink',
+            name='frame_data',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='downlink',
+            name='frame_hash',
+            field=models.CharField(default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='uplink',
+            name='frame_data',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='uplink',
+            name='frame_hash',
+            field=models.CharField(default='', max_length=64),
+        ),
+        # the HEX frames are nullable while both columns exist, such that the migration can be reversed
+        migrations.AlterField(
+            model_name='downlink',
+            name='frame',
+            field=models.TextField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='uplink',
+            name='frame',
+            field=models.TextField(null=True),
+        ),
+        migrations.RunPython(frames_to_binary, frames_to_hex),
+        migrations.RemoveField(
+            model_name='downlink',
+            name='frame',
+        ),
+        migrations.RemoveField(
+            model_name='uplink',
+            name='frame',
+        ),
+        migrations.RenameField(
+            model_name='downlink',
+            old_name='frame_data',
+            new_name='frame',
+        ),
+        migrations.RenameField(
+            model_name='uplink',
+            old_name='frame_data',
+            new_name='frame',
+        ),
+        migrations.AlterField(
+            model_name='downlink',
+            name='frame',
+            field=models.BinaryField(default=None),
+        ),
+        migrations.AlterField(
+            model_name='uplink',
+            name='frame',
+            field=models.BinaryField(default=None),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transmission', '0005_binary_frames'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='downlink',
+            index=models.Index(condition=models.Q(('processed', False)), fields=['timestamp'], name='downlink_unprocessed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='downlink',
+            index=models.Index(fields=['frame_hash'], name='downlink_frame_hash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='downlink',
+            index=models.Index(fields=['timestamp'], name='downlink_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uplink',
+            index=models.Index(condition=models.Q(('processed', False)), fields=['timestamp'], name='uplink_unprocessed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uplink',
+            index=models.Index(fields=['frame_hash'], name='uplink_frame_hash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uplink',
+            index=models.Index(fields=['timestamp'], name='uplink_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transmission', '0006_buffer_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='downlink',
+            name='downlink_timestamp_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='uplink',
+            name='uplink_timestamp_idx',
+        ),
+        migrations.AddIndex(
+            model_name='downlink',
+            index=models.Index(fields=['timestamp', 'id'], name='downlink_timestamp_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tle',
+            index=models.Index(fields=['valid_from', 'id'], name='tle_valid_from_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uplink',
+            index=models.Index(fields=['timestamp', 'id'], name='uplink_timestamp_id_idx'),
+        ),
+    ]
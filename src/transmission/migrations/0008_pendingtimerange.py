@@ -0,0 +1,68 @@
+"""Keep the time ranges of new and failed data in a table instead of the JSON files under processing/temp."""
+from datetime import datetime, timezone
+import json
+import os
+
+from django.db import migrations, models
+
+# folder of the time range files, can be set to read the files from another location (e.g. the docker host)
+LEGACY_TEMP_FOLDER = os.environ.get('LEGACY_TIME_RANGE_FOLDER', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "processing", "temp"))
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def _legacy_time_range_files():
+    """Yield the (kind, path) of the time range files of the previous releases, if any are left."""
+    if not os.path.isdir(LEGACY_TEMP_FOLDER):
+        return
+    for root, _, files in os.walk(LEGACY_TEMP_FOLDER):
+        for file in files:
+            if file.endswith(".json"):
+                yield ("failed" if file.startswith("failed_") else "new"), os.path.join(root, file)
+
+
+def import_time_range_files(apps, schema_editor):
+    """Insert the time ranges of the legacy JSON files, in the single [start, end] or the interval list format"""
+    model = apps.get_model("transmission", "PendingTimeRange")
+    rows = []
+    for kind, path in _legacy_time_range_files():
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                time_ranges = json.load(file)
+        except (OSError, ValueError):
+            continue
+
+        for satellite, links in time_ranges.items():
+            for link, intervals in links.items():
+                if intervals and isinstance(intervals[0], str):
+                    intervals = [intervals]
+                for start_time, end_time in intervals:
+                    rows.append(model(satellite=satellite, link=link, kind=kind,
+                                      start=datetime.strptime(start_time, TIME_FORMAT).replace(tzinfo=timezone.utc),
+                                      end=datetime.strptime(end_time, TIME_FORMAT).replace(tzinfo=timezone.utc)))
+    model.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transmission', '0007_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingTimeRange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('satellite', models.CharField(max_length=32)),
+                ('link', models.CharField(max_length=8)),
+                ('kind', models.CharField(choices=[('new', 'New'), ('failed', 'Failed')], default='new', max_length=8)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['satellite', 'link', 'kind', 'start'], name='pending_time_range_idx')],
+            },
+        ),
+        migrations.RunPython(import_time_range_files, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transmission', '0008_pendingtimerange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedFrame',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('satellite', models.CharField(max_length=32)),
+                ('link', models.CharField(max_length=8)),
+                ('timestamp', models.DateTimeField()),
+                ('frame_hash', models.CharField(max_length=64)),
+                ('frame', models.TextField()),
+                ('observer', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('retry', 'Retry'), ('dead', 'Dead')], default='pending', max_length=8)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='queuedframe',
+            constraint=models.UniqueConstraint(fields=('satellite', 'link', 'timestamp', 'frame_hash'), name='queued_frame_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='queuedframe',
+            index=models.Index(fields=['satellite', 'link', 'status', 'next_attempt'], name='queued_frame_dequeue_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transmission', '0009_queuedframe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReprocessingShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('satellite', models.CharField(max_length=32)),
+                ('link', models.CharField(max_length=8)),
+                ('start', models.DateTimeField()),
+                ('stop', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done')], default='pending', max_length=8)),
+                ('processed_frames', models.IntegerField(default=0)),
+                ('total_frames', models.IntegerField(default=0)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('satellite', 'link', 'start'), name='reprocessing_shard_unique')],
+            },
+        ),
+    ]
@@ -1,8 +1,17 @@
 """Models for uplink and downlink data"""
+import hashlib
+import uuid
+from typing import Union
 from django.db import models
+from django.db.models import Q
 from django.db.models.deletion import DO_NOTHING
 from django.utils import timezone
-from transmission.processing.telemetry_scraper import TIME_FORMAT
+from transmission.processing.satellites import TIME_FORMAT
+
+
+def get_frame_hash(frame: bytes) -> str:
+    """Content hash of a binary frame"""
+    return hashlib.sha256(frame).hexdigest()
 
 
 class Satellite(models.Model):
@@ -21,6 +30,12 @@ class TLE(models.Model):
     sat = models.ForeignKey(Satellite, to_field="sat", db_column="sat", null=False, on_delete=DO_NOTHING)
     tle = models.TextField(null=False)
 
+    class Meta:
+        """Index for the keyset pagination of the TLE table"""
+        indexes = [
+            models.Index(fields=["valid_from", "id"], name="tle_valid_from_id_idx"),
+        ]
+
 
 class Downlink(models.Model):
     """Table for downlink data frames"""
@@ -30,9 +45,30 @@ class Downlink(models.Model):
     processed = models.BooleanField(default=False, null=False)
     invalid = models.BooleanField(null=True, blank=True)
     frequency = models.FloatField(null=True, blank=True)
-    frame = models.TextField(default=None, null=False)
+    frame = models.BinaryField(default=None, null=False)
+    frame_hash = models.CharField(null=False, max_length=64, default="")
     metadata = models.JSONField(null=True, blank=True)
 
+    class Meta:
+        """Indexes for buffer processing (unprocessed frames), frame lookup and keyset pagination by time"""
+        indexes = [
+            models.Index(fields=["timestamp"], name="downlink_unprocessed_idx", condition=Q(processed=False)),
+            models.Index(fields=["frame_hash"], name="downlink_frame_hash_idx"),
+            models.Index(fields=["timestamp", "id"], name="downlink_timestamp_id_idx"),
+        ]
+
+    def set_frame(self, frame: Union[str, bytes]) -> None:
+        """Assign the frame (HEX string or bytes) and its content hash"""
+        if isinstance(frame, str):
+            frame = bytes.fromhex(frame)
+        self.frame = frame
+        self.frame_hash = get_frame_hash(frame)
+
+    @property
+    def frame_hex(self) -> str:
+        """The frame as HEX string"""
+        return bytes(self.frame).hex().upper()
+
     def to_dictionary(self) -> dict:
         """Convert Downlink object to dict"""
         frame_dict = {}
@@ -41,7 +77,7 @@ class Downlink(models.Model):
         frame_dict["application"] = self.application
         frame_dict["processed"] = self.processed
         frame_dict["frequency"] = self.frequency
-        frame_dict["frame"] = self.frame
+        frame_dict["frame"] = self.frame_hex
         frame_dict["metadata"] = self.metadata
 
         return frame_dict
@@ -55,9 +91,30 @@ class Uplink(models.Model):
     processed = models.BooleanField(default=False, null=False)
     invalid = models.BooleanField(null=True, blank=True)
     frequency = models.FloatField(null=False)
-    frame = models.TextField(default=None, null=False)
+    frame = models.BinaryField(default=None, null=False)
+    frame_hash = models.CharField(null=False, max_length=64, default="")
     metadata = models.JSONField(null=True, blank=True)
 
+    class Meta:
+        """Indexes for buffer processing (unprocessed frames), frame lookup and keyset pagination by time"""
+        indexes = [
+            models.Index(fields=["timestamp"], name="uplink_unprocessed_idx", condition=Q(processed=False)),
+            models.Index(fields=["frame_hash"], name="uplink_frame_hash_idx"),
+            models.Index(fields=["timestamp", "id"], name="uplink_timestamp_id_idx"),
+        ]
+
+    def set_frame(self, frame: Union[str, bytes]) -> None:
+        """Assign the frame (HEX string or bytes) and its content hash"""
+        if isinstance(frame, str):
+            frame = bytes.fromhex(frame)
+        self.frame = frame
+        self.frame_hash = get_frame_hash(frame)
+
+    @property
+    def frame_hex(self) -> str:
+        """The frame as HEX string"""
+        return bytes(self.frame).hex().upper()
+
     def to_dictionary(self) -> dict:
         """Convert Uplink object to dict"""
         frame_dict = {}
@@ -66,7 +123,131 @@ class Uplink(models.Model):
         frame_dict["application"] = self.application
         frame_dict["processed"] = self.processed
         frame_dict["frequency"] = self.frequency
-        frame_dict["frame"] = self.frame
+        frame_dict["frame"] = self.frame_hex
         frame_dict["metadata"] = self.metadata
 
         return frame_dict
+
+
+class RawFrameFingerprint(models.Model):
+    """Fingerprints of the frames stored in the influxdb raw data buckets,
+    used to detect duplicate frames without querying influxdb"""
+    fingerprint = models.CharField(null=False, max_length=64, unique=True)
+
+
+class FrameSubmission(models.Model):
+    """Queue of frame submissions accepted by the asynchronous submission endpoint,
+    stored as received and moved to the uplink/downlink tables by a background job"""
+    QUEUED = "queued"
+    PROCESSED = "processed"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (PROCESSED, "Processed"), (FAILED, "Failed")]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    username = models.CharField(null=False, max_length=32)
+    application = models.TextField(null=True, blank=True)
+    body = models.BinaryField(null=False)
+    content_type = models.CharField(null=False, max_length=64, default="application/json")
+    content_encoding = models.CharField(null=False, max_length=16, blank=True, default="")
+    status = models.CharField(null=False, max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    received_at = models.DateTimeField(null=False, default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    frames_saved = models.IntegerField(null=False, default=0)
+    message = models.TextField(null=True, blank=True)
+    errors = models.JSONField(null=True, blank=True)
+
+    def to_dictionary(self) -> dict:
+        """Convert FrameSubmission object to dict"""
+        submission_dict = {}
+        submission_dict["id"] = str(self.id)
+        submission_dict["status"] = self.status
+        submission_dict["received_at"] = self.received_at.strftime(TIME_FORMAT)
+        submission_dict["processed_at"] = self.processed_at.strftime(TIME_FORMAT) if self.processed_at else None
+        submission_dict["frames_saved"] = self.frames_saved
+        submission_dict["message"] = self.message
+        submission_dict["errors"] = self.errors
+
+        return submission_dict
+
+
+class PendingTimeRange(models.Model):
+    """Time ranges of new (not yet processed) or failed frames left by the releases before the frame queue,
+    moved to the queue by the enqueuetimeranges command after upgrading"""
+    NEW = "new"
+    FAILED = "failed"
+    KIND_CHOICES = [(NEW, "New"), (FAILED, "Failed")]
+
+    satellite = models.CharField(null=False, max_length=32)
+    link = models.CharField(null=False, max_length=8)
+    kind = models.CharField(null=False, max_length=8, choices=KIND_CHOICES, default=NEW)
+    start = models.DateTimeField(null=False)
+    end = models.DateTimeField(null=False)
+
+    class Meta:
+        """Index for looking up the time ranges of a satellite link in time order"""
+        indexes = [
+            models.Index(fields=["satellite", "link", "kind", "start"], name="pending_time_range_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.satellite} {self.link} {self.kind}: {self.start} - {self.end}"
+
+
+class QueuedFrame(models.Model):
+    """Queue of the raw frames stored in the influxdb raw data buckets that are waiting to be parsed,
+    filled when the frames are stored and drained in batches by the raw bucket processing.
+    Failed frames are retried with backoff and end up in the dead-letter state after too many attempts"""
+    PENDING = "pending"
+    RETRY = "retry"
+    DEAD = "dead"
+    STATUS_CHOICES = [(PENDING, "Pending"), (RETRY, "Retry"), (DEAD, "Dead")]
+
+    satellite = models.CharField(null=False, max_length=32)
+    link = models.CharField(null=False, max_length=8)
+    timestamp = models.DateTimeField(null=False)
+    frame_hash = models.CharField(null=False, max_length=64)
+    frame = models.TextField(null=False)
+    observer = models.TextField(null=True, blank=True)
+    status = models.CharField(null=False, max_length=8, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(null=False, default=0)
+    next_attempt = models.DateTimeField(null=False, default=timezone.now)
+    last_error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        """A frame is queued once, the due frames of a satellite link are dequeued using the index"""
+        constraints = [
+            models.UniqueConstraint(fields=["satellite", "link", "timestamp", "frame_hash"],
+                                    name="queued_frame_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["satellite", "link", "status", "next_attempt"], name="queued_frame_dequeue_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.satellite} {self.link} {self.timestamp} ({self.status})"
+
+
+class ReprocessingShard(models.Model):
+    """Time shards of the reprocessing of an entire raw data bucket. Completed shards are checkpoints,
+    an interrupted reprocessing is resumed with the shards that are still pending"""
+    PENDING = "pending"
+    DONE = "done"
+    STATUS_CHOICES = [(PENDING, "Pending"), (DONE, "Done")]
+
+    satellite = models.CharField(null=False, max_length=32)
+    link = models.CharField(null=False, max_length=8)
+    start = models.DateTimeField(null=False)
+    stop = models.DateTimeField(null=False)
+    status = models.CharField(null=False, max_length=8, choices=STATUS_CHOICES, default=PENDING)
+    processed_frames = models.IntegerField(null=False, default=0)
+    total_frames = models.IntegerField(null=False, default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """One shard per start time of a satellite link"""
+        constraints = [
+            models.UniqueConstraint(fields=["satellite", "link", "start"], name="reprocessing_shard_unique"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.satellite} {self.link} {self.start} - {self.stop} ({self.status})"
@@ -0,0 +1,104 @@
+"""Keyset (cursor) pagination of the frames and TLE tables, ordered by a time field and id.
+Unlike offset pagination, opening any page costs the same, and no count of the table is needed."""
+import base64
+import binascii
+from datetime import datetime
+from typing import Union
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.query import QuerySet
+
+# cursor of the last page
+LAST_PAGE_CURSOR = "last"
+
+
+class KeysetPage:
+    """A page of rows with the cursors pointing to the neighbouring pages"""
+
+    def __init__(self, object_list: list, key_field: str, has_previous: bool, has_next: bool,
+                 count: Union[int, None] = None) -> None:
+        self.object_list = object_list
+        self.key_field = key_field
+        self.has_previous = has_previous
+        self.has_next = has_next
+        self.count = count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def previous_cursor(self) -> str:
+        """Cursor of the page before the first row"""
+        return encode_cursor(getattr(self.object_list[0], self.key_field), self.object_list[0].pk)
+
+    @property
+    def next_cursor(self) -> str:
+        """Cursor of the page after the last row"""
+        return encode_cursor(getattr(self.object_list[-1], self.key_field), self.object_list[-1].pk)
+
+
+def encode_cursor(key: datetime, pk: int) -> str:
+    """Encode the key of a row into an url-safe cursor."""
+    return base64.urlsafe_b64encode(f"{key.isoformat()}|{pk}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Union[tuple, None]:
+    """Decode a cursor into the (key, id) of a row, None if the cursor is invalid."""
+    try:
+        key, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(key), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def paginate_keyset(queryset: QuerySet, key_field: str, per_page: int, after: str = None, before: str = None,
+                    with_count: bool = False) -> KeysetPage:
+    """Return the page of rows after (or before) a cursor, ordered by (key_field, id).
+    Without (valid) cursors the first page is returned, LAST_PAGE_CURSOR as before cursor returns the last page.
+    The exact count of the rows is only computed if with_count is True.
+    Rows with a null key are not paginated."""
+    queryset = queryset.filter(**{key_field + "__isnull": False})
+    count = queryset.count() if with_count else None
+    ascending = queryset.order_by(key_field, "pk")
+    descending = queryset.order_by("-" + key_field, "-pk")
+
+    if before == LAST_PAGE_CURSOR:
+        rows = list(descending[:per_page + 1])
+        return KeysetPage(rows[:per_page][::-1], key_field, has_previous=len(rows) > per_page, has_next=False,
+                          count=count)
+
+    before_key = decode_cursor(before) if before else None
+    if before_key is not None:
+        key, pk = before_key
+        rows = list(descending.filter(Q(**{key_field + "__lt": key}) | Q(**{key_field: key, "pk__lt": pk}))
+                    [:per_page + 1])
+        return KeysetPage(rows[:per_page][::-1], key_field, has_previous=len(rows) > per_page,
+                          has_next=len(rows) > 0, count=count)
+
+    after_key = decode_cursor(after) if after else None
+    if after_key is not None:
+        key, pk = after_key
+        ascending = ascending.filter(Q(**{key_field + "__gt": key}) | Q(**{key_field: key, "pk__gt": pk}))
+
+    rows = list(ascending[:per_page + 1])
+    return KeysetPage(rows[:per_page], key_field, has_previous=after_key is not None and len(rows) > 0,
+                      has_next=len(rows) > per_page, count=count)
+
+
+def get_approximate_count(queryset: QuerySet) -> Union[int, None]:
+    """Estimate the number of rows of the table of a queryset from the Postgres statistics.
+    Returns None if no estimate is available."""
+    if connection.vendor != "postgresql":
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
@@ -1,22 +1,31 @@
+import os
+import threading
 from py4j.java_gateway import launch_gateway
-from py4j.java_gateway import JavaGateway
+from py4j.java_gateway import JavaClass, JavaGateway, GatewayParameters
 from py4j.protocol import Py4JJavaError
 from django_logger import logger
 
 
 # pylint: disable=all
 class XTCEParser:
-    gateway_started = 0
+    gateway = None
+    gateway_lock = threading.Lock()
+
+    @staticmethod
+    def getGateway():
+        """Return the gateway to the JVM of this process, launching the JVM on first use.
+        Every process (e.g. uwsgi worker) runs its own JVM on a free port."""
+        with XTCEParser.gateway_lock:
+            if XTCEParser.gateway is None:
+                classpath = os.pathsep.join(['transmission/processing/xtcetools-1.1.5.jar',
+                                             'transmission/processing/xtce-bulk-decoder.jar'])
+                port = launch_gateway(classpath=classpath, die_on_exit=True)
+                XTCEParser.gateway = JavaGateway(gateway_parameters=GatewayParameters(port=port))
+        return XTCEParser.gateway
 
     def __init__(self, XTCEfile, stream):
 
-        if XTCEParser.gateway_started == 0:
-            launch_gateway(classpath='transmission/processing/xtcetools-1.1.5.jar',
-                           port=25333,
-                           die_on_exit=True)
-            XTCEParser.gateway_started = 1
-
-        gateway = JavaGateway()
+        gateway = XTCEParser.getGateway()
 
         XTCEContainerContentModel = gateway.jvm.org.xtce.toolkit.XTCEContainerContentModel
         XTCEContainerEntryValue = gateway.jvm.org.xtce.toolkit.XTCEContainerEntryValue
@@ -31,8 +40,31 @@ class XTCEParser:
 
         self.db_ = XTCEDatabase(File(XTCEfile), True, False, True)
         self.stream_ = self.db_.getStream(stream)
+        # the parser is shared between threads, decode one frame at a time
+        self.lock_ = threading.Lock()
+
+        # helper decoding many frames in one gateway call (java/delfitlm/XTCEBulkDecoder.java)
+        self.bulkDecoder_ = gateway.jvm.delfitlm.XTCEBulkDecoder
+        if not isinstance(self.bulkDecoder_, JavaClass):
+            raise XTCEException("XTCEBulkDecoder not found on the classpath, "
+                                "build transmission/processing/xtce-bulk-decoder.jar (see the Dockerfile)")
 
     def processTMFrame(self, data):
+        with self.lock_:
+            return self._processTMFrame(data)
+
+    def processTMFrames(self, frames):
+        """Decode a list of frames (bytes). For each frame, return either its telemetry
+        (same format as processTMFrame) or the XTCEException raised while decoding it."""
+        if not frames:
+            return []
+
+        with self.lock_:
+            decoded = self.bulkDecoder_.decode(self.stream_, "\n".join(data.hex() for data in frames))
+
+        return parseBulkDecoderOutput(decoded)
+
+    def _processTMFrame(self, data):
         try:
             model = self.stream_.processStream(data)
             entries = model.getContentList()
@@ -52,7 +84,11 @@ class XTCEParser:
             logger.debug("TMFrame TLM: %s", telemetry)
             return telemetry
         except Py4JJavaError as ex:
-            raise XTCEException(ex.java_exception)
+            # same message as the "E" lines of XTCEBulkDecoder (Throwable.toString)
+            raise XTCEException(str(ex.java_exception))
+        except ValueError as ex:
+            # a value that is not a number while its valid range is, XTCEBulkDecoder also fails the frame
+            raise XTCEException(str(ex))
 
     def isFieldValid(self, entry):
         param = entry.getParameter()
@@ -94,6 +130,20 @@ class XTCEParser:
             return "Valid"
 
 
+def parseBulkDecoderOutput(decoded):
+    """Convert the output of XTCEBulkDecoder.decode to a list of telemetry dicts or XTCEExceptions."""
+    results = []
+    for line in decoded.splitlines():
+        columns = line.split("\t")
+        if columns[0] == "F":
+            results.append({"frame": columns[1]})
+        elif columns[0] == "E":
+            results.append(XTCEException(columns[1]))
+        elif columns[0] == "V":
+            results[-1][columns[1]] = {"value": columns[2], "status": columns[3]}
+    return results
+
+
 class XTCEException(Exception):
     """Exception raised by xtcetools.
 
@@ -107,11 +157,36 @@ class XTCEException(Exception):
 
 
 class SatParsers:
+    """Process-wide registry of the satellite parsers. The XTCE databases are loaded
+    the first time the parsers are requested and then shared by all threads of the process."""
+    _parsers = None
+    _lock = threading.Lock()
 
     def __init__(self):
-        self.parsers = {
-            "delfi_pq": XTCEParser("delfipq/Delfi-PQ.xml", "Radio"),
-            "delfi_next": None,
-            "delfi_c3": XTCEParser("delfic3/Delfi-C3.xml", "TLM"),
-            "da_vinci": None
-        }
+        self.parsers = SatParsers.load()
+
+    @staticmethod
+    def load():
+        with SatParsers._lock:
+            if SatParsers._parsers is None:
+                SatParsers._parsers = {
+                    "delfi_pq": XTCEParser("delfipq/Delfi-PQ.xml", "Radio"),
+                    "delfi_next": None,
+                    "delfi_c3": XTCEParser("delfic3/Delfi-C3.xml", "TLM"),
+                    "da_vinci": None
+                }
+        return SatParsers._parsers
+
+
+def get_parser(satellite):
+    """Return the (shared) parser of a satellite, None if the satellite has no XTCE definition."""
+    return SatParsers().parsers[satellite]
+
+
+def warm_up_parsers():
+    """Launch the JVM and load all XTCE databases ahead of the first frame to process."""
+    try:
+        SatParsers.load()
+        logger.info("XTCE parsers loaded")
+    except Exception as ex:
+        logger.error("XTCE parsers could not be loaded: %s", ex)
@@ -6,9 +6,12 @@ from django.core.management import call_command
 from members.models import Member
 from transmission.models import Downlink
 from transmission.processing import XTCEParser
-from transmission.processing.process_raw_bucket import parse_and_store_frame, store_raw_frame
+from transmission.processing.process_raw_bucket import parse_and_store_frame, store_raw_frames, \
+    update_derived_telemetry
 from transmission.processing.save_raw_data import parse_submitted_frame
 
+RAW_FRAMES_BATCH_SIZE = 1000
+
 
 def add_dummy_downlink_frames(input_file="transmission/dummy_downlink.json"):
     """Add dummy frames to Downlink table as admin user."""
@@ -33,18 +36,22 @@ def add_dummy_tlm_data(satellite, input_file):
         # sort messages in chronological order
         data.sort(key=lambda x: x["timestamp"])
         # data = data[:100]
-        # process each frame
-        for frame in data:
-            try:
-                parse_and_store_frame(satellite,
-                                      frame["timestamp"],
-                                      frame["frame"],
-                                      frame["observer"],
-                                      "downlink"
-                                      )
-            except XTCEParser.XTCEException as _:
-                # ignore
-                pass
+        # process each frame, the rollups are updated once per batch of frames
+        for i in range(0, len(data), RAW_FRAMES_BATCH_SIZE):
+            timestamps = []
+            for frame in data[i:i + RAW_FRAMES_BATCH_SIZE]:
+                try:
+                    if parse_and_store_frame(satellite,
+                                             frame["timestamp"],
+                                             frame["frame"],
+                                             frame["observer"],
+                                             "downlink"
+                                             ):
+                        timestamps.append(frame["timestamp"])
+                except XTCEParser.XTCEException as _:
+                    # ignore
+                    pass
+            update_derived_telemetry(satellite, "downlink", timestamps)
     return len(data)
 
 
@@ -55,15 +62,8 @@ def add_dummy_tlm_raw_data(satellite, input_file):
         data = json.load(file)
         # sort messages in chronological order
         data.sort(key=lambda x: x["timestamp"])
-        # data = data[:100]
-        # process each frame
-        for frame in data:
-            stored = store_raw_frame(satellite,
-                                     frame["timestamp"],
-                                     frame["frame"],
-                                     frame["observer"],
-                                     "downlink")
-            if stored:
-                stored_frames += 1
+        # store the frames in batches
+        for i in range(0, len(data), RAW_FRAMES_BATCH_SIZE):
+            stored_frames += store_raw_frames(satellite, data[i:i + RAW_FRAMES_BATCH_SIZE], "downlink")
 
     return len(data), stored_frames
@@ -0,0 +1,127 @@
+"""Cache resolving API keys and usernames to the submitting member and its permissions."""
+import hashlib
+import os
+import random
+import uuid
+from typing import NamedTuple
+
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from members.models import APIKey, Member
+
+# time (seconds) a resolved API key is cached, bounds how long a change made in another process stays unnoticed
+API_KEY_CACHE_TIMEOUT = int(os.environ.get('API_KEY_CACHE_TIMEOUT', 60))
+
+API_KEY_CACHE_PREFIX = "api_key:"
+MEMBER_VERSION_CACHE_PREFIX = "api_key_member_version:"
+GLOBAL_VERSION_CACHE_KEY = "api_key_global_version"
+
+
+class Submitter(NamedTuple):
+    """The member submitting frames, with the permissions resolved once."""
+    username: str
+    UUID: uuid.UUID
+    permissions: frozenset
+
+    def has_perm(self, perm: str) -> bool:
+        """Return True if the submitter has the permission."""
+        return perm in self.permissions
+
+    def __str__(self):
+        return self.username
+
+
+def get_submitter(username: str) -> Submitter:
+    """Look up a member and its permissions.
+    Raises Member.DoesNotExist if there is no member with this username."""
+    member = Member.objects.get(username=username)
+    return Submitter(member.username, member.UUID, frozenset(member.get_all_permissions()))
+
+
+def get_submitter_from_api_key(key: str) -> Submitter:
+    """Resolve an API key to the member it belongs to. The result is cached such that the slow
+    API key hash check and the member lookup don't run on every submission.
+    Raises APIKey.DoesNotExist if the key is not valid."""
+    # the key itself is not used in the cache, only its digest
+    cache_key = API_KEY_CACHE_PREFIX + hashlib.sha256(key.encode()).hexdigest()
+
+    cached = cache.get(cache_key)
+    if cached is not None:
+        global_version, member_version, submitter = cached
+        if global_version == _get_version(GLOBAL_VERSION_CACHE_KEY) and \
+                member_version == _get_version(MEMBER_VERSION_CACHE_PREFIX + submitter.username):
+            return submitter
+
+    # read the versions before resolving the key, such that a concurrent change invalidates the entry
+    global_version = _get_version(GLOBAL_VERSION_CACHE_KEY)
+    api_key = APIKey.objects.get_from_key(key)
+    member_version = _get_version(MEMBER_VERSION_CACHE_PREFIX + api_key.name)
+    submitter = get_submitter(api_key.name)
+
+    cache.set(cache_key, (global_version, member_version, submitter), API_KEY_CACHE_TIMEOUT)
+    return submitter
+
+
+def invalidate_member(username: str) -> None:
+    """Invalidate the cached API keys of a member."""
+    _bump_version(MEMBER_VERSION_CACHE_PREFIX + username)
+
+
+def invalidate_all() -> None:
+    """Invalidate all cached API keys."""
+    _bump_version(GLOBAL_VERSION_CACHE_KEY)
+
+
+def _get_version(version_key: str) -> int:
+    version = cache.get(version_key)
+    if version is None:
+        # a version that is missing (never set or evicted) starts from a random value, such that
+        # it does not match the version of the entries cached before it was evicted
+        cache.add(version_key, _new_version(), timeout=None)
+        version = cache.get(version_key)
+    return version
+
+
+def _bump_version(version_key: str) -> None:
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        # the version is missing (never set or evicted)
+        cache.set(version_key, _new_version(), timeout=None)
+
+
+def _new_version() -> int:
+    return random.getrandbits(62)
+
+
+@receiver([post_save, post_delete], sender=APIKey)
+def api_key_changed(sender, instance, **kwargs):  # pylint: disable=W0613
+    """A key was created, revoked or deleted."""
+    invalidate_member(instance.name)
+
+
+@receiver([post_save, post_delete], sender=Member)
+def member_changed(sender, instance, **kwargs):  # pylint: disable=W0613
+    """A member was modified (e.g. deactivated or promoted to superuser) or removed."""
+    invalidate_member(instance.username)
+
+
+@receiver(m2m_changed, sender=Member.user_permissions.through)
+@receiver(m2m_changed, sender=Member.groups.through)
+def member_permissions_changed(sender, instance, reverse, **kwargs):  # pylint: disable=W0613
+    """The permissions or groups of a member changed."""
+    if reverse:
+        # the change was made from the permission/group side, possibly affecting many members
+        invalidate_all()
+    else:
+        invalidate_member(instance.username)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_delete, sender=Group)
+def group_permissions_changed(sender, **kwargs):  # pylint: disable=W0613
+    """The permissions of a group changed."""
+    invalidate_all()
@@ -0,0 +1,25 @@
+"""Entry points of the bucket processing run by spawned worker processes (the scheduler process pool
+and the reprocessing process pool). This module can be imported before django is set up."""
+import django
+from django.apps import apps
+from django.db import connections
+
+
+def setup_worker() -> None:
+    """Set up django in a worker process, once."""
+    if not apps.ready:
+        django.setup()
+
+
+def run_raw_bucket_processing(satellite: str, link: str = None, all_frames: bool = False,
+                              failed: bool = False, restart: bool = False) -> None:
+    """Set up django in the worker process (on the first job) and process the raw bucket of a satellite."""
+    setup_worker()
+
+    # the processing modules use the django models, which can only be imported after the setup
+    from transmission.processing.process_raw_bucket import process_raw_bucket  # pylint:disable=C0415
+
+    try:
+        process_raw_bucket(satellite, link, all_frames, failed, restart)
+    finally:
+        connections.close_all()
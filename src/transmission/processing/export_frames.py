@@ -0,0 +1,151 @@
+"""Streaming export of the uplink/downlink frames as CSV, NDJSON or Parquet.
+The rows are read with a server-side cursor and encoded chunk by chunk,
+such that memory usage does not depend on the number of exported frames."""
+import csv
+import json
+import os
+from itertools import islice
+from typing import Iterator
+
+from django.db.models.query import QuerySet
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# number of rows fetched from the database (and written as one Parquet row group) at once
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 5000))
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def get_export_fields(link: str) -> list:
+    """Columns of the exported frames."""
+    radio_amateur = "operator" if link == "uplink" else "observer"
+    return ["id", "timestamp", radio_amateur, "application", "processed", "invalid", "frequency", "frame", "metadata"]
+
+
+def iter_frame_rows(frames: QuerySet, fields: list) -> Iterator:
+    """Yield the frames as dicts of export values, fetched with a server-side cursor."""
+    for row in frames.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        row = dict(zip(fields, row))
+        row["timestamp"] = row["timestamp"].isoformat()
+        row["frame"] = bytes(row["frame"]).hex().upper()
+        yield row
+
+
+class _Echo:
+    """File-like object returning what is written, used to stream the output of csv.writer"""
+
+    def write(self, value):
+        """Return the written value instead of storing it"""
+        return value
+
+
+def iter_csv(frames: QuerySet, fields: list) -> Iterator:
+    """Yield the frames as CSV lines, starting with the header."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in iter_frame_rows(frames, fields):
+        if row["metadata"] is not None and not isinstance(row["metadata"], str):
+            row["metadata"] = json.dumps(row["metadata"])
+        yield writer.writerow([row[field] for field in fields])
+
+
+def iter_ndjson(frames: QuerySet, fields: list) -> Iterator:
+    """Yield the frames as newline delimited JSON."""
+    for row in iter_frame_rows(frames, fields):
+        yield json.dumps(row) + "\n"
+
+
+class _ParquetSink:
+    """Write-only file collecting the output of the Parquet writer until it is drained"""
+
+    def __init__(self) -> None:
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        """Collect the written bytes"""
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        """Number of bytes written so far, used by the writer for the file metadata"""
+        return self.position
+
+    def flush(self) -> None:
+        """Nothing to flush, the collected bytes are drained by the caller"""
+
+    def close(self) -> None:
+        """Mark the file as closed"""
+        self.closed = True
+
+    def drain(self) -> bytes:
+        """Return and forget the bytes written since the last drain"""
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_parquet(frames: QuerySet, fields: list) -> Iterator:
+    """Yield a Parquet file containing the frames, one row group per EXPORT_CHUNK_SIZE frames.
+    Requires pyarrow."""
+    if pyarrow is None:
+        raise ImportError("Parquet export requires pyarrow")
+
+    schema = pyarrow.schema([
+        (fields[0], pyarrow.int64()),
+        (fields[1], pyarrow.string()),
+        (fields[2], pyarrow.string()),
+        (fields[3], pyarrow.string()),
+        (fields[4], pyarrow.bool_()),
+        (fields[5], pyarrow.bool_()),
+        (fields[6], pyarrow.float64()),
+        (fields[7], pyarrow.string()),
+        (fields[8], pyarrow.string()),
+    ])
+
+    sink = _ParquetSink()
+    writer = pyarrow.parquet.ParquetWriter(pyarrow.PythonFile(sink, mode="w"), schema)
+    rows = iter_frame_rows(frames, fields)
+    while True:
+        chunk = list(islice(rows, EXPORT_CHUNK_SIZE))
+        if not chunk:
+            break
+        for row in chunk:
+            if row["metadata"] is not None and not isinstance(row["metadata"], str):
+                row["metadata"] = json.dumps(row["metadata"])
+        writer.write_table(pyarrow.Table.from_pylist(chunk, schema=schema))
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+
+EXPORT_WRITERS = {
+    "csv": iter_csv,
+    "ndjson": iter_ndjson,
+    "parquet": iter_parquet,
+}
+
+
+def is_export_format_available(export_format: str) -> bool:
+    """Return True if the frames can be exported in the given format."""
+    if export_format == "parquet":
+        return pyarrow is not None
+    return export_format in EXPORT_WRITERS
+
+
+def export_frames_stream(frames: QuerySet, link: str, export_format: str) -> Iterator:
+    """Return the iterator encoding the frames in the export format."""
+    return EXPORT_WRITERS[export_format](frames, get_export_fields(link))
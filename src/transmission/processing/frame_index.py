@@ -0,0 +1,61 @@
+"""Local index of the frames stored in the influxdb raw data buckets.
+Each stored frame is recorded as a fingerprint (hash of satellite, link, timestamp and frame)
+in a table with a unique index, such that duplicates are found without querying influxdb."""
+from datetime import datetime
+import hashlib
+from itertools import islice
+
+from django_logger import logger
+from transmission.models import RawFrameFingerprint
+from transmission.processing.satellites import TIME_FORMAT
+
+# number of fingerprints inserted at once
+FINGERPRINTS_BATCH_SIZE = 5000
+
+
+def get_frame_fingerprint(satellite: str, link: str, timestamp: datetime, frame: str) -> str:
+    """Return the fingerprint of a frame received at the given time (second precision).
+    The HEX frame is case insensitive, older raw data may hold lower case frames."""
+    key = "|".join([satellite, link, timestamp.strftime(TIME_FORMAT), frame.upper()])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def get_stored_fingerprints(fingerprints: list) -> set:
+    """Return the subset of fingerprints that are already in the index."""
+    return set(RawFrameFingerprint.objects.filter(fingerprint__in=fingerprints)
+               .values_list("fingerprint", flat=True))
+
+
+def add_fingerprints(fingerprints) -> None:
+    """Add fingerprints to the index, fingerprints already in the index are ignored."""
+    fingerprints = iter(fingerprints)
+    while True:
+        batch = [RawFrameFingerprint(fingerprint=fingerprint)
+                 for fingerprint in islice(fingerprints, FINGERPRINTS_BATCH_SIZE)]
+        if not batch:
+            break
+        RawFrameFingerprint.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def rebuild_frame_index(query_api, satellite: str, link: str) -> int:
+    """Add the fingerprints of all frames stored in the raw data bucket of a satellite and link.
+    Returns the number of frames read from the bucket."""
+
+    query = f'''from(bucket: "{satellite + "_raw_data"}")
+    |> range(start: 0, stop: now())
+    |> filter(fn: (r) => r._measurement == "{satellite + "_" + link + "_raw_data"}")
+    |> filter(fn: (r) => r["_field"] == "frame")
+    |> keep(columns: ["_time", "_value"])
+    '''
+    frames_count = 0
+
+    def fingerprints():
+        nonlocal frames_count
+        for record in query_api.query_stream(query=query):
+            frames_count += 1
+            yield get_frame_fingerprint(satellite, link, record.get_time(), record.get_value())
+
+    add_fingerprints(fingerprints())
+    logger.info("%s: frame index rebuilt from %s raw %s frames", satellite, frames_count, link)
+
+    return frames_count
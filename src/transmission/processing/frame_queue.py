@@ -0,0 +1,141 @@
+"""Queue of the raw frames waiting to be parsed, keyed by satellite, link, timestamp and frame hash.
+Frames are enqueued when they are stored in the influxdb raw data buckets and dequeued in batches
+by the raw bucket processing, such that the processing cost depends on the number of new frames.
+Frames that could not be processed are retried with exponential backoff and moved to the
+dead-letter state after FRAME_QUEUE_MAX_ATTEMPTS attempts."""
+from datetime import timedelta
+from itertools import islice
+import os
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from transmission.models import QueuedFrame, get_frame_hash
+from transmission.processing.satellites import TIME_FORMAT, to_datetime
+
+# number of attempts after which a frame is moved to the dead-letter state
+FRAME_QUEUE_MAX_ATTEMPTS = int(os.environ.get('FRAME_QUEUE_MAX_ATTEMPTS', 5))
+# delay (seconds) before the first retry, doubled after every failed attempt
+FRAME_QUEUE_RETRY_DELAY = int(os.environ.get('FRAME_QUEUE_RETRY_DELAY', 60))
+FRAME_QUEUE_MAX_RETRY_DELAY = int(os.environ.get('FRAME_QUEUE_MAX_RETRY_DELAY', 24 * 3600))
+# time (seconds) a dequeued frame is hidden from other workers,
+# the frames of a worker that stopped before acknowledging them are dequeued again afterwards
+FRAME_QUEUE_LEASE = int(os.environ.get('FRAME_QUEUE_LEASE', 600))
+
+# number of frames inserted at once
+ENQUEUE_BATCH_SIZE = 5000
+
+
+def get_queued_frame_hash(frame: str) -> str:
+    """Return the hash of a HEX frame, the same as the hash of the frame bytes in the buffer tables."""
+    try:
+        return get_frame_hash(bytes.fromhex(frame))
+    except ValueError:
+        return get_frame_hash(frame.encode())
+
+
+def get_retry_delay(attempts: int) -> int:
+    """Return the delay (seconds) before retrying a frame that failed the given number of attempts."""
+    return min(FRAME_QUEUE_RETRY_DELAY * 2 ** (attempts - 1), FRAME_QUEUE_MAX_RETRY_DELAY)
+
+
+def get_queued_frames(satellite: str, link: str, frames: list) -> list:
+    """Return the queue entries of raw frames (dicts with frame, timestamp and observer or operator)."""
+    return [QueuedFrame(satellite=satellite, link=link, timestamp=to_datetime(frame["timestamp"]),
+                        frame_hash=get_queued_frame_hash(frame["frame"]), frame=frame["frame"],
+                        observer=frame.get("observer", frame.get("operator")))
+            for frame in frames]
+
+
+def enqueue_frames(satellite: str, link: str, frames: list) -> None:
+    """Add raw frames (dicts with frame, timestamp and observer or operator) to the queue.
+    Frames that are already queued are ignored."""
+    QueuedFrame.objects.bulk_create(get_queued_frames(satellite, link, frames), batch_size=ENQUEUE_BATCH_SIZE,
+                                    ignore_conflicts=True)
+
+
+def requeue_frames(satellite: str, link: str, frames: list) -> None:
+    """Add raw frames to the queue, due immediately with a new number of attempts.
+    Frames that are already queued (e.g. waiting for a retry or in the dead-letter state) are reset."""
+    QueuedFrame.objects.bulk_create(get_queued_frames(satellite, link, frames), batch_size=ENQUEUE_BATCH_SIZE,
+                                    update_conflicts=True,
+                                    unique_fields=["satellite", "link", "timestamp", "frame_hash"],
+                                    update_fields=["status", "attempts", "next_attempt"])
+
+
+def has_due_frames(satellite: str) -> bool:
+    """Return True if frames of a satellite are due, including the frames of which the lease expired."""
+    return QueuedFrame.objects.filter(satellite=satellite, status__in=[QueuedFrame.PENDING, QueuedFrame.RETRY],
+                                      next_attempt__lte=timezone.now()).exists()
+
+
+def enqueue_time_range(query_api, satellite: str, link: str, start, end) -> int:
+    """Add the raw frames of a satellite link received between start and end (inclusive) to the queue,
+    e.g. the time ranges of new or failed frames of the previous releases. Returns the number of frames."""
+    radio_amateur = "operator" if link == "uplink" else "observer"
+    query = f'''
+        from(bucket: "{satellite + "_raw_data"}")
+        |> range(start: {start.strftime(TIME_FORMAT)}, stop: {(end + timedelta(seconds=1)).strftime(TIME_FORMAT)})
+        |> filter(fn: (r) => r._measurement == "{satellite + "_" + link + "_raw_data"}")
+        |> filter(fn: (r) => r["_field"] == "frame" or r["_field"] == "{radio_amateur}")
+        |> pivot(rowKey:["_time"], columnKey: ["_field"], valueColumn: "_value")
+        '''
+    frames = ({"timestamp": record.values["_time"], "frame": record.values["frame"],
+               "observer": record.values.get(radio_amateur)}
+              for record in query_api.query_stream(query=query) if record.values.get("frame"))
+
+    frames_count = 0
+    while True:
+        batch = list(islice(frames, ENQUEUE_BATCH_SIZE))
+        if not batch:
+            return frames_count
+        enqueue_frames(satellite, link, batch)
+        frames_count += len(batch)
+
+
+def dequeue_frames(satellite: str, link: str, batch_size: int) -> list:
+    """Return up to batch_size queued frames of a satellite link that are due, and lease them for
+    FRAME_QUEUE_LEASE seconds. Locked frames are skipped, such that multiple workers can drain the queue."""
+    now = timezone.now()
+    with transaction.atomic():
+        entries = list(QueuedFrame.objects.select_for_update(skip_locked=True)
+                       .filter(satellite=satellite, link=link, status__in=[QueuedFrame.PENDING, QueuedFrame.RETRY],
+                               next_attempt__lte=now)
+                       .order_by("next_attempt")[:batch_size])
+        QueuedFrame.objects.filter(pk__in=[entry.pk for entry in entries]) \
+            .update(attempts=F("attempts") + 1, next_attempt=now + timedelta(seconds=FRAME_QUEUE_LEASE))
+
+    for entry in entries:
+        entry.attempts += 1
+    return entries
+
+
+def complete_frames(entries: list) -> None:
+    """Remove the processed frames from the queue."""
+    QueuedFrame.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+
+
+def retry_frames(failures: list) -> None:
+    """Schedule the retry of the frames that failed, given as (entry, error) pairs.
+    Frames that failed FRAME_QUEUE_MAX_ATTEMPTS attempts are moved to the dead-letter state."""
+    now = timezone.now()
+    entries = []
+    for entry, error in failures:
+        entry.last_error = error
+        if entry.attempts >= FRAME_QUEUE_MAX_ATTEMPTS:
+            entry.status = QueuedFrame.DEAD
+        else:
+            entry.status = QueuedFrame.RETRY
+            entry.next_attempt = now + timedelta(seconds=get_retry_delay(entry.attempts))
+        entries.append(entry)
+
+    QueuedFrame.objects.bulk_update(entries, ["status", "next_attempt", "last_error"])
+
+
+def requeue_failed_frames(satellite: str, link: str) -> int:
+    """Make the failed (retry and dead-letter) frames of a satellite link due immediately, with a new
+    number of attempts, e.g. after the XTCE definitions were fixed. Returns the number of requeued frames."""
+    return QueuedFrame.objects.filter(satellite=satellite, link=link,
+                                      status__in=[QueuedFrame.RETRY, QueuedFrame.DEAD]) \
+        .update(status=QueuedFrame.PENDING, attempts=0, next_attempt=timezone.now())
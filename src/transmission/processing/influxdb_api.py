@@ -1,14 +1,23 @@
 """Methods for saving raw data frames and retrieving the influxdb API."""
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import os
+import time
+from urllib3.exceptions import HTTPError
 from influxdb_client import InfluxDBClient
+from influxdb_client.client.exceptions import InfluxDBError
 from influxdb_client.client.write_api import SYNCHRONOUS
 
+from transmission.processing.frame_index import add_fingerprints, get_frame_fingerprint, get_stored_fingerprints
+from transmission.processing.frame_queue import enqueue_frames
 from transmission.processing.satellites import TIME_FORMAT
 from django_logger import logger
 
 INFLUXDB_URL = "http://influxdb:8086"
 INFLUX_ORG = os.environ.get('INFLUXDB_V2_ORG', 'Delfi Space')
+# maximum number of points sent in one write request
+INFLUXDB_BATCH_SIZE = int(os.environ.get('INFLUXDB_BATCH_SIZE', 5000))
+# maximum time (seconds) points are buffered before being written
+INFLUXDB_FLUSH_INTERVAL = float(os.environ.get('INFLUXDB_FLUSH_INTERVAL', 10))
 
 
 def get_influxdb_client():
@@ -40,65 +49,165 @@ def get_influx_db_read_and_query_api() -> tuple:
     return (write_api, query_api)
 
 
-def write_frame_to_raw_bucket(write_api, satellite, link, timestamp, frame_fields) -> None:
-    """Save frame given its fields. Note: to update/overwrite a field write the frame again
-    with the changed fields and the same timestamp as before."""
+def format_flux_time(timestamp: datetime) -> str:
+    """Format a timestamp as RFC3339 as used in flux queries."""
+    return timestamp.astimezone(timezone.utc).strftime(TIME_FORMAT)
 
-    tags = {}
 
-    bucket = satellite + "_raw_data"
+def get_bucket_time_range(query_api, bucket: str):
+    """Return the (first, last) time of the points in a bucket, None if the bucket is empty."""
+    query = f'''
+        earliest = from(bucket: "{bucket}") |> range(start: 0) |> first() |> group() |> min(column: "_time")
+        latest = from(bucket: "{bucket}") |> range(start: 0) |> last() |> group() |> max(column: "_time")
+        union(tables: [earliest, latest]) |> keep(columns: ["_time"]) |> sort(columns: ["_time"])
+        '''
+    times = [record.values["_time"] for table in query_api.query(query) for record in table.records]
+    if not times:
+        return None
+    return times[0], times[-1]
+
 
-    db_fields = {
+def raw_frame_point(satellite, link, timestamp, frame_fields) -> dict:
+    """Return the raw data bucket point of a frame given its fields."""
+    return {
         "measurement": satellite + "_" + link + "_raw_data",
         "time": timestamp,
-        "tags": tags,
+        "tags": {},
         "fields": frame_fields
     }
 
+
+def write_frame_to_raw_bucket(write_api, satellite, link, timestamp, frame_fields) -> None:
+    """Save frame given its fields. Note: to update/overwrite a field write the frame again
+    with the changed fields and the same timestamp as before."""
+
+    bucket = satellite + "_raw_data"
+
+    db_fields = raw_frame_point(satellite, link, timestamp, frame_fields)
+
     logger.info("%s: raw frame stored or updated. Frame timestamp: %s, link: %s, bucket: %s",
                 satellite, timestamp, link, bucket)
 
     write_api.write(bucket, INFLUX_ORG, db_fields)
 
 
-def commit_frame(write_api, query_api, satellite: str, link: str, tlm: dict) -> bool:
+class PointBatch:
+    """Buffer the points of multiple frames and write them to a bucket in one request.
+    The batch is flushed when it holds at least batch_size points or when flush_interval seconds
+    have passed since the last flush. Each frame is identified by a key (e.g. its timestamp) such that
+    the caller can find out which frames were written and which failed."""
+
+    def __init__(self, write_api, bucket: str, batch_size: int = INFLUXDB_BATCH_SIZE,
+                 flush_interval: float = INFLUXDB_FLUSH_INTERVAL) -> None:
+        self.write_api = write_api
+        self.bucket = bucket
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.frames = []
+        self.points_count = 0
+        self.last_flush = time.monotonic()
+
+    def add(self, key, points: list) -> tuple:
+        """Add the points of one frame to the batch.
+        Returns the (written, failed) frame keys if the batch was flushed, empty lists otherwise."""
+        self.frames.append((key, points))
+        self.points_count += len(points)
+
+        if self.points_count >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            return self.flush()
+        return [], []
+
+    def flush(self) -> tuple:
+        """Write all buffered points. If the batch is rejected, the frames are written one by one
+        such that only the failing frames are reported. Returns the (written, failed) frame keys."""
+        written = []
+        failed = []
+
+        if self.frames:
+            try:
+                points = [point for _, frame_points in self.frames for point in frame_points]
+                self.write_api.write(self.bucket, INFLUX_ORG, points)
+                written = [key for key, _ in self.frames]
+            except (InfluxDBError, HTTPError) as ex:
+                logger.warning("batch write of %s points to %s failed (%s), retrying frame by frame",
+                               self.points_count, self.bucket, ex)
+                for key, frame_points in self.frames:
+                    try:
+                        self.write_api.write(self.bucket, INFLUX_ORG, frame_points)
+                        written.append(key)
+                    except (InfluxDBError, HTTPError) as frame_ex:
+                        logger.error("write of frame %s to %s failed: %s", key, self.bucket, frame_ex)
+                        failed.append(key)
+
+        self.frames = []
+        self.points_count = 0
+        self.last_flush = time.monotonic()
+
+        return written, failed
+
+
+def commit_frames(write_api, satellite: str, link: str, frames: list) -> list:
+    """Write the frames that are not already stored to the raw data bucket of the satellite.
+    A frame is a duplicate if the same frame is stored within 1 second of its timestamp.
+    Duplicates are looked up in the local frame index, the new frames are written
+    in one request and queued for processing. Returns the list of frames that were stored."""
+
+    if not frames:
+        return []
+
+    frames_fingerprints = []
+    for tlm in frames:
+        tlm_time = datetime.strptime(tlm['timestamp'], TIME_FORMAT)
+        fingerprints = [get_frame_fingerprint(satellite, link, tlm_time + timedelta(seconds=delta), tlm["frame"])
+                        for delta in (-1, 0, 1)]
+        frames_fingerprints.append((tlm, fingerprints))
+
+    stored_fingerprints = get_stored_fingerprints([fingerprint for _, fingerprints in frames_fingerprints
+                                                   for fingerprint in fingerprints])
+
+    new_frames = []
+    new_fingerprints = []
+    for tlm, fingerprints in frames_fingerprints:
+        if stored_fingerprints.intersection(fingerprints):
+            continue
+
+        # duplicates within the batch are stored only once
+        stored_fingerprints.add(fingerprints[1])
+        new_fingerprints.append(fingerprints[1])
+        new_frames.append(tlm)
+
+    if new_frames:
+        points = [raw_frame_point(satellite, link, tlm["timestamp"], tlm) for tlm in new_frames]
+        write_api.write(satellite + "_raw_data", INFLUX_ORG, points)
+        add_fingerprints(new_fingerprints)
+        enqueue_frames(satellite, link, new_frames)
+        logger.info("%s: %s new raw %s frames stored out of %s", satellite, len(new_frames), link, len(frames))
+
+    return new_frames
+
+
+def commit_frame(write_api, satellite: str, link: str, tlm: dict) -> bool:
     """Write frame to corresponding satellite table (if not already stored).
     Returns True if the frame was stored and False otherwise (if the frame is already stored).
-    Also store the frame with processed = False."""
+    Also queue the frame for processing."""
+
+    return len(commit_frames(write_api, satellite, link, [tlm])) == 1
 
-    bucket = satellite + "_raw_data"
-    tlm_time = datetime.strptime(tlm['timestamp'], TIME_FORMAT)
 
-    time_range_lower_bound = (tlm_time - timedelta(seconds=1)).strftime(TIME_FORMAT)
-    time_range_upper_bound = (tlm_time + timedelta(seconds=1)).strftime(TIME_FORMAT)
+def save_raw_frames_to_influxdb(satellite: str, link: str, telemetry: list) -> list:
+    """Connect to influxdb and save a list of raw frames.
+    Return the list of frames that were stored."""
 
-    # check if frame already exists
-    query = f'''from(bucket: "{bucket}")
-    |> range(start: {time_range_lower_bound}, stop: {time_range_upper_bound})
-    |> filter(fn: (r) => r._measurement == "{satellite + "_" + link + "_raw_data"}")
-    |> filter(fn: (r) => r["_field"] == "frame" and r["_value"] == "{tlm["frame"]}")
-    '''
-    # store frame only if not stored already
-    if len(query_api.query(query=query)) != 0:
-        return False
+    write_api, _ = get_influx_db_read_and_query_api()
 
-    tlm["processed"] = False
-    write_frame_to_raw_bucket(write_api, satellite, link, tlm["timestamp"], tlm)
-    return True
+    return commit_frames(write_api, satellite, link, telemetry)
 
 
 def save_raw_frame_to_influxdb(satellite: str, link: str, telemetry) -> bool:
     """Connect to influxdb and save raw telemetry.
     Return True if telemetry was stored, False otherwise."""
 
-    write_api, query_api = get_influx_db_read_and_query_api()
-
-    stored = False
-
-    if isinstance(telemetry, list):
-        for tlm in telemetry:
-            stored = stored or commit_frame(write_api, query_api, satellite, link, tlm)
-    elif isinstance(telemetry, dict):
-        stored = stored or commit_frame(write_api, query_api, satellite, link, telemetry)
+    if isinstance(telemetry, dict):
+        telemetry = [telemetry]
 
-    return stored
+    return len(save_raw_frames_to_influxdb(satellite, link, telemetry)) != 0
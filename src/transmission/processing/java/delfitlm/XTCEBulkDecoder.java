@@ -0,0 +1,105 @@
+package delfitlm;
+
+import org.xtce.toolkit.XTCEContainerContentEntry;
+import org.xtce.toolkit.XTCEContainerContentModel;
+import org.xtce.toolkit.XTCEContainerEntryValue;
+import org.xtce.toolkit.XTCEParameter;
+import org.xtce.toolkit.XTCETMStream;
+import org.xtce.toolkit.XTCEValidRange;
+
+/**
+ * Decodes a batch of frames in a single call, such that processing many frames
+ * costs one round-trip over the py4j gateway instead of several calls per field.
+ *
+ * The input is a newline separated list of hexadecimal frames. The output has one
+ * line per record, with tab separated columns:
+ *   F  container name                  (start of a successfully decoded frame)
+ *   V  name  calibrated value  status  (one telemetry field of the current frame)
+ *   E  error message                   (the frame could not be decoded)
+ *
+ * Compile against xtcetools-1.1.5.jar and package as xtce-bulk-decoder.jar
+ * next to it (see the Dockerfile).
+ */
+public final class XTCEBulkDecoder {
+
+    private XTCEBulkDecoder() {
+    }
+
+    public static String decode(XTCETMStream stream, String frames) {
+        StringBuilder result = new StringBuilder();
+
+        for (String frame : frames.split("\n", -1)) {
+            StringBuilder decoded = new StringBuilder();
+            try {
+                XTCEContainerContentModel model = stream.processStream(hexToBytes(frame));
+                decoded.append("F\t").append(clean(model.getName())).append('\n');
+
+                for (XTCEContainerContentEntry entry : model.getContentList()) {
+                    XTCEContainerEntryValue value = entry.getValue();
+                    if (value == null) {
+                        continue;
+                    }
+                    decoded.append("V\t")
+                           .append(clean(entry.getName())).append('\t')
+                           .append(clean(value.getCalibratedValue())).append('\t')
+                           .append(fieldStatus(entry)).append('\n');
+                }
+            } catch (Exception ex) {
+                decoded = new StringBuilder();
+                decoded.append("E\t").append(clean(ex.toString())).append('\n');
+            }
+            result.append(decoded);
+        }
+
+        return result.toString();
+    }
+
+    /** Same validity check as XTCEParser.isFieldValid on the python side. */
+    private static String fieldStatus(XTCEContainerContentEntry entry) {
+        XTCEParameter param = entry.getParameter();
+        if (param == null) {
+            return "Valid";
+        }
+
+        XTCEValidRange range = param.getValidRange();
+        if (!range.isValidRangeApplied()) {
+            return "Valid";
+        }
+
+        XTCEContainerEntryValue value = entry.getValue();
+
+        double low = Double.parseDouble(range.isLowValueCalibrated()
+                ? value.getCalibratedValue() : value.getUncalibratedValue());
+        double lowLimit = Double.parseDouble(range.getLowValue());
+        if (range.isLowValueInclusive() ? low < lowLimit : low <= lowLimit) {
+            return "Too Low";
+        }
+
+        double high = Double.parseDouble(range.isHighValueCalibrated()
+                ? value.getCalibratedValue() : value.getUncalibratedValue());
+        double highLimit = Double.parseDouble(range.getHighValue());
+        if (range.isHighValueInclusive() ? high > highLimit : high >= highLimit) {
+            return "Too High";
+        }
+
+        return "Valid";
+    }
+
+    private static byte[] hexToBytes(String hex) {
+        if (hex.length() % 2 != 0) {
+            throw new IllegalArgumentException("Invalid frame, odd number of hexadecimal digits");
+        }
+        byte[] data = new byte[hex.length() / 2];
+        for (int i = 0; i < data.length; i++) {
+            data[i] = (byte) Integer.parseInt(hex.substring(2 * i, 2 * i + 2), 16);
+        }
+        return data;
+    }
+
+    private static String clean(String text) {
+        if (text == null) {
+            return "";
+        }
+        return text.replace('\t', ' ').replace('\n', ' ').replace('\r', ' ');
+    }
+}
@@ -0,0 +1,149 @@
+"""Incremental JSON parsing of frame submissions, such that large uploads
+are never loaded into memory as a whole."""
+import codecs
+import gzip
+import json
+import zlib
+from typing import Iterator
+
+from django.core.exceptions import BadRequest
+
+try:
+    # standard library from python 3.14
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+# errors raised while reading corrupted compressed submissions
+DECOMPRESSION_ERRORS = (gzip.BadGzipFile, EOFError, zlib.error) + ((zstd.ZstdError,) if zstd is not None else ())
+
+# size of the blocks read from the stream
+JSON_STREAM_READ_SIZE = 64 * 1024
+
+JSON_WHITESPACE = " \t\n\r"
+
+_decoder = json.JSONDecoder()
+
+
+class JsonStreamReader:
+    """Buffered reader of a binary stream containing JSON values."""
+
+    def __init__(self, stream, read_size: int = JSON_STREAM_READ_SIZE) -> None:
+        self.stream = stream
+        self.read_size = read_size
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def read_block(self) -> bool:
+        """Append the next block of the stream to the buffer, dropping the consumed part.
+        Returns False if the end of the stream was already reached."""
+        if self.eof:
+            return False
+
+        data = self.stream.read(self.read_size)
+        if not data:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + self.text_decoder.decode(data, final=self.eof)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, or an empty string at the end of the stream."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in JSON_WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read_block():
+                return ""
+
+    def next_char(self) -> str:
+        """Consume and return the next non-whitespace character."""
+        char = self.peek()
+        self.pos += len(char)
+        return char
+
+    def decode_value(self):
+        """Decode the next JSON value, reading more blocks until the value is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # a value ending at the end of the buffer might continue in the next block, e.g. a number
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.read_block()
+
+    def error(self, message: str) -> json.JSONDecodeError:
+        """Build a decode error at the current position."""
+        return json.JSONDecodeError(message, self.buffer, self.pos)
+
+
+def iter_json_values(stream, read_size: int = JSON_STREAM_READ_SIZE) -> Iterator:
+    """Yield the values of a JSON submission read from a binary stream one at a time.
+    If the submission is a JSON array, its items are yielded. Otherwise, the top-level values
+    are yielded, i.e. a single JSON document or newline delimited JSON documents (NDJSON).
+    Raises json.JSONDecodeError for invalid JSON, or if the stream holds no JSON value."""
+    reader = JsonStreamReader(stream, read_size)
+
+    if not reader.peek():
+        raise reader.error("Expecting value")
+
+    if reader.peek() != "[":
+        while reader.peek():
+            yield reader.decode_value()
+        return
+
+    reader.next_char()
+    if reader.peek() == "]":
+        reader.next_char()
+    else:
+        while True:
+            yield reader.decode_value()
+            char = reader.next_char()
+            if char == "]":
+                break
+            if char != ",":
+                raise reader.error("Expecting ',' delimiter")
+
+    if reader.peek():
+        raise reader.error("Extra data")
+
+
+def iter_lines(stream, read_size: int = JSON_STREAM_READ_SIZE) -> Iterator:
+    """Yield the lines of a binary stream (without line endings) with their line number, starting at 1."""
+    line_number = 1
+    remainder = b""
+    while True:
+        data = stream.read(read_size)
+        if not data:
+            break
+        lines = (remainder + data).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            yield line_number, line.rstrip(b"\r")
+            line_number += 1
+
+    if remainder.strip():
+        yield line_number, remainder.rstrip(b"\r")
+
+
+def open_submission_stream(stream, content_encoding: str = ""):
+    """Wrap a request stream to decompress a gzip or zstd encoded submission on the fly.
+    Raises BadRequest for unsupported encodings."""
+    content_encoding = content_encoding.strip().lower()
+
+    if content_encoding in ("", "identity"):
+        return stream
+    if content_encoding in ("gzip", "x-gzip"):
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    if content_encoding == "zstd" and zstd is not None:
+        return zstd.ZstdFile(stream, mode="rb")
+
+    raise BadRequest(f"Unsupported content encoding: {content_encoding}")
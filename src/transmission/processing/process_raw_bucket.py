@@ -1,51 +1,57 @@
 """Script to store satellite telemetry frames"""
-import string
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import os
+from django.db import connection
 from transmission.processing import XTCEParser as xtce_parser
 from django_logger import logger
-import transmission.processing.bookkeep_new_data_time_range as time_range
-from transmission.processing.influxdb_api import INFLUX_ORG, commit_frame, \
-    get_influx_db_read_and_query_api, write_frame_to_raw_bucket
+from transmission.processing import frame_queue
+from transmission.processing.influxdb_api import INFLUX_ORG, PointBatch, commit_frames, \
+    get_influx_db_read_and_query_api
+from transmission.processing.reprocessing import reprocess_raw_bucket
+from transmission.processing.rollups import update_rollups
+from transmission.processing.telemetry_cache import invalidate_telemetry_cache
+from transmission.processing.telemetry_schema import FRAME_SCHEMA, TELEMETRY_SCHEMA, get_measurement_name, \
+    get_telemetry_bucket, telemetry_to_frame_points
+
+# number of raw frames retrieved and processed at once
+FRAMES_CHUNK_SIZE = int(os.environ.get('FRAMES_CHUNK_SIZE', 1000))
 
 write_api, query_api = get_influx_db_read_and_query_api()
 
 
+def store_raw_frames(satellite: str, frames: list, link: str) -> int:
+    """Store raw unprocessed frames (dicts with frame, observer and timestamp) in influxdb.
+    Returns the number of frames that were not already stored."""
+    frames = [{
+        "frame": frame["frame"],
+        "observer": frame["observer"],
+        "timestamp": frame["timestamp"],
+    } for frame in frames]
+
+    return len(commit_frames(write_api, satellite, link, frames))
+
+
 def store_raw_frame(satellite: str, timestamp: str, frame: str, observer: str, link: str) -> bool:
     """Store raw unprocessed frame in influxdb"""
     frame_fields = {
         "frame": frame,
         "observer": observer,
         "timestamp": timestamp,
-        "processed": False
     }
 
-    stored = commit_frame(write_api, query_api, satellite, link, frame_fields)
-    if stored:
-        file = time_range.get_new_data_file_path(satellite, link)
-        time_range.include_timestamp_in_time_range(satellite, link, timestamp, file)
-    return stored
+    return store_raw_frames(satellite, [frame_fields], link) == 1
 
 
-def parse_and_store_frame(satellite: str, timestamp: str, frame: str, observer: str, link: str) -> None:
-    """Store parsed frame in influxdb"""
+def telemetry_to_points(satellite: str, timestamp: str, observer: str, telemetry: dict) -> list:
+    """Return the influxdb points of all telemetry fields of a parsed frame."""
 
-    parser = xtce_parser.SatParsers().parsers[satellite]
-    logger.debug("%s: frame: %s", satellite, frame)
-    telemetry = parser.processTMFrame(bytes.fromhex(frame))
-    bucket = satellite + "_" + link
+    points = []
 
     if "frame" in telemetry:
-        sat_name_pascal_case = string.capwords(satellite.replace("_", " ")).replace(" ", "")
-        tags = {}
-
-        db_fields = {
-
-            "measurement": sat_name_pascal_case + telemetry["frame"],
-            "time": timestamp,
-            "tags": tags,
-            "fields": {
-                "observer": observer,
-            }
-        }
+        measurement = get_measurement_name(satellite, telemetry["frame"])
+        # the observer is stored together with the first field of the frame
+        fields = {"observer": observer}
 
         for field, value_and_status in telemetry.items():
             # skip frame field
@@ -60,83 +66,142 @@ def parse_and_store_frame(satellite: str, timestamp: str, frame: str, observer:
             except ValueError:
                 pass
 
-            # print(field + " " + str(value) + " " + status)
             logger.debug("%s: field: %s, val: %s, status: %s", satellite, field, str(value), status)
 
-            db_fields["fields"][field] = value
-            db_fields["tags"]["status"] = status
+            fields[field] = value
+            points.append({
+                "measurement": measurement,
+                "time": timestamp,
+                "tags": {"status": status},
+                "fields": fields
+            })
+            fields = {}
+
+    return points
+
+
+def telemetry_to_schema_points(satellite: str, timestamp: str, observer: str, telemetry: dict) -> list:
+    """Return the influxdb points of a parsed frame in the configured telemetry schema."""
+    if TELEMETRY_SCHEMA == FRAME_SCHEMA:
+        return telemetry_to_frame_points(satellite, timestamp, observer, telemetry)
+    return telemetry_to_points(satellite, timestamp, observer, telemetry)
+
+
+def parse_frame(satellite: str, timestamp: str, frame: str, observer: str) -> list:
+    """Parse a frame and return the influxdb points of all its telemetry fields."""
+
+    parser = xtce_parser.get_parser(satellite)
+    logger.debug("%s: frame: %s", satellite, frame)
+    telemetry = parser.processTMFrame(bytes.fromhex(frame))
+
+    return telemetry_to_schema_points(satellite, timestamp, observer, telemetry)
 
-            write_api.write(bucket, INFLUX_ORG, db_fields)
-            # print(db_fields)
-            db_fields["fields"] = {}
-            db_fields["tags"] = {}
 
+def parse_frames(satellite: str, frames: list) -> list:
+    """Decode multiple hex frames with one parser call. For each frame, return either
+    its telemetry or the XTCEException raised while decoding it."""
+
+    parser = xtce_parser.get_parser(satellite)
+    return parser.processTMFrames([bytes.fromhex(frame) for frame in frames])
+
+
+def parse_and_store_frame(satellite: str, timestamp: str, frame: str, observer: str, link: str) -> bool:
+    """Store parsed frame in influxdb. Returns True if telemetry was written.
+    The rollups and the telemetry cache are not updated, see update_derived_telemetry."""
+
+    points = parse_frame(satellite, timestamp, frame, observer)
+    bucket = get_telemetry_bucket(satellite, link)
+
+    if points:
+        # all fields of the frame are written in one request
+        write_api.write(bucket, INFLUX_ORG, points)
         logger.info("%s: processed frame stored. Frame timestamp: %s, link: %s, bucket: %s",
                     satellite, timestamp, link, bucket)
+    return len(points) > 0
+
+
+def update_derived_telemetry(satellite: str, link: str, timestamps: list) -> None:
+    """Update the rollups and invalidate the cached telemetry of the times at which telemetry was written.
+    The cache is invalidated after the rollups are updated, as queries can read the rollups."""
+    update_rollups(query_api, satellite, link, timestamps)
+    invalidate_telemetry_cache(satellite, link, timestamps)
+
+
+def process_frames_chunk(satellite: str, link: str, rows: list, radio_amateur: str) -> tuple:
+    """Parse a chunk of raw frames and store the parsed form. Returns the indices of the processed rows
+    and the (index, error) pairs of the rows that failed."""
+
+    # the parsed frames are written in batches instead of one request per field
+    batch = PointBatch(write_api, get_telemetry_bucket(satellite, link))
+    processed_indices = []
+    failed_rows = []
+
+    def add_batch_result(written: list, failed: list) -> None:
+        processed_indices.extend(written)
+        failed_rows.extend((index, "telemetry could not be written") for index in failed)
+
+    decoded_frames = parse_frames(satellite, [row["frame"] for row in rows])
+
+    for index, (row, telemetry) in enumerate(zip(rows, decoded_frames)):
+        if isinstance(telemetry, xtce_parser.XTCEException):
+            logger.error("%s: frame processing error: %s (%s)", satellite, telemetry, row["frame"])
+            failed_rows.append((index, str(telemetry)))
+            continue
+
+        points = telemetry_to_schema_points(satellite, row["_time"], row.get(radio_amateur), telemetry)
+        add_batch_result(*batch.add(index, points))
+
+    add_batch_result(*batch.flush())
+
+    update_derived_telemetry(satellite, link, [rows[index]["_time"] for index in processed_indices])
 
+    return processed_indices, failed_rows
 
-def mark_processed_flag(satellite: str, link: str, timestamp: str, value: bool) -> None:
-    """Write the processed flag to either True or False."""
-    write_frame_to_raw_bucket(write_api, satellite, link, timestamp, {'processed': value})
 
+def get_radio_amateur(link: str) -> str:
+    """Return the raw data field holding the sender of the frames of a link."""
+    return 'operator' if link == 'uplink' else 'observer'
 
-# pylint: disable=R0914
-def process_retrieved_frames(satellite: str, link: str, start_time: str, end_time: str,
-                             skip_processed: bool = True) -> tuple:
-    """Parse frames, store the parsed form and mark the raw entry as processed.
-    Return the total number of frames attempting to process and
-    how many frames were successfully processed.
-    Skip_processed=True will skip over the already processed frames."""
 
-    radio_amateur = 'observer'
-    if link == 'uplink':
-        radio_amateur = 'operator'
+def process_retrieved_frames(satellite: str, link: str, start_time: str, end_time: str) -> tuple:
+    """Parse all raw frames of a time range and store the parsed form, overriding previously parsed data.
+    The frames that fail are queued for retrying.
+    Return the number of frames that were successfully processed and the total number of frames."""
 
-    get_unprocessed_frames_query = f'''
+    radio_amateur = get_radio_amateur(link)
+
+    get_frames_query = f'''
         from(bucket: "{satellite + "_raw_data"}")
         |> range(start: {start_time}, stop: {end_time})
         |> filter(fn: (r) => r._measurement == "{satellite + "_" + link + "_raw_data"}")
-        |> filter(fn: (r) => r["_field"] == "processed" or
-                r["_field"] == "frame" or
-                r["_field"] == "{radio_amateur}")
+        |> filter(fn: (r) => r["_field"] == "frame" or r["_field"] == "{radio_amateur}")
         |> pivot(rowKey:["_time"], columnKey: ["_field"], valueColumn: "_value")
         '''
-    # query result as dataframe
-    dataframe = query_api.query_data_frame(query=get_unprocessed_frames_query)
-    dataframe = dataframe.reset_index()
+    # the query result is streamed and consumed in chunks, such that memory usage
+    # does not depend on the size of the time range
+    records = query_api.query_stream(query=get_frames_query)
 
     failed_processing_count = 0
     processed_frames_count = 0
     total_frames_count = 0
-    # process each frame
-    for _, row in dataframe.iterrows():
-        total_frames_count += 1
-        try:
-            if row["processed"] and skip_processed:  # skip frame if it's processed
-                logger.info("%s: frame skipped (already processed): %s ", satellite, row["frame"])
-                continue
-            # store processed frame
-            parse_and_store_frame(satellite, row["_time"], row["frame"], row[radio_amateur], link)
-            # mark raw frame as processed
-            mark_processed_flag(satellite, link, row["_time"], True)
-            processed_frames_count += 1
-
-        except xtce_parser.XTCEException as ex:
-            logger.error("%s: frame processing error: %s (%s)", satellite, ex, row["frame"])
-            time_range.include_timestamp_in_time_range(satellite,
-                                                       link,
-                                                       row["_time"],
-                                                       time_range.get_failed_data_file_path(satellite, link)
-                                                       )
-            # mark frame as unprocessed
-            mark_processed_flag(satellite, link, row["_time"], False)
-            failed_processing_count += 1
-
-    skipped_frames_count = total_frames_count - processed_frames_count - failed_processing_count
+
+    while True:
+        rows = [record.values for record in islice(records, FRAMES_CHUNK_SIZE)]
+        if not rows:
+            break
+        total_frames_count += len(rows)
+
+        processed_indices, failed_rows = process_frames_chunk(satellite, link, rows, radio_amateur)
+        processed_frames_count += len(processed_indices)
+        failed_processing_count += len(failed_rows)
+
+        frame_queue.requeue_frames(satellite, link, [{"timestamp": rows[index]["_time"],
+                                                      "frame": rows[index]["frame"],
+                                                      "observer": rows[index].get(radio_amateur)}
+                                                     for index, _ in failed_rows])
 
     frames_status = f"out of {total_frames_count} frames: " + \
-                    f"{processed_frames_count} were successfully parsed, " + \
-                    f"{skipped_frames_count} were skipped, and " + \
+                    f"{processed_frames_count} were successfully parsed and " + \
                     f"{failed_processing_count} failed."
 
     logger.info("%s: %s frames processed from %s - %s; %s", satellite, link, start_time, end_time, frames_status)
@@ -147,50 +212,78 @@ def process_retrieved_frames(satellite: str, link: str, start_time: str, end_tim
     return processed_frames_count, total_frames_count
 
 
-def process_raw_bucket(satellite: str, link: str = None, all_frames: bool = False, failed: bool = False):
+def process_queued_frames(satellite: str, link: str) -> tuple:
+    """Parse the queued frames of a satellite link in batches and store the parsed form.
+    Processed frames are removed from the queue, failed frames are retried later.
+    Return the number of frames that were successfully processed and the total number of dequeued frames."""
+
+    radio_amateur = get_radio_amateur(link)
+
+    processed_frames_count = 0
+    failed_processing_count = 0
+    total_frames_count = 0
+
+    while True:
+        entries = frame_queue.dequeue_frames(satellite, link, FRAMES_CHUNK_SIZE)
+        if not entries:
+            break
+        total_frames_count += len(entries)
+
+        rows = [{"_time": entry.timestamp, "frame": entry.frame, radio_amateur: entry.observer} for entry in entries]
+        processed_indices, failed_rows = process_frames_chunk(satellite, link, rows, radio_amateur)
+        processed_frames_count += len(processed_indices)
+        failed_processing_count += len(failed_rows)
+
+        frame_queue.complete_frames([entries[index] for index in processed_indices])
+        frame_queue.retry_frames([(entries[index], error) for index, error in failed_rows])
+
+    if total_frames_count == 0:
+        logger.info("%s: no %s frames to process", satellite, link)
+    else:
+        logger.info("%s: %s queued %s frames processed; %s failed.", satellite, processed_frames_count, link,
+                    failed_processing_count)
+
+    return processed_frames_count, total_frames_count
+
+
+def process_raw_bucket(satellite: str, link: str = None, all_frames: bool = False, failed: bool = False,
+                       restart: bool = False):
     """Trigger bucket processing or reprocessing given satellite."""
     # if link is None process both uplink and downlink, otherwise process only specified link
 
     if link in ["uplink", "downlink"]:
-        _process_raw_bucket(satellite, link, all_frames, failed)
+        _process_raw_bucket(satellite, link, all_frames, failed, restart)
     else:
-        _process_raw_bucket(satellite, "uplink", all_frames, failed)
-        _process_raw_bucket(satellite, "downlink", all_frames, failed)
+        # the links are processed concurrently, the frames of both links are parsed by the same parser
+        # but the queries and writes of one link overlap with the parsing of the other
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(_process_raw_bucket_in_thread, satellite, link, all_frames, failed, restart)
+                       for link in ["uplink", "downlink"]]
+            for future in futures:
+                future.result()
 
 
+def _process_raw_bucket_in_thread(satellite: str, link: str, all_frames: bool, failed: bool,
+                                  restart: bool) -> tuple:
+    """Process a link in a separate thread and close the database connection of the thread afterwards."""
+    try:
+        return _process_raw_bucket(satellite, link, all_frames, failed, restart)
+    finally:
+        connection.close()
 
-def _process_raw_bucket(satellite: str, link: str, all_frames: bool, failed: bool) -> tuple:
-    """Trigger bucket processing given satellite and link.
-    all_frames=True will process the entire bucket and failed=True will process only failed frames.
-    When both flags are True all frames will be processed."""
 
-    time_range.combine_time_ranges(satellite, link)
+def _process_raw_bucket(satellite: str, link: str, all_frames: bool, failed: bool, restart: bool = False) -> tuple:
+    """Trigger bucket processing given satellite and link.
+    all_frames=True will process the entire bucket and failed=True will retry the failed frames immediately.
+    When both flags are True all frames will be processed. An interrupted processing of the entire bucket
+    is resumed, unless restart is True."""
 
-    # process the entire bucket
+    # process the entire bucket, in parallel time shards
     if all_frames:
-        return process_retrieved_frames(satellite, link, "0", "now()", skip_processed=False)
-    # process frames in the failed frames time range
-    if failed:
-        file = time_range.get_failed_data_file_path(satellite, link)
-        new_data_time_range = time_range.read_time_range_file(file)
-    # process frames in the new data time range (newly ingested data)
-    else:
-        file = time_range.get_new_data_file_path(satellite, link)
-        new_data_time_range = time_range.read_time_range_file(file)
+        return reprocess_raw_bucket(query_api, satellite, link, process_retrieved_frames, restart=restart)
 
-    processed_frames_count = 0
-    total_frames_count = 0
-
-    # if the time range is empty there are no frames to process
-    if new_data_time_range[satellite][link] != []:
-
-        start_time = new_data_time_range[satellite][link][0]
-        end_time = new_data_time_range[satellite][link][1]
-        processed_frames_count, total_frames_count = process_retrieved_frames(satellite, link, start_time, end_time)
+    # retry the failed frames, including those in the dead-letter state
+    if failed:
+        frame_queue.requeue_failed_frames(satellite, link)
 
-        # don't reset the interval of failed frames, unless reprocessing was successful
-        if failed is False or processed_frames_count == total_frames_count:
-            time_range.reset_new_data_timestamps(satellite, link, file)
-    else:
-        logger.info("%s: no frames to process", satellite)
-    return processed_frames_count, total_frames_count
+    return process_queued_frames(satellite, link)
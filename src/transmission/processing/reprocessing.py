@@ -0,0 +1,144 @@
+"""Reprocessing of an entire raw data bucket, split into time shards that are processed in parallel
+by a pool of threads or, with REPROCESSING_PROCESSES > 0, of spawned worker processes, each with its own
+JVM and XTCE parsers (threads parse one frame at a time, as the parser of a satellite is shared and locked).
+Every completed shard is recorded as a checkpoint, such that an interrupted reprocessing resumes
+with the pending shards instead of starting over. A new reprocessing starts once all shards are done."""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import multiprocessing
+import os
+from typing import Callable
+
+from django.db import connection
+from django.utils import timezone
+
+from django_logger import logger
+from transmission.models import ReprocessingShard
+from transmission.processing.bucket_worker import setup_worker
+from transmission.processing.influxdb_api import format_flux_time, get_bucket_time_range
+from transmission.processing.satellites import EPOCH
+
+# length (days) of the time shards
+REPROCESSING_SHARD_DAYS = int(os.environ.get('REPROCESSING_SHARD_DAYS', 7))
+# number of worker processes processing the shards, 0 processes them in REPROCESSING_WORKERS threads,
+# every worker process runs a JVM (a reprocessing of both links runs two pools)
+REPROCESSING_PROCESSES = int(os.environ.get('REPROCESSING_PROCESSES', 0))
+# number of threads processing the shards if no worker processes are used
+REPROCESSING_WORKERS = int(os.environ.get('REPROCESSING_WORKERS', 4))
+
+
+class ReprocessingError(Exception):
+    """Exception raised when shards of a reprocessing failed, after the other shards were processed.
+
+    Attributes:
+        message -- explanation of the error
+        processed_frames, total_frames -- number of processed and total frames of the completed shards
+    """
+
+    def __init__(self, message: str, processed_frames: int, total_frames: int):
+        self.message = message
+        self.processed_frames = processed_frames
+        self.total_frames = total_frames
+        super().__init__(self.message)
+
+
+def get_shards(start: datetime, stop: datetime) -> list:
+    """Split a time range into (start, stop) shards of REPROCESSING_SHARD_DAYS days, aligned to the epoch."""
+    span = REPROCESSING_SHARD_DAYS * 24 * 3600
+    shard_start = EPOCH + timedelta(seconds=int((start - EPOCH).total_seconds()) // span * span)
+
+    shards = []
+    while shard_start < stop:
+        shards.append((shard_start, shard_start + timedelta(seconds=span)))
+        shard_start += timedelta(seconds=span)
+    return shards
+
+
+def create_shards(query_api, satellite: str, link: str) -> list:
+    """Replace the shards of a satellite link by new pending shards covering its raw data bucket."""
+    ReprocessingShard.objects.filter(satellite=satellite, link=link).delete()
+
+    time_range = get_bucket_time_range(query_api, satellite + "_raw_data")
+    if time_range is None:
+        return []
+
+    return ReprocessingShard.objects.bulk_create([
+        ReprocessingShard(satellite=satellite, link=link, start=start, stop=stop)
+        for start, stop in get_shards(time_range[0], time_range[1] + timedelta(seconds=1))])
+
+
+def get_pending_shards(query_api, satellite: str, link: str, restart: bool = False) -> list:
+    """Return the pending shards of an interrupted reprocessing of a satellite link,
+    or the shards of a new reprocessing if there are none (or restart is True)."""
+    shards = list(ReprocessingShard.objects.filter(satellite=satellite, link=link, status=ReprocessingShard.PENDING)
+                  .order_by("start"))
+    if shards and not restart:
+        logger.info("%s: %s reprocessing resumed, %s shards pending", satellite, link, len(shards))
+        return shards
+
+    return create_shards(query_api, satellite, link)
+
+
+def process_shard(process_range: Callable, satellite: str, link: str, start: str, stop: str) -> tuple:
+    """Process the raw frames of a shard in a worker with process_range(satellite, link, start, stop),
+    and close the database connection of the worker afterwards."""
+    try:
+        return process_range(satellite, link, start, stop)
+    finally:
+        connection.close()
+
+
+def get_shards_executor():
+    """Return the pool of workers processing the shards."""
+    if REPROCESSING_PROCESSES > 0:
+        return ProcessPoolExecutor(REPROCESSING_PROCESSES, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=setup_worker)
+    return ThreadPoolExecutor(REPROCESSING_WORKERS)
+
+
+def reprocess_raw_bucket(query_api, satellite: str, link: str, process_range: Callable,
+                         restart: bool = False) -> tuple:
+    """Reprocess the entire raw data bucket of a satellite link in parallel time shards, resuming
+    an interrupted reprocessing unless restart is True. process_range(satellite, link, start, stop) processes
+    the frames of a time range and returns the number of processed and total frames.
+    Failed shards stay pending and are processed when the reprocessing is resumed, ReprocessingError is raised
+    once the other shards are processed.
+    Returns the number of processed and total frames of the shards processed in this run."""
+    shards = get_pending_shards(query_api, satellite, link, restart)
+
+    processed_frames_count = 0
+    total_frames_count = 0
+    failed_shards_count = 0
+
+    with get_shards_executor() as executor:
+        futures = {executor.submit(process_shard, process_range, satellite, link, format_flux_time(shard.start),
+                                   format_flux_time(shard.stop)): shard
+                   for shard in shards}
+
+        # the checkpoints are written by this thread, as the shards complete
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                shard.processed_frames, shard.total_frames = future.result()
+            except Exception as ex:  # pylint:disable=W0703
+                logger.error("%s: %s reprocessing of shard %s - %s failed: %s", satellite, link, shard.start,
+                             shard.stop, ex)
+                failed_shards_count += 1
+                continue
+
+            shard.status = ReprocessingShard.DONE
+            shard.completed_at = timezone.now()
+            shard.save()
+
+            processed_frames_count += shard.processed_frames
+            total_frames_count += shard.total_frames
+
+    logger.info("%s: %s reprocessing of %s shards finished, %s shards failed; %s out of %s frames processed.",
+                satellite, link, len(shards), failed_shards_count, processed_frames_count, total_frames_count)
+
+    if failed_shards_count:
+        raise ReprocessingError(f"{satellite} {link}: {failed_shards_count} out of {len(shards)} shards failed, "
+                                "resume the reprocessing to process them",
+                                processed_frames_count, total_frames_count)
+
+    return processed_frames_count, total_frames_count
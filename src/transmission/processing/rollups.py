@@ -0,0 +1,127 @@
+"""Rollup buckets holding the min, max, mean and count of every numeric telemetry parameter
+per hour and per day (<satellite>_<link>_1h and <satellite>_<link>_1d), such that long-range
+dashboards read the aggregates instead of all parsed points.
+The rollups are recomputed by influxdb (flux to()) for the windows in which telemetry was written."""
+from datetime import datetime, timedelta
+import os
+
+from influxdb_client.client.exceptions import InfluxDBError
+from urllib3.exceptions import HTTPError
+
+from transmission.processing.influxdb_api import INFLUX_ORG, format_flux_time, get_bucket_time_range
+from transmission.processing.satellites import EPOCH, to_datetime
+from transmission.processing.telemetry_schema import get_telemetry_bucket
+from django_logger import logger
+
+# rollup interval name: window duration (seconds)
+ROLLUP_INTERVALS = {
+    "1h": 3600,
+    "1d": 24 * 3600,
+}
+
+ROLLUP_AGGREGATES = ["min", "max", "mean", "count"]
+
+# length (days) of the time slices rolled up at once by the backfill
+ROLLUP_BACKFILL_DAYS = int(os.environ.get('ROLLUP_BACKFILL_DAYS', 30))
+
+
+def get_rollup_bucket(satellite: str, link: str, interval: str) -> str:
+    """Return the name of the rollup bucket of a satellite link and interval."""
+    return satellite + "_" + link + "_" + interval
+
+
+def get_rollup_buckets(satellite: str) -> list:
+    """Return the names of all rollup buckets of a satellite."""
+    return [get_rollup_bucket(satellite, link, interval)
+            for link in ["downlink", "uplink"] for interval in ROLLUP_INTERVALS]
+
+
+def build_rollup_query(satellite: str, link: str, interval: str, start: datetime, stop: datetime) -> str:
+    """Return the flux query aggregating the numeric parameters of the satellite link bucket per window
+    and writing the aggregates to the rollup bucket. The aggregate is stored in the 'aggregate' tag,
+    the window start is the time of the rollup points."""
+    aggregates = ",\n".join(
+        f'data |> aggregateWindow(every: {interval}, fn: {aggregate}, createEmpty: false, timeSrc: "_start")'
+        f' |> set(key: "aggregate", value: "{aggregate}")'
+        for aggregate in ROLLUP_AGGREGATES)
+
+    return f'''
+        import "types"
+
+        data = from(bucket: "{get_telemetry_bucket(satellite, link)}")
+        |> range(start: {format_flux_time(start)}, stop: {format_flux_time(stop)})
+        |> filter(fn: (r) => types.isNumeric(v: r._value))
+        |> group(columns: ["_measurement", "_field"])
+
+        union(tables: [
+        {aggregates}
+        ])
+        |> map(fn: (r) => ({{r with _value: float(v: r._value)}}))
+        |> keep(columns: ["_time", "_measurement", "_field", "_value", "aggregate"])
+        |> to(bucket: "{get_rollup_bucket(satellite, link, interval)}", org: "{INFLUX_ORG}")
+        '''
+
+
+def get_rollup_ranges(timestamps: list, interval: str) -> list:
+    """Return the (start, stop) time ranges of the consecutive rollup windows containing the timestamps
+    (datetimes or strings in ISO 8601)."""
+    window_seconds = ROLLUP_INTERVALS[interval]
+    windows = sorted({int((to_datetime(timestamp) - EPOCH).total_seconds()) // window_seconds
+                      for timestamp in timestamps})
+
+    ranges = []
+    for window in windows:
+        if ranges and ranges[-1][1] == window:
+            ranges[-1][1] = window + 1
+        else:
+            ranges.append([window, window + 1])
+
+    return [(EPOCH + timedelta(seconds=start * window_seconds), EPOCH + timedelta(seconds=stop * window_seconds))
+            for start, stop in ranges]
+
+
+def rollup_time_range(query_api, satellite: str, link: str, interval: str, start: datetime, stop: datetime) -> None:
+    """Recompute the rollup points of a time range, which should start and stop at window boundaries."""
+    query_api.query(build_rollup_query(satellite, link, interval, start, stop))
+
+
+def update_rollups(query_api, satellite: str, link: str, timestamps: list) -> None:
+    """Recompute the rollup windows of all intervals containing the timestamps at which telemetry was written.
+    Failures are logged; the rollups can be recomputed with the backfillrollups command."""
+    if not timestamps:
+        return
+
+    for interval in ROLLUP_INTERVALS:
+        for start, stop in get_rollup_ranges(timestamps, interval):
+            try:
+                rollup_time_range(query_api, satellite, link, interval, start, stop)
+            except (InfluxDBError, HTTPError) as ex:
+                logger.error("%s: %s rollup of %s from %s to %s failed: %s", satellite, interval, link, start, stop,
+                             ex)
+
+
+def backfill_rollups(query_api, satellite: str, link: str, start: datetime = None, stop: datetime = None) -> int:
+    """Recompute the rollups of a satellite link from start to stop (by default the whole bucket),
+    in slices of ROLLUP_BACKFILL_DAYS days. Returns the number of rolled up slices."""
+    if start is None or stop is None:
+        time_range = get_bucket_time_range(query_api, get_telemetry_bucket(satellite, link))
+        if time_range is None:
+            return 0
+        start = start or time_range[0]
+        stop = stop or time_range[1] + timedelta(seconds=1)
+
+    # whole days, such that the slices contain whole windows of all intervals
+    day = ROLLUP_INTERVALS["1d"]
+    slice_start = EPOCH + timedelta(seconds=int((to_datetime(start) - EPOCH).total_seconds()) // day * day)
+    stop = to_datetime(stop)
+
+    slices_count = 0
+    while slice_start < stop:
+        slice_stop = slice_start + timedelta(days=ROLLUP_BACKFILL_DAYS)
+        for interval in ROLLUP_INTERVALS:
+            rollup_time_range(query_api, satellite, link, interval, slice_start, slice_stop)
+        logger.info("%s: %s rollups computed from %s to %s", satellite, link, slice_start, slice_stop)
+        slices_count += 1
+        slice_start = slice_stop
+
+    return slices_count
@@ -0,0 +1,83 @@
+"""Index used to pre-classify frames by their AX.25 header before attempting a full XTCE parse."""
+import threading
+from typing import Union
+
+from transmission.processing.satellites import SATELLITES
+from transmission.processing.XTCEParser import SatParsers, XTCEException
+
+# AX.25 UI frame header: destination (7 bytes), source (7 bytes), control (0x03) and PID (0xF0)
+AX25_HEADER_LENGTH = 16
+AX25_SOURCE_ADDRESS = slice(7, 14)
+AX25_UI_CONTROL = 0x03
+AX25_NO_LAYER3_PID = 0xF0
+
+
+def get_ax25_source_callsign(frame: bytes) -> Union[str, None]:
+    """Return the source callsign of an AX.25 UI frame, None if the frame has no valid AX.25 header."""
+    if len(frame) < AX25_HEADER_LENGTH:
+        return None
+    if frame[14] != AX25_UI_CONTROL or frame[15] != AX25_NO_LAYER3_PID:
+        return None
+    # the callsign characters are shifted 1 bit to the left and padded with spaces
+    return "".join(chr(byte >> 1) for byte in frame[AX25_SOURCE_ADDRESS][:6]).strip()
+
+
+class SatelliteIndex:
+    """Map AX.25 source callsigns to the satellites whose parser can decode the frames.
+    The index is built from the satellites that have an XTCE parser in SatParsers and seeded with
+    the callsigns listed in SATELLITES. Satellites without a known callsign are learned from their
+    first successfully parsed frame; until then they stay candidates for every frame."""
+
+    def __init__(self, parsers: dict) -> None:
+        self.parsers = parsers
+        self.lock = threading.Lock()
+        self.satellites_by_callsign = {}
+        self.unindexed_satellites = []
+
+        for satellite, parser in parsers.items():
+            if parser is None:
+                continue
+            callsign = SATELLITES.get(satellite, {}).get("callsign")
+            if callsign:
+                self.satellites_by_callsign.setdefault(callsign, []).append(satellite)
+            else:
+                self.unindexed_satellites.append(satellite)
+
+    def get_candidates(self, frame: bytes) -> list:
+        """Return the satellites that could have sent the frame, based on its header only."""
+        callsign = get_ax25_source_callsign(frame)
+        with self.lock:
+            return self.satellites_by_callsign.get(callsign, []) + self.unindexed_satellites
+
+    def learn(self, satellite: str, frame: bytes) -> None:
+        """Index the callsign of a frame successfully parsed by a not yet indexed satellite."""
+        callsign = get_ax25_source_callsign(frame)
+        with self.lock:
+            if callsign is not None and satellite in self.unindexed_satellites:
+                self.unindexed_satellites.remove(satellite)
+                self.satellites_by_callsign.setdefault(callsign, []).append(satellite)
+
+    def get_satellite(self, frame: bytes) -> Union[str, None]:
+        """Find the satellite of a frame by fully parsing it only with the candidate satellites."""
+        for satellite in self.get_candidates(frame):
+            try:
+                self.parsers[satellite].processTMFrame(frame)
+                self.learn(satellite, frame)
+                return satellite
+            except XTCEException:
+                pass
+
+        return None
+
+
+_satellite_index = None
+_satellite_index_lock = threading.Lock()
+
+
+def get_satellite_index() -> SatelliteIndex:
+    """Return the process-wide satellite index, building it on first use."""
+    global _satellite_index  # pylint: disable=W0603
+    with _satellite_index_lock:
+        if _satellite_index is None:
+            _satellite_index = SatelliteIndex(SatParsers().parsers)
+    return _satellite_index
@@ -1,19 +1,36 @@
 """Satellite related constants"""
+from datetime import datetime, timezone
 
 TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
 
+# the time windows (rollups, cached chunks, reprocessing shards) are aligned to the epoch
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_datetime(timestamp) -> datetime:
+    """Return a timestamp (datetime or string in ISO 8601) as a datetime in UTC, naive timestamps are in UTC."""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+# callsign: AX.25 source address of the downlink frames, used to identify the satellite of a frame
 SATELLITES = {
     "delfi_pq": {
         "norad_id": '51074',
         "status": "Decayed",
+        "callsign": "DLFIPQ",
     },
     "delfi_next": {
         "norad_id": '39428',
         "status": "Non Operational",
+        "callsign": "DFN3XT",
     },
     "delfi_c3": {
         "norad_id": '32789',
         "status": "Decayed",
+        "callsign": "DLFIC3",
         },
     "da_vinci": {
        "norad_id": None,  #update id
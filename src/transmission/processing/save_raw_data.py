@@ -3,54 +3,188 @@ import os
 import re
 import copy
 import json
-from typing import Union
+from json.decoder import JSONDecodeError
+from itertools import islice
+from typing import Iterable, Union
 
 from django.forms import ValidationError
-from django.core.exceptions import PermissionDenied
-from django.db import models
+from django.core.exceptions import BadRequest, PermissionDenied
+from django.db import models, transaction
 from django.db.models.query import QuerySet
 from django.utils.dateparse import parse_datetime
 from skyfield.api import load, EarthSatellite
 import pytz
 from django_logger import logger
-from members.models import Member
 from transmission.models import Uplink, Downlink, TLE, Satellite
-from transmission.processing.XTCEParser import SatParsers, XTCEException
-from transmission.processing.bookkeep_new_data_time_range import get_new_data_buffer_temp_folder, \
-    include_timestamp_in_time_range, save_timestamps_to_file
-from transmission.processing.influxdb_api import save_raw_frame_to_influxdb
+from transmission.processing.api_key_cache import Submitter, get_submitter
+from transmission.processing.satellite_index import get_satellite_index
+from transmission.processing.influxdb_api import save_raw_frames_to_influxdb
+from transmission.processing.json_stream import DECOMPRESSION_ERRORS, iter_json_values, iter_lines, \
+    open_submission_stream
 from transmission.processing.telemetry_scraper import strip_tlm
 
+# number of buffered frames read, stored to influxdb and flagged at once
+PROCESS_FRAMES_CHUNK_SIZE = int(os.environ.get('PROCESS_FRAMES_CHUNK_SIZE', 1000))
+# number of submitted frames inserted at once
+SUBMISSION_CHUNK_SIZE = int(os.environ.get('SUBMISSION_CHUNK_SIZE', 1000))
+# maximum number of rejected NDJSON lines listed in the response
+NDJSON_MAX_REPORTED_ERRORS = 100
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson")
 
-def store_frames(frames, username: str, application: str = None) -> int:
+
+def store_frames(frames, username: Union[str, Submitter], application: str = None) -> int:
     """Store frames in batches if the input is a list.
-    Otherwise, in case of a dict, the frame is parsed and stored."""
+    Otherwise, in case of a dict, the frame is parsed and stored.
+    The submitter and its permissions are looked up once for all frames."""
+    if isinstance(username, Submitter):
+        user = username
+    else:
+        user = get_submitter(username)
+
     if isinstance(frames, dict):
-        frame_object = build_frame_model_object(frames, username, application)
+        frame_object = build_frame_model_object(frames, user, application)
         frame_object.save()
         return 1
 
     if isinstance(frames, list):
-        frame_objects_uplink = []
-        frame_objects_downlink = []
+        return store_frames_stream(frames, user, application)
+
+    raise ValidationError("Invalid frame, not JSON object or array.")
+
 
+def store_frames_stream(frames: Iterable, username: Union[str, Submitter], application: str = None) -> int:
+    """Validate and store frames one by one from an iterable, e.g. a streamed submission.
+    The frames are inserted with one bulk_create per SUBMISSION_CHUNK_SIZE frames, such that
+    memory usage does not depend on the size of the submission.
+    Either all frames are stored or none (if a frame is invalid)."""
+    if isinstance(username, Submitter):
+        user = username
+    else:
+        user = get_submitter(username)
+
+    stored_frames = 0
+    frame_objects_uplink = []
+    frame_objects_downlink = []
+
+    with transaction.atomic():
         for frame in frames:
-            frame_object = build_frame_model_object(frame, username, application)
+            if not isinstance(frame, dict):
+                raise ValidationError("Invalid frame, not JSON object or array.")
+
+            frame_object = build_frame_model_object(frame, user, application)
             if isinstance(frame_object, Uplink):
                 frame_objects_uplink.append(frame_object)
             elif isinstance(frame_object, Downlink):
                 frame_objects_downlink.append(frame_object)
 
-        # batch uplink/downlink frames into 1 database commit
-        Uplink.objects.bulk_create(frame_objects_uplink)
-        Downlink.objects.bulk_create(frame_objects_downlink)
+            if len(frame_objects_uplink) + len(frame_objects_downlink) >= SUBMISSION_CHUNK_SIZE:
+                stored_frames += bulk_create_frames(frame_objects_uplink, frame_objects_downlink)
+                frame_objects_uplink = []
+                frame_objects_downlink = []
 
-        return len(frame_objects_downlink) + len(frame_objects_uplink)
+        stored_frames += bulk_create_frames(frame_objects_uplink, frame_objects_downlink)
 
-    raise ValidationError("Invalid frame, not JSON object or array.")
+    return stored_frames
+
+
+def store_frames_ndjson(lines: Iterable, username: Union[str, Submitter], application: str = None) -> tuple:
+    """Validate and store newline delimited JSON frames, one frame per line.
+    Unlike store_frames_stream, the valid lines are stored even if other lines are invalid.
+    Returns the number of stored frames and the list of rejected lines with the reason,
+    only the first NDJSON_MAX_REPORTED_ERRORS rejected lines are listed individually."""
+    if isinstance(username, Submitter):
+        user = username
+    else:
+        user = get_submitter(username)
+
+    stored_frames = 0
+    errors = []
+    line_number = 0
+    frame_objects_uplink = []
+    frame_objects_downlink = []
+
+    rejected_lines = 0
+
+    def reject(line_number: int, message: str) -> None:
+        nonlocal rejected_lines
+        rejected_lines += 1
+        if len(errors) < NDJSON_MAX_REPORTED_ERRORS:
+            errors.append({"line": line_number, "message": message})
+
+    try:
+        for line_number, line in lines:
+            if not line.strip():
+                continue
+            try:
+                frame = json.loads(line)
+                if not isinstance(frame, dict):
+                    raise ValidationError("Invalid frame, not JSON object.")
+                frame_object = build_frame_model_object(frame, user, application)
+            except JSONDecodeError:
+                reject(line_number, "Invalid JSON structure")
+                continue
+            except PermissionDenied:
+                reject(line_number, "Permission denied")
+                continue
+            except KeyError as e:  # pylint:disable=C0103
+                reject(line_number, f"Invalid frame, missing field {e}.")
+                continue
+            except (ValidationError, ValueError, TypeError, AttributeError) as e:  # pylint:disable=C0103
+                reject(line_number, "; ".join(e.messages) if isinstance(e, ValidationError) else str(e))
+                continue
+
+            if isinstance(frame_object, Uplink):
+                frame_objects_uplink.append(frame_object)
+            elif isinstance(frame_object, Downlink):
+                frame_objects_downlink.append(frame_object)
+
+            if len(frame_objects_uplink) + len(frame_objects_downlink) >= SUBMISSION_CHUNK_SIZE:
+                stored_frames += bulk_create_frames(frame_objects_uplink, frame_objects_downlink)
+                frame_objects_uplink = []
+                frame_objects_downlink = []
+
+    except DECOMPRESSION_ERRORS as e:  # pylint:disable=C0103
+        # the lines read before the corrupted part are kept
+        reject(line_number + 1, "Invalid compressed data: " + str(e))
 
+    stored_frames += bulk_create_frames(frame_objects_uplink, frame_objects_downlink)
 
-def build_frame_model_object(frame: dict, username: str, application: str = None) -> models.Model:
+    if rejected_lines > len(errors):
+        errors.append({"line": None, "message": f"{rejected_lines - len(errors)} more lines rejected"})
+
+    return stored_frames, errors
+
+
+def store_submission(stream, username: Union[str, Submitter], application: str = None,
+                     content_type: str = "application/json", content_encoding: str = "") -> tuple:
+    """Store the frames of a (possibly gzip or zstd compressed) submission read from a stream.
+    NDJSON submissions are stored line by line, the rejected lines are reported.
+    JSON submissions are stored entirely or rejected as a whole.
+    Submissions without any JSON value are rejected.
+    Returns the number of stored frames and the list of rejected lines."""
+    stream = open_submission_stream(stream, content_encoding)
+
+    if content_type in NDJSON_CONTENT_TYPES:
+        stored_frames, errors = store_frames_ndjson(iter_lines(stream), username, application)
+        if stored_frames == 0 and not errors:
+            raise BadRequest("Empty submission")
+        return stored_frames, errors
+
+    try:
+        return store_frames_stream(iter_json_values(stream), username, application), []
+    except DECOMPRESSION_ERRORS as e:  # pylint:disable=C0103
+        raise BadRequest("Invalid compressed data: " + str(e)) from e
+
+
+def bulk_create_frames(frame_objects_uplink: list, frame_objects_downlink: list) -> int:
+    """Batch uplink/downlink frames into 1 database commit per table."""
+    Uplink.objects.bulk_create(frame_objects_uplink)
+    Downlink.objects.bulk_create(frame_objects_downlink)
+
+    return len(frame_objects_downlink) + len(frame_objects_uplink)
+
+
+def build_frame_model_object(frame: dict, user: Submitter, application: str = None) -> models.Model:
     """Adds one json frame to the uplink/downlink table"""
 
     frame_entry = None
@@ -58,13 +192,11 @@ def build_frame_model_object(frame: dict, username: str, application: str = None
     if "link" not in frame:
         frame["link"] = "downlink"
 
-    user = Member.objects.get(username=username)
-
     if frame["link"] == "uplink":
         if not user.has_perm("transmission.add_uplink"):
             raise PermissionDenied()
         frame_entry = Uplink()
-        frame_entry.operator = user
+        frame_entry.operator = user.username
 
     elif frame["link"] == "downlink":
         if not user.has_perm("transmission.add_downlink"):
@@ -87,8 +219,8 @@ def build_frame_model_object(frame: dict, username: str, application: str = None
 
 def check_valid_frame(frame: dict) -> None:
     """Check if a given frame has a valid form and a timestamp."""
-    # check if the frame exists, and it is a HEX string
-    non_hex = re.match("^[A-Fa-f0-9]+$", frame["frame"])
+    # check if the frame exists, and it is a HEX string (of whole bytes)
+    non_hex = re.match("^([A-Fa-f0-9]{2})+$", frame["frame"])
     if non_hex is None:
         raise ValidationError("Invalid frame, not an hexadecimal value.")
 
@@ -99,8 +231,8 @@ def check_valid_frame(frame: dict) -> None:
 
 def parse_submitted_frame(frame: dict, frame_entry: models.Model) -> models.Model:
     """Extract frame info from frame and store it into frame_entry (database frame)"""
-    # assign the frame HEX values
-    frame_entry.frame = frame['frame']
+    # assign the frame, stored as bytes
+    frame_entry.set_frame(frame['frame'])
     # assign the timestamp
     frame_entry.timestamp = parse_datetime(frame["timestamp"]).astimezone(pytz.utc)
     # assign frequency, if present
@@ -124,88 +256,82 @@ def process_uplink_and_downlink() -> tuple:
     i.e. move them to the influxdb raw satellite data bucket."""
 
     downlink_frames = Downlink.objects.all().filter(processed=False)
+    downlink_frames_count = downlink_frames.count()
     process_frames(downlink_frames, "downlink")
 
     uplink_frames = Uplink.objects.all().filter(processed=False)
+    uplink_frames_count = uplink_frames.count()
     process_frames(uplink_frames, "uplink")
 
-    return len(downlink_frames), len(uplink_frames)
+    return downlink_frames_count, uplink_frames_count
 
 
 def process_frames(frames: QuerySet, link: str) -> int:
-    """Try to store frame to influxdb and set the processed flag to True
-    if a frame was successfully stored in influxdb.
+    """Try to store frames to influxdb and set the processed flag to True
+    for the frames successfully stored in influxdb.
+    The frames are read and processed in chunks, the processed and invalid flags
+    are updated with one query per chunk.
     Returns the count of successfully processed_frames."""
 
     processed_frames = 0
-    processed_frames_timestamps = {}
-    for frame_obj in frames:
-        frame_dict = frame_obj.to_dictionary()
-        stored, satellite = store_frame_to_influxdb(frame_dict, link)
-        if stored:
-            frame_obj.processed = True
-            frame_obj.invalid = False
-            frame_obj.save()
-            processed_frames += 1
-            if satellite not in processed_frames_timestamps:
-                processed_frames_timestamps[satellite] = include_timestamp_in_time_range(
-                    satellite, link,
-                    frame_obj.timestamp,
-                    existing_range={}
-                )
-            else:
-                processed_frames_timestamps[satellite] = include_timestamp_in_time_range(
-                    satellite, link,
-                    frame_obj.timestamp,
-                    existing_range=processed_frames_timestamps[satellite]
-                )
-    for satellite, time_range in processed_frames_timestamps.items():
-        path = get_new_data_buffer_temp_folder(satellite)
-        path += satellite + "_" + link + "_" + str(len(os.listdir(path))) + ".json"
-        save_timestamps_to_file(time_range, path)
-
-    return processed_frames
+    frames_iterator = frames.iterator(chunk_size=PROCESS_FRAMES_CHUNK_SIZE)
 
+    while True:
+        chunk = list(islice(frames_iterator, PROCESS_FRAMES_CHUNK_SIZE))
+        if not chunk:
+            break
 
-def mark_frame_as_invalid(frame: str, link: str) -> None:
-    """Flag an invalid frame that doesn't correspond to any satellite."""
-    if link == "downlink":
-        Downlink.objects.filter(frame=frame).update(invalid=True)
-    elif link == "uplink":
-        Uplink.objects.filter(frame=frame).update(invalid=True)
+        stored_frames, invalid_frames = store_frames_to_influxdb(chunk, link)
 
+        frames.model.objects.filter(pk__in=[frame_obj.pk for frame_obj in invalid_frames]).update(invalid=True)
+        stored_frames_pks = [frame_obj.pk for frame_objs in stored_frames.values() for frame_obj in frame_objs]
+        frames.model.objects.filter(pk__in=stored_frames_pks).update(processed=True, invalid=False)
+        processed_frames += len(stored_frames_pks)
 
-def store_frame_to_influxdb(frame: dict, link: str) -> tuple:
-    """Try to store frame to influxdb.
-    Returns True if the frame was successfully stored, False otherwise."""
+    return processed_frames
 
-    satellite = get_satellite_from_frame(frame["frame"])
 
-    if satellite is None:
-        mark_frame_as_invalid(frame["frame"], link)
-        logger.warning("invalid %s frame, cannot match satellite: %s", link, frame["frame"])
-        return False, satellite
+def store_frames_to_influxdb(frames: list, link: str) -> tuple:
+    """Classify a chunk of uplink/downlink frame objects by satellite and store them to influxdb
+    with one write per satellite. Returns a dict with the stored frame objects of each satellite
+    (including the frames that were already stored) and the list of invalid frame objects
+    that don't correspond to any satellite."""
 
     fields_to_save = ["frame", "timestamp", "observer", "frequency", "application", "metadata"]
 
-    frame = strip_tlm(frame, fields_to_save)
-    stored = save_raw_frame_to_influxdb(satellite, link, frame)
-
-    return stored, satellite
-
-
-def get_satellite_from_frame(frame: str) -> Union[str, None]:
-    """Find the corresponding satellite by attempting to parse the frame.
-    If the parsing is successful, return the satellite name, else None."""
-    for sat, parser in SatParsers().parsers.items():
-        if parser is not None:
-            try:
-                parser.processTMFrame(bytes.fromhex(frame))
-                return sat
-            except XTCEException:
-                pass
-
-    return None
+    frames_by_satellite = {}
+    invalid_frames = []
+    satellites = {}
+    for frame_obj in frames:
+        # identical frames are only parsed once
+        if frame_obj.frame_hash not in satellites:
+            satellites[frame_obj.frame_hash] = get_satellite_from_frame(frame_obj.frame)
+        satellite = satellites[frame_obj.frame_hash]
+
+        if satellite is None:
+            logger.warning("invalid %s frame, cannot match satellite: %s", link, frame_obj.frame_hex)
+            invalid_frames.append(frame_obj)
+            continue
+
+        frames_by_satellite.setdefault(satellite, []).append(frame_obj)
+
+    stored_frames = {}
+    for satellite, frame_objs in frames_by_satellite.items():
+        telemetry = [strip_tlm(frame_obj.to_dictionary(), fields_to_save) for frame_obj in frame_objs]
+        # the frames that are not written are already stored (duplicates), they are stored frames as well
+        # such that they are marked as processed and not read again
+        save_raw_frames_to_influxdb(satellite, link, telemetry)
+        stored_frames[satellite] = frame_objs
+
+    return stored_frames, invalid_frames
+
+
+def get_satellite_from_frame(frame: Union[str, bytes]) -> Union[str, None]:
+    """Find the corresponding satellite by attempting to parse the frame (HEX string or bytes)
+    with the satellites matching its header. If the parsing is successful, return the satellite name, else None."""
+    if isinstance(frame, str):
+        frame = bytes.fromhex(frame)
+    return get_satellite_index().get_satellite(bytes(frame))
 
 
 def save_tle(tle: str) -> models.Model:
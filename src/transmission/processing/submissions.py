@@ -0,0 +1,90 @@
+"""Queue for asynchronous frame submissions: the request body is stored as received
+and moved to the uplink/downlink tables by a background job."""
+import io
+from json.decoder import JSONDecodeError
+
+from django.core.exceptions import BadRequest, ObjectDoesNotExist, PermissionDenied
+from django.db import transaction
+from django.forms import ValidationError
+from django.utils import timezone
+from django_logger import logger
+
+from transmission.models import FrameSubmission
+from transmission.processing.api_key_cache import Submitter
+from transmission.processing.save_raw_data import store_submission
+
+
+def queue_submission(submitter: Submitter, body: bytes, application: str = None,
+                     content_type: str = "application/json", content_encoding: str = "") -> FrameSubmission:
+    """Store a submission in the queue without parsing (or decompressing) it."""
+    return FrameSubmission.objects.create(username=submitter.username, application=application, body=body,
+                                          content_type=content_type, content_encoding=content_encoding)
+
+
+def process_queued_submissions() -> int:
+    """Store the frames of all queued submissions, oldest first.
+    Each submission is locked while it is processed, such that multiple workers can drain the queue.
+    Returns the number of processed submissions."""
+    processed_submissions = 0
+
+    while True:
+        with transaction.atomic():
+            submission = FrameSubmission.objects.select_for_update(skip_locked=True) \
+                .filter(status=FrameSubmission.QUEUED).order_by("received_at").first()
+            if submission is None:
+                break
+
+            process_submission(submission)
+            processed_submissions += 1
+
+    return processed_submissions
+
+
+def process_submission(submission: FrameSubmission) -> None:
+    """Store the frames of a submission and record the outcome in its status.
+    Either all frames of a JSON submission are stored or none,
+    the invalid lines of an NDJSON submission are rejected and listed in the errors."""
+    try:
+        # the frames are stored in a savepoint, a database error rolls back the frames of the submission
+        # but leaves the transaction usable such that the failure is recorded
+        with transaction.atomic():
+            submission.frames_saved, submission.errors = store_submission(
+                io.BytesIO(submission.body), submission.username, submission.application,
+                content_type=submission.content_type, content_encoding=submission.content_encoding)
+        if submission.errors and submission.frames_saved == 0:
+            submission.status = FrameSubmission.FAILED
+            submission.message = "No frames saved, invalid lines rejected"
+        elif submission.errors:
+            submission.status = FrameSubmission.PROCESSED
+            submission.message = f"{submission.frames_saved} frames saved, invalid lines rejected"
+        else:
+            submission.status = FrameSubmission.PROCESSED
+            submission.message = f"Successful, {submission.frames_saved} frames saved"
+        logger.info("%s submission %s processed: %s frames saved.",
+                    submission.username, submission.id, submission.frames_saved)
+
+    except Exception as e:  # pylint:disable=C0103, W0703
+        submission.status = FrameSubmission.FAILED
+        submission.message = get_submission_error_message(e)
+        logger.error("%s submission %s failed: %s", submission.username, submission.id, submission.message)
+
+    submission.processed_at = timezone.now()
+    submission.save()
+
+
+def get_submission_error_message(error: Exception) -> str:
+    """Describe why a submission was rejected."""
+    if isinstance(error, JSONDecodeError):
+        return "Invalid JSON structure"
+    if isinstance(error, PermissionDenied):
+        return "Permission denied"
+    if isinstance(error, ObjectDoesNotExist):
+        return "Unauthorized request"
+    if isinstance(error, (BadRequest, ValidationError)):
+        return str(error)
+    return type(error).__qualname__ + ": " + str(error)
+
+
+def has_queued_submissions() -> bool:
+    """Return True if there are submissions waiting to be processed."""
+    return FrameSubmission.objects.filter(status=FrameSubmission.QUEUED).exists()
@@ -0,0 +1,158 @@
+"""Cache of the telemetry query results, in time chunks aligned to the aggregation windows.
+A query is split into chunks of a fixed number of windows, such that queries of overlapping
+time ranges share the cached chunks and only the missing chunks are queried from influxdb.
+Chunks that ended long enough ago are cached until telemetry is written in their time range,
+recent chunks expire after a short time. Writing processed telemetry bumps the cache version
+of the months it was written in, which invalidates all chunks overlapping these months.
+The chunks are cached per process, the versions are kept in the 'shared' cache such that telemetry
+written by any process (e.g. a reprocessing command or a worker process) invalidates the chunks."""
+from datetime import datetime, timedelta, timezone
+import hashlib
+import os
+import uuid
+from typing import Callable
+
+from django.core.cache import cache, caches
+from django.utils.connection import ConnectionProxy
+
+from transmission.processing.satellites import EPOCH, to_datetime
+
+# number of aggregation windows per cached chunk
+TELEMETRY_CACHE_CHUNK_WINDOWS = int(os.environ.get('TELEMETRY_CACHE_CHUNK_WINDOWS', 500))
+# chunks ending less than this number of seconds ago are considered recent
+TELEMETRY_CACHE_RECENT_PERIOD = int(os.environ.get('TELEMETRY_CACHE_RECENT_PERIOD', 24 * 3600))
+# time (seconds) a recent chunk is cached
+TELEMETRY_CACHE_RECENT_TIMEOUT = int(os.environ.get('TELEMETRY_CACHE_RECENT_TIMEOUT', 60))
+
+TELEMETRY_CACHE_PREFIX = "telemetry:"
+TELEMETRY_VERSION_CACHE_PREFIX = "telemetry_version:"
+
+version_cache = ConnectionProxy(caches, "shared")
+
+
+def get_time_chunks(start: datetime, stop: datetime, window_seconds: int) -> list:
+    """Split a time range in (start, stop) chunks of TELEMETRY_CACHE_CHUNK_WINDOWS windows,
+    aligned to the epoch like the influxdb aggregation windows. The first and last chunk
+    are cut at the start and stop of the range."""
+    span = window_seconds * TELEMETRY_CACHE_CHUNK_WINDOWS
+    chunk_start = EPOCH + timedelta(seconds=(start - EPOCH).total_seconds() // span * span)
+
+    chunks = []
+    while chunk_start < stop:
+        chunk_stop = chunk_start + timedelta(seconds=span)
+        chunks.append((max(chunk_start, start), min(chunk_stop, stop)))
+        chunk_start = chunk_stop
+    return chunks
+
+
+def get_months(start: datetime, stop: datetime) -> list:
+    """Return the months (YYYY-MM) overlapping a time range."""
+    months = []
+    month = datetime(start.year, start.month, 1, tzinfo=timezone.utc)
+    while month < stop or not months:
+        months.append(month.strftime("%Y-%m"))
+        month = datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=timezone.utc)
+    return months
+
+
+def _version_key(satellite: str, link: str, month: str) -> str:
+    return TELEMETRY_VERSION_CACHE_PREFIX + f"{satellite}:{link}:{month}"
+
+
+def _new_version() -> str:
+    return uuid.uuid4().hex
+
+
+def _get_versions(version_keys: list) -> dict:
+    """Return the cache versions of the months. Missing (e.g. evicted) versions are replaced by new versions,
+    such that a version never returns to a value of which stale chunks may still be cached."""
+    versions = version_cache.get_many(version_keys)
+    for version_key in version_keys:
+        if version_key not in versions:
+            version_cache.add(version_key, _new_version(), timeout=None)
+            versions[version_key] = version_cache.get(version_key)
+    return versions
+
+
+def _chunk_key(satellite: str, link: str, parameters: list, window_seconds: int, aggregate: str,
+               chunk: tuple) -> str:
+    query_digest = hashlib.sha256(",".join(parameters).encode()).hexdigest()
+    return TELEMETRY_CACHE_PREFIX + f"{satellite}:{link}:{aggregate}:{window_seconds}:{query_digest}:" + \
+        f"{chunk[0].timestamp()}:{chunk[1].timestamp()}"
+
+
+def _chunk_timeout(chunk: tuple):
+    """Historical chunks are cached indefinitely (until invalidated), recent chunks expire."""
+    if chunk[1] <= datetime.now(timezone.utc) - timedelta(seconds=TELEMETRY_CACHE_RECENT_PERIOD):
+        return None
+    return TELEMETRY_CACHE_RECENT_TIMEOUT
+
+
+def _split_columns(columns: dict, chunks: list) -> list:
+    """Split the columns of a query of consecutive chunks into the columns of each chunk.
+    Rows are timed at the end of their window, a row belongs to the chunk (start, stop]."""
+    chunks_columns = [{name: [] for name in columns} for _ in chunks]
+    chunk_index = 0
+    for row_index, time in enumerate(columns["time"]):
+        while chunk_index < len(chunks) - 1 and time > chunks[chunk_index][1]:
+            chunk_index += 1
+        for name, values in columns.items():
+            chunks_columns[chunk_index][name].append(values[row_index])
+    return chunks_columns
+
+
+def get_cached_telemetry(satellite: str, link: str, parameters: list, start: datetime, stop: datetime,
+                         window_seconds: int, aggregate: str, fetch: Callable) -> dict:
+    """Return the telemetry columns of a query, combining the cached chunks with the missing chunks.
+    fetch(start, stop) queries the columns of a time range; consecutive missing chunks are fetched at once."""
+    chunks = get_time_chunks(start, stop, window_seconds)
+    chunk_keys = [_chunk_key(satellite, link, parameters, window_seconds, aggregate, chunk) for chunk in chunks]
+
+    # the versions are read before querying, such that a concurrent write invalidates the new entries
+    version_keys = {month: _version_key(satellite, link, month) for month in get_months(start, stop)}
+    versions = _get_versions(list(version_keys.values()))
+
+    def chunk_versions(chunk):
+        return tuple(versions[version_keys[month]] for month in get_months(*chunk))
+
+    cached = cache.get_many(chunk_keys)
+    chunks_columns = []
+    missing = []
+    for chunk, chunk_key in zip(chunks, chunk_keys):
+        entry = cached.get(chunk_key)
+        if entry is not None and entry[0] == chunk_versions(chunk):
+            chunks_columns.append(entry[1])
+        else:
+            chunks_columns.append(None)
+            missing.append(len(chunks_columns) - 1)
+
+    # fetch the runs of consecutive missing chunks
+    runs = []
+    for index in missing:
+        if runs and runs[-1][-1] == index - 1:
+            runs[-1].append(index)
+        else:
+            runs.append([index])
+
+    for run in runs:
+        run_chunks = [chunks[index] for index in run]
+        columns = fetch(run_chunks[0][0], run_chunks[-1][1])
+        for index, chunk_columns in zip(run, _split_columns(columns, run_chunks)):
+            chunks_columns[index] = chunk_columns
+            cache.set(chunk_keys[index], (chunk_versions(chunks[index]), chunk_columns),
+                      _chunk_timeout(chunks[index]))
+
+    result = {"time": []}
+    result.update({parameter: [] for parameter in parameters})
+    for columns in chunks_columns:
+        for name, values in columns.items():
+            result[name] += values
+    return result
+
+
+def invalidate_telemetry_cache(satellite: str, link: str, timestamps: list) -> None:
+    """Invalidate the cached telemetry chunks overlapping the months of the timestamps
+    (datetimes or strings in ISO 8601) at which telemetry was written."""
+    months = {to_datetime(timestamp).strftime("%Y-%m") for timestamp in timestamps}
+
+    version_cache.set_many({_version_key(satellite, link, month): _new_version() for month in months}, timeout=None)
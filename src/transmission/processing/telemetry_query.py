@@ -0,0 +1,262 @@
+"""Query the processed telemetry of the satellite buckets, downsampled by influxdb.
+The requested time range is divided into windows such that at most the requested number
+of points is returned per parameter, and the result is returned as columns.
+Windows of whole hours or days are aggregated from the rollup buckets instead of the parsed points."""
+from datetime import datetime, timezone
+import math
+import os
+import re
+
+from django.core.exceptions import BadRequest
+
+from transmission.processing.influxdb_api import get_influx_db_read_and_query_api
+from transmission.processing.rollups import ROLLUP_INTERVALS, get_rollup_bucket
+from transmission.processing.satellites import SATELLITES
+from transmission.processing.telemetry_cache import get_cached_telemetry
+from transmission.processing.telemetry_schema import get_telemetry_bucket
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+# number of points per parameter returned when not specified in the request
+TELEMETRY_QUERY_DEFAULT_POINTS = int(os.environ.get('TELEMETRY_QUERY_DEFAULT_POINTS', 1000))
+# maximum number of points per parameter that can be requested
+TELEMETRY_QUERY_MAX_POINTS = int(os.environ.get('TELEMETRY_QUERY_MAX_POINTS', 10000))
+# maximum number of parameters per request
+TELEMETRY_QUERY_MAX_PARAMETERS = int(os.environ.get('TELEMETRY_QUERY_MAX_PARAMETERS', 20))
+
+AGGREGATE_FUNCTIONS = ["mean", "median", "min", "max", "first", "last", "count"]
+
+# aggregate functions computed from the rollups: the function combining the rollup points of the same aggregate,
+# the mean is weighted by the count of each rollup point
+ROLLUP_AGGREGATE_FUNCTIONS = {
+    "min": "min",
+    "max": "max",
+    "count": "sum",
+    "mean": "mean",
+}
+
+TELEMETRY_CONTENT_TYPES = {
+    "json": "application/json",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# durations (seconds) of the aggregation windows, from 1 second to 1 week
+WINDOW_DURATIONS = [1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 2 * 3600, 3 * 3600, 6 * 3600,
+                    12 * 3600, 24 * 3600, 7 * 24 * 3600]
+
+# parameter names are inserted in the flux query, only names as defined in the XTCE files are allowed
+PARAMETER_NAME_REGEX = re.compile(r"^[A-Za-z0-9_]+$")
+
+
+def parse_query_time(value: str, default: datetime = None) -> datetime:
+    """Parse an ISO 8601 timestamp of a query, naive timestamps are in UTC."""
+    if not value:
+        if default is None:
+            raise BadRequest("Missing start time")
+        return default
+
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except ValueError as ex:
+        raise BadRequest(f"Invalid timestamp: {value}") from ex
+
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+def format_query_time(timestamp: datetime) -> str:
+    """Format a timestamp of a query as RFC3339 with microseconds, in the flux query and the query result."""
+    return timestamp.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def get_window_seconds(start: datetime, stop: datetime, points: int) -> int:
+    """Return the duration (seconds) of the windows dividing the time range in at most the given number of points.
+    The duration is rounded up to one of the WINDOW_DURATIONS (or whole weeks), such that similar queries
+    use the same windows and share the cached results."""
+    seconds = math.ceil((stop - start).total_seconds() / points)
+    for duration in WINDOW_DURATIONS:
+        if seconds <= duration:
+            return duration
+    return math.ceil(seconds / WINDOW_DURATIONS[-1]) * WINDOW_DURATIONS[-1]
+
+
+def validate_telemetry_query(satellite: str, link: str, parameters: list, points: int, aggregate: str) -> None:
+    """Raise BadRequest if the query arguments are invalid."""
+    if satellite not in SATELLITES:
+        raise BadRequest(f"Unknown satellite: {satellite}")
+    if link not in ["downlink", "uplink"]:
+        raise BadRequest(f"Invalid link: {link}")
+    if not parameters:
+        raise BadRequest("No parameters requested")
+    if len(parameters) > TELEMETRY_QUERY_MAX_PARAMETERS:
+        raise BadRequest(f"At most {TELEMETRY_QUERY_MAX_PARAMETERS} parameters can be requested")
+    for parameter in parameters:
+        if not PARAMETER_NAME_REGEX.match(parameter):
+            raise BadRequest(f"Invalid parameter name: {parameter}")
+    if not 1 <= points <= TELEMETRY_QUERY_MAX_POINTS:
+        raise BadRequest(f"The number of points must be between 1 and {TELEMETRY_QUERY_MAX_POINTS}")
+    if aggregate not in AGGREGATE_FUNCTIONS:
+        raise BadRequest(f"Invalid aggregate function: {aggregate}")
+
+
+def get_rollup_interval(window_seconds: int, aggregate: str):
+    """Return the longest rollup interval of which the windows are a multiple, or None if the query
+    cannot be computed from the rollups (shorter windows or aggregate functions not in the rollups)."""
+    if aggregate not in ROLLUP_AGGREGATE_FUNCTIONS:
+        return None
+
+    intervals = [interval for interval, seconds in ROLLUP_INTERVALS.items() if window_seconds % seconds == 0]
+    return max(intervals, key=ROLLUP_INTERVALS.get, default=None)
+
+
+def build_rollup_aggregate_query(satellite: str, link: str, fields_filter: str, time_range: str, window: str,
+                                 aggregate: str, rollup_interval: str) -> str:
+    """Return the flux query aggregating the rollup points of the parameters per window, with one table
+    per parameter. The mean is the mean of the rollup means weighted by their count."""
+    rollups = f'''from(bucket: "{get_rollup_bucket(satellite, link, rollup_interval)}")
+        |> range({time_range})
+        |> filter(fn: (r) => {fields_filter})'''
+
+    if aggregate != "mean":
+        return f'''
+        {rollups}
+        |> filter(fn: (r) => r["aggregate"] == "{aggregate}")
+        |> keep(columns: ["_start", "_stop", "_time", "_field", "_value"])
+        |> group(columns: ["_field"])
+        |> aggregateWindow(every: {window}, fn: {ROLLUP_AGGREGATE_FUNCTIONS[aggregate]}, createEmpty: false)
+        {"|> toInt()" if aggregate == "count" else ""}
+        '''
+
+    return f'''
+        data = {rollups}
+        |> filter(fn: (r) => r["aggregate"] == "mean" or r["aggregate"] == "count")
+        |> pivot(rowKey: ["_time", "_measurement", "_field"], columnKey: ["aggregate"], valueColumn: "_value")
+        |> keep(columns: ["_start", "_stop", "_time", "_field", "mean", "count"])
+        |> group(columns: ["_field"])
+
+        total = data
+        |> map(fn: (r) => ({{r with _value: r.mean * r.count}}))
+        |> aggregateWindow(every: {window}, fn: sum, createEmpty: false)
+        count = data
+        |> map(fn: (r) => ({{r with _value: r.count}}))
+        |> aggregateWindow(every: {window}, fn: sum, createEmpty: false)
+
+        join(tables: {{total: total, count: count}}, on: ["_time", "_field"])
+        |> map(fn: (r) => ({{_time: r._time, _field: r._field, _value: r._value_total / r._value_count}}))
+        '''
+
+
+def build_telemetry_query(satellite: str, link: str, parameters: list, start: datetime, stop: datetime,
+                          window: str, aggregate: str, rollup_interval: str = None) -> str:
+    """Return the flux query aggregating the parameters per window, with one column per parameter.
+    The measurements (frame types) and status tags are merged per parameter.
+    The parsed points are aggregated, or the points of the rollup interval if given."""
+    fields_filter = " or ".join(f'r["_field"] == "{parameter}"' for parameter in parameters)
+    time_range = f"start: {format_query_time(start)}, stop: {format_query_time(stop)}"
+
+    if rollup_interval is None:
+        aggregate_query = f'''
+        from(bucket: "{get_telemetry_bucket(satellite, link)}")
+        |> range({time_range})
+        |> filter(fn: (r) => {fields_filter})
+        |> keep(columns: ["_start", "_stop", "_time", "_field", "_value"])
+        |> group(columns: ["_field"])
+        |> aggregateWindow(every: {window}, fn: {aggregate}, createEmpty: false)'''
+    else:
+        aggregate_query = build_rollup_aggregate_query(satellite, link, fields_filter, time_range, window, aggregate,
+                                                       rollup_interval)
+
+    return aggregate_query + '''
+        |> group()
+        |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")
+        |> sort(columns: ["_time"])
+        '''
+
+
+def fetch_telemetry_columns(satellite: str, link: str, parameters: list, start: datetime, stop: datetime,
+                            window: str, aggregate: str, rollup_interval: str = None) -> dict:
+    """Run the telemetry query on influxdb and return the window times and a list of values per parameter
+    (None if a parameter has no value in a window)."""
+    query = build_telemetry_query(satellite, link, parameters, start, stop, window, aggregate, rollup_interval)
+
+    _, query_api = get_influx_db_read_and_query_api()
+
+    columns = {"time": []}
+    columns.update({parameter: [] for parameter in parameters})
+    for record in query_api.query_stream(query=query):
+        columns["time"].append(record.values["_time"])
+        for parameter in parameters:
+            columns[parameter].append(record.values.get(parameter))
+    return columns
+
+
+def query_telemetry(satellite: str, parameters: list, start: datetime, stop: datetime,
+                    points: int = TELEMETRY_QUERY_DEFAULT_POINTS, aggregate: str = "mean",
+                    link: str = "downlink", use_cache: bool = True) -> dict:
+    """Query the telemetry parameters of a satellite, downsampled to at most the given number of points.
+    Returns the query description with the result as columns: the window times and a list of values
+    per parameter (None if a parameter has no value in a window).
+    The result is served from the telemetry cache where possible, unless use_cache is False."""
+    validate_telemetry_query(satellite, link, parameters, points, aggregate)
+    if stop <= start:
+        raise BadRequest("The start time must be before the stop time")
+
+    window_seconds = get_window_seconds(start, stop, points)
+    window = f"{window_seconds}s"
+    rollup_interval = get_rollup_interval(window_seconds, aggregate)
+
+    def fetch(fetch_start: datetime, fetch_stop: datetime) -> dict:
+        return fetch_telemetry_columns(satellite, link, parameters, fetch_start, fetch_stop, window, aggregate,
+                                       rollup_interval)
+
+    if use_cache:
+        columns = get_cached_telemetry(satellite, link, parameters, start, stop, window_seconds, aggregate, fetch)
+    else:
+        columns = fetch(start, stop)
+
+    return {
+        "satellite": satellite,
+        "link": link,
+        "start": format_query_time(start),
+        "stop": format_query_time(stop),
+        "window": window,
+        "aggregate": aggregate,
+        "columns": columns,
+    }
+
+
+def is_telemetry_format_available(result_format: str) -> bool:
+    """Return True if query results can be returned in the given format."""
+    if result_format == "arrow":
+        return pyarrow is not None
+    return result_format in TELEMETRY_CONTENT_TYPES
+
+
+def telemetry_to_json(result: dict) -> dict:
+    """Return the query result with JSON serializable times."""
+    columns = dict(result["columns"])
+    columns["time"] = [format_query_time(timestamp) for timestamp in columns["time"]]
+    return dict(result, columns=columns)
+
+
+def telemetry_to_arrow(result: dict) -> bytes:
+    """Serialize the query result columns as an Arrow IPC stream. Requires pyarrow.
+    The query description is stored in the schema metadata."""
+    if pyarrow is None:
+        raise ImportError("Arrow results require pyarrow")
+
+    columns = result["columns"]
+    arrays = {"time": pyarrow.array(columns["time"], pyarrow.timestamp("us", tz="UTC"))}
+    arrays.update({parameter: pyarrow.array(values) for parameter, values in columns.items() if parameter != "time"})
+    metadata = {key: str(value) for key, value in result.items() if key != "columns"}
+    table = pyarrow.table(arrays, metadata=metadata)
+
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,170 @@
+"""Storage schemas of the parsed telemetry.
+- field schema (default): one point per telemetry field, with the field status as tag,
+  stored in the <satellite>_<link> bucket.
+- frame schema: one point per frame, with all telemetry fields of the frame as fields
+  and the statuses of all fields in one status bitmap, stored in the <satellite>_<link>_frames bucket.
+The schema used for new telemetry is set with the TELEMETRY_SCHEMA environment variable,
+existing field schema buckets are rewritten with the migratetelemetryschema command."""
+from datetime import datetime, timedelta
+import os
+import string
+
+from transmission.processing.influxdb_api import PointBatch
+from django_logger import logger
+
+FIELD_SCHEMA = "field"
+FRAME_SCHEMA = "frame"
+TELEMETRY_SCHEMA = os.environ.get('TELEMETRY_SCHEMA', FIELD_SCHEMA)
+
+# frame schema field holding the statuses of the telemetry fields
+STATUS_BITMAP_FIELD = "status_bitmap"
+# 2 bits per telemetry field, fields ordered by name
+STATUS_CODES = {
+    "Valid": 0,
+    "Too Low": 1,
+    "Too High": 2,
+}
+UNKNOWN_STATUS_CODE = 3
+STATUS_NAMES = {code: status for status, code in STATUS_CODES.items()}
+
+# length (days) of the time slices rewritten at once by the schema migration
+SCHEMA_MIGRATION_DAYS = int(os.environ.get('SCHEMA_MIGRATION_DAYS', 7))
+
+
+def get_telemetry_bucket(satellite: str, link: str, schema: str = None) -> str:
+    """Return the bucket of the parsed telemetry of a satellite link in the given (by default the configured) schema."""
+    if (schema or TELEMETRY_SCHEMA) == FRAME_SCHEMA:
+        return satellite + "_" + link + "_frames"
+    return satellite + "_" + link
+
+
+def get_measurement_name(satellite: str, frame_type: str) -> str:
+    """Return the measurement of a frame type, e.g. DelfiPqFrameName."""
+    return string.capwords(satellite.replace("_", " ")).replace(" ", "") + frame_type
+
+
+def get_status_fields(fields) -> list:
+    """Return the telemetry fields of a frame point in the order of the status bitmap."""
+    return sorted(field for field in fields if field not in ["observer", STATUS_BITMAP_FIELD])
+
+
+def encode_status_bitmap(statuses: dict) -> str:
+    """Encode the statuses of the telemetry fields ({field: status}) in a hex bitmap,
+    2 bits per field in the order of get_status_fields, the first field in the lowest bits."""
+    bitmap = 0
+    for index, field in enumerate(get_status_fields(statuses)):
+        bitmap |= STATUS_CODES.get(statuses[field], UNKNOWN_STATUS_CODE) << (2 * index)
+    return format(bitmap, "x")
+
+
+def decode_status_bitmap(bitmap: str, fields) -> dict:
+    """Decode the status bitmap of a frame point given its telemetry fields, returns {field: status}."""
+    bitmap = int(bitmap, 16)
+    return {field: STATUS_NAMES.get((bitmap >> (2 * index)) & 3, "Unknown")
+            for index, field in enumerate(get_status_fields(fields))}
+
+
+def frame_point(measurement: str, timestamp, observer: str, values: dict, statuses: dict) -> dict:
+    """Return the frame schema point of a frame given the values and statuses of its telemetry fields."""
+    fields = dict(values)
+    fields[STATUS_BITMAP_FIELD] = encode_status_bitmap(statuses)
+    if observer is not None:
+        fields["observer"] = observer
+
+    return {
+        "measurement": measurement,
+        "time": timestamp,
+        "tags": {},
+        "fields": fields
+    }
+
+
+def telemetry_to_frame_points(satellite: str, timestamp, observer: str, telemetry: dict) -> list:
+    """Return the frame schema point of a parsed frame (as a list, like the field schema points)."""
+    if "frame" not in telemetry:
+        return []
+
+    values = {}
+    statuses = {}
+    for field, value_and_status in telemetry.items():
+        if field == "frame":
+            continue
+        value = value_and_status["value"]
+        # try to convert to float
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+        values[field] = value
+        statuses[field] = value_and_status["status"]
+
+    return [frame_point(get_measurement_name(satellite, telemetry["frame"]), timestamp, observer, values, statuses)]
+
+
+def field_records_to_frame_points(records) -> list:
+    """Combine the records of field schema points (ordered by measurement and time) into frame schema points."""
+    points = []
+    key = None
+    observer = None
+    values = {}
+    statuses = {}
+
+    for record in records:
+        record_key = (record.values["_measurement"], record.values["_time"])
+        if record_key != key:
+            if key is not None:
+                points.append(frame_point(key[0], key[1], observer, values, statuses))
+            key = record_key
+            observer = None
+            values = {}
+            statuses = {}
+
+        field = record.values["_field"]
+        if field == "observer":
+            observer = record.values["_value"]
+        else:
+            values[field] = record.values["_value"]
+            statuses[field] = record.values.get("status")
+
+    if key is not None:
+        points.append(frame_point(key[0], key[1], observer, values, statuses))
+    return points
+
+
+def migrate_time_range(query_api, write_api, satellite: str, link: str, start: datetime, stop: datetime) -> int:
+    """Rewrite the field schema points of a time range into the frame schema bucket.
+    Returns the number of frame points written."""
+    query = f'''
+        from(bucket: "{get_telemetry_bucket(satellite, link, FIELD_SCHEMA)}")
+        |> range(start: {start.strftime('%Y-%m-%dT%H:%M:%SZ')}, stop: {stop.strftime('%Y-%m-%dT%H:%M:%SZ')})
+        |> group(columns: ["_measurement"])
+        |> sort(columns: ["_time"])
+        '''
+    points = field_records_to_frame_points(query_api.query_stream(query=query))
+
+    batch = PointBatch(write_api, get_telemetry_bucket(satellite, link, FRAME_SCHEMA))
+    failed = []
+    for point in points:
+        failed += batch.add(point["time"], [point])[1]
+    failed += batch.flush()[1]
+    if failed:
+        raise IOError(f"{len(failed)} frame points of {satellite} {link} could not be written")
+
+    return len(points)
+
+
+def migrate_to_frame_schema(query_api, write_api, satellite: str, link: str, start: datetime,
+                            stop: datetime) -> int:
+    """Rewrite the field schema telemetry of a satellite link from start to stop into the frame schema bucket,
+    in slices of SCHEMA_MIGRATION_DAYS days. Returns the number of frame points written."""
+    frames_count = 0
+    slice_start = start
+    while slice_start < stop:
+        slice_stop = min(slice_start + timedelta(days=SCHEMA_MIGRATION_DAYS), stop)
+        slice_count = migrate_time_range(query_api, write_api, satellite, link, slice_start, slice_stop)
+        logger.info("%s: %s %s frames migrated from %s to %s", satellite, slice_count, link, slice_start,
+                    slice_stop)
+        frames_count += slice_count
+        slice_start = slice_stop
+
+    return frames_count
@@ -8,8 +8,6 @@ import requests
 
 from django_logger import logger
 from transmission.processing.satellites import SATELLITES, TIME_FORMAT
-from transmission.processing.bookkeep_new_data_time_range import get_new_data_scraper_temp_folder, \
-    include_timestamp_in_time_range, save_timestamps_to_file
 from transmission.processing.influxdb_api import save_raw_frame_to_influxdb
 
 SATNOGS_PATH = "https://db.satnogs.org/api/telemetry/"
@@ -68,7 +66,6 @@ def scrape(satellite: str, save_to_db=True, save_to_file=False) -> None:
     telemetry = []
     telemetry_tmp = []
     logger.info("SatNOGS scraper started. Scraping %s telemetry.", satellite)
-    time_range = {}
     while True:
         response = requests.get(
             SATNOGS_PATH,
@@ -79,7 +76,6 @@ def scrape(satellite: str, save_to_db=True, save_to_file=False) -> None:
         telemetry_tmp = response.json()
         try:
             last = telemetry_tmp[-1]
-            first = telemetry_tmp[0]
 
             # concatenate telemetry
             telemetry = telemetry + telemetry_tmp
@@ -91,15 +87,12 @@ def scrape(satellite: str, save_to_db=True, save_to_file=False) -> None:
             if save_to_db:
                 fields_to_save = ["frame", "timestamp", "observer"]
                 stripped_tlm = strip_tlm_list(telemetry_tmp, fields_to_save)
-                if save_raw_frame_to_influxdb(satellite, "downlink", stripped_tlm):
-                    time_range = include_timestamp_in_time_range(satellite, 'downlink',
-                                                                 first["timestamp"], existing_range=time_range)
-                    time_range = include_timestamp_in_time_range(satellite, 'downlink',
-                                                                 last["timestamp"], existing_range=time_range)
+                # the stored frames are queued for processing
+                stored = save_raw_frame_to_influxdb(satellite, "downlink", stripped_tlm)
 
                 # if the frame is not stored (due to it being stored in a past scrape) and
                 # the next request retrieves data older than a week -> stop
-                elif (datetime.now() - next_time).days > 7:
+                if not stored and (datetime.now() - next_time).days > 7:
                     logger.info("SatNOGS scraper stopped. Done scraping %s telemetry.", satellite)
                     break  # stop scraping
 
@@ -114,9 +107,6 @@ def scrape(satellite: str, save_to_db=True, save_to_file=False) -> None:
                     delay = re.findall('[0-9]+', telemetry_tmp["detail"])[0]
                     logger.debug("Sleeping %s s (request throttled)", delay)
                     time.sleep(int(delay))
-                    path = get_new_data_scraper_temp_folder(satellite)
-                    path += satellite + "_downlink_" + str(len(os.listdir(path))) + ".json"
-                    save_timestamps_to_file(time_range, path)
                 else:
                     break
             else:
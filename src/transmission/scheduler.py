@@ -1,27 +1,48 @@
 """Scheduler for planning telemetry scrapes and frame processing and
  methods for adding frame processing jobs to the scheduler.
-Scraping, buffer processing and bucket processing can be parallelized.
+Scraping, buffer processing and bucket processing run in parallel in a pool of SCHEDULER_THREADS threads.
+With SCHEDULER_PROCESSES > 0 the bucket processing jobs run in a pool of worker processes instead,
+such that the parsing of different satellites is not limited to one CPU.
 Limitations:
-- Duplicate tasks are not considered.
-- Each satellite can have only 1 bucket processing job scheduled out of the following:
+- Duplicate tasks are not considered, a job scheduled while the same job is running is run again afterwards.
+- Each satellite can have only 1 bucket processing job scheduled or running out of the following:
     - raw_bucket_processing
     - reprocess_entire_raw_bucket
     - reprocess_failed_raw_bucket
+  A bucket processing job requested while another one is scheduled or running is merged with it.
+The queues are checked when the scheduler starts and every QUEUE_CHECK_INTERVAL minutes, such that
+the work queued before a restart is not left waiting for new data.
 """
 import datetime
+import multiprocessing
+import os
+import threading
 from typing import Callable
 from apscheduler.schedulers.base import STATE_STOPPED, STATE_PAUSED, STATE_RUNNING
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.date import DateTrigger
-from apscheduler.executors.pool import ThreadPoolExecutor
-from apscheduler.events import EVENT_JOB_ADDED, EVENT_JOB_REMOVED, EVENT_JOB_EXECUTED, EVENT_JOB_SUBMITTED
+from apscheduler.executors.pool import ProcessPoolExecutor, ThreadPoolExecutor
+from apscheduler.events import EVENT_JOB_ADDED, EVENT_JOB_REMOVED, EVENT_JOB_EXECUTED, EVENT_JOB_SUBMITTED, \
+    EVENT_JOB_ERROR
+from apscheduler.jobstores.base import ConflictingIdError
 from django.forms import ValidationError
 from django_logger import logger
 from transmission.processing.satellites import SATELLITES
 from transmission.processing.process_raw_bucket import process_raw_bucket
+from transmission.processing.bucket_worker import run_raw_bucket_processing
+from transmission.processing.frame_queue import has_due_frames
 from transmission.processing.telemetry_scraper import scrape
 from transmission.processing.save_raw_data import process_uplink_and_downlink
+from transmission.processing.submissions import has_queued_submissions, process_queued_submissions
+
+# number of threads running the scheduled jobs
+SCHEDULER_THREADS = int(os.environ.get('SCHEDULER_THREADS', 4))
+# number of worker processes running the bucket processing jobs, 0 runs them in the threads
+SCHEDULER_PROCESSES = int(os.environ.get('SCHEDULER_PROCESSES', 0))
+# interval (minutes) of the job scheduling the processing of the queued work,
+# at most the delay before the first retry of a frame (FRAME_QUEUE_RETRY_DELAY)
+QUEUE_CHECK_INTERVAL = int(os.environ.get('QUEUE_CHECK_INTERVAL', 1))
 
 
 def get_job_id(satellite: str, job_description: str) -> str:
@@ -33,10 +54,11 @@ def get_job_id(satellite: str, job_description: str) -> str:
     return satellite + "_" + job_description
 
 def schedule_job(job_type: str, satellite: str = None, link: str = None,
-                 date: datetime = None, interval: int = None) -> None:
+                 date: datetime = None, interval: int = None, restart: bool = False) -> None:
     """Schedule job for a specified satellite and/or link.
     Date will indicate the date and time when the task should run as datetime.
-    Interval represents the time interval in minutes for adding recurring tasks."""
+    Interval represents the time interval in minutes for adding recurring tasks.
+    Restart discards an interrupted reprocessing of the entire bucket instead of resuming it."""
     scheduler = Scheduler()
     scheduler.start_scheduler()
 
@@ -50,25 +72,74 @@ def schedule_job(job_type: str, satellite: str = None, link: str = None,
         job_id = job_type
         scheduler.add_job_to_schedule(process_uplink_and_downlink, args, job_id, date, interval)
 
+    elif job_type == "submission_processing":
+        args = []
+        job_id = job_type
+        scheduler.add_job_to_schedule(process_queued_submissions, args, job_id, date, interval)
+
     elif job_type == "raw_bucket_processing" and satellite in SATELLITES:
         args = [satellite, link]
         job_id = get_job_id(satellite, job_type)
-        scheduler.add_job_to_schedule(process_raw_bucket, args, job_id, date, interval)
+        add_bucket_processing_job(scheduler, args, job_id, date, interval)
 
     elif job_type == "reprocess_entire_raw_bucket" and satellite in SATELLITES:
-        args = [satellite, link, True, False]
+        args = [satellite, link, True, False, restart]
         job_id = get_job_id(satellite, job_type)
-        scheduler.add_job_to_schedule(process_raw_bucket, args, job_id, date, interval)
+        add_bucket_processing_job(scheduler, args, job_id, date, interval)
 
     elif job_type == "reprocess_failed_raw_bucket" and satellite in SATELLITES:
         args = [satellite, link, False, True]
         job_id = get_job_id(satellite, job_type)
-        scheduler.add_job_to_schedule(process_raw_bucket, args, job_id, date, interval)
+        add_bucket_processing_job(scheduler, args, job_id, date, interval)
 
     elif satellite not in SATELLITES or link not in ['uplink', 'downlink', None]:
         raise ValidationError("Select a satellite and/or link!")
 
 
+def check_queues() -> None:
+    """Schedule the processing of the submissions that are still queued, e.g. after a restart,
+    and of the queued frames that are due, e.g. retries or frames of which the lease expired."""
+    if has_queued_submissions():
+        schedule_job("submission_processing")
+
+    for satellite in SATELLITES:
+        if has_due_frames(satellite):
+            schedule_job("raw_bucket_processing", satellite)
+
+
+def merge_bucket_processing_args(args: list, other_args: list) -> list:
+    """Merge the arguments [satellite, link, all_frames, failed, restart] of two bucket processing jobs
+    of a satellite into those of one job doing the work of both: both links if the links differ, and
+    the processing of the entire bucket (started over) or of the failed frames if any of the jobs does."""
+    defaults = [None, None, False, False, False]
+    satellite, link, all_frames, failed, restart = list(args) + defaults[len(args):]
+    _, other_link, other_all_frames, other_failed, other_restart = list(other_args) + defaults[len(other_args):]
+
+    if link != other_link:
+        link = None
+
+    return [satellite, link, all_frames or other_all_frames, failed or other_failed, restart or other_restart]
+
+
+def merge_job_args(job_id: str, args: list, other_args: list) -> list:
+    """Return the arguments of a job requested again with other arguments.
+    Bucket processing jobs are merged, the other jobs take the arguments of the last request."""
+    if job_id.endswith("_bucket_processing"):
+        return merge_bucket_processing_args(args, other_args)
+    return other_args
+
+
+# pylint:disable=R0913
+def add_bucket_processing_job(scheduler, args: list, job_id: str, date: datetime = None,
+                              interval: int = None) -> None:
+    """Add a bucket processing job, run by the process pool if it is enabled."""
+    if SCHEDULER_PROCESSES > 0:
+        scheduler.add_job_to_schedule(run_raw_bucket_processing, args, job_id, date, interval,
+                                      executor="processpool")
+    else:
+        scheduler.add_job_to_schedule(process_raw_bucket, args, job_id, date, interval)
+
+
 class Singleton(type):
     """Singleton class"""
     _instances = {}
@@ -106,9 +177,13 @@ class Scheduler(metaclass=Singleton):
             logger.info("Scheduler already instantiated")
         else:
             executors = {
-                'default': ThreadPoolExecutor(1),
-                # 'processpool': ProcessPoolExecutor(0)
+                'default': ThreadPoolExecutor(SCHEDULER_THREADS),
             }
+            if SCHEDULER_PROCESSES > 0:
+                # the workers are spawned instead of forked, such that they don't share the database
+                # connections and the JVM gateway of this process
+                executors['processpool'] = ProcessPoolExecutor(
+                    SCHEDULER_PROCESSES, pool_kwargs={"mp_context": multiprocessing.get_context("spawn")})
             job_defaults = {
                 'coalesce': True,
                 'max_instances': 1
@@ -116,11 +191,16 @@ class Scheduler(metaclass=Singleton):
 
             self.running_jobs = set()
             self.pending_jobs = set()
+            # jobs scheduled while running, run again when they finish: job id -> (function, args, executor),
+            # the arguments of multiple requests are merged
+            self.rerun_jobs = {}
+            # the job sets are updated by the listeners of the worker threads
+            self.jobs_lock = threading.Lock()
 
             self.scheduler = BackgroundScheduler(job_defaults=job_defaults, executors=executors)
 
             self.scheduler.add_listener(self.submitted_job_listener, EVENT_JOB_SUBMITTED)
-            self.scheduler.add_listener(self.executed_job_listener, EVENT_JOB_EXECUTED)
+            self.scheduler.add_listener(self.executed_job_listener, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
             self.scheduler.add_listener(self.add_job_listener, EVENT_JOB_ADDED)
             self.scheduler.add_listener(self.remove_job_listener, EVENT_JOB_REMOVED)
 
@@ -140,22 +220,37 @@ class Scheduler(metaclass=Singleton):
     def add_job_listener(self, event) -> None:
         """Listens to newly added jobs"""
         logger.info("Scheduler added job: %s", event.job_id)
-        self.pending_jobs.add(event.job_id)
+        with self.jobs_lock:
+            self.pending_jobs.add(event.job_id)
 
     def remove_job_listener(self, event) -> None:
         """Listens to removed jobs"""
         logger.info("Scheduler removed job: %s", event.job_id)
-        self.pending_jobs.remove(event.job_id)
+        with self.jobs_lock:
+            self.pending_jobs.discard(event.job_id)
 
     def executed_job_listener(self, event) -> None:
-        """Listens to executed jobs"""
+        """Listens to executed (or failed) jobs"""
         logger.info("Scheduler executed job: %s", event.job_id)
-        self.running_jobs.remove(event.job_id)
+        with self.jobs_lock:
+            self.running_jobs.discard(event.job_id)
+            rerun_job = self.rerun_jobs.pop(event.job_id, None)
+
+        if rerun_job is not None:
+            function, args, executor = rerun_job
+            self.add_job_to_schedule(function, args, event.job_id, executor=executor)
 
         # automated processing pipeline:
+        # - when a submission processing task completes that will trigger the buffer processing
         # - when a buffer processing task completes that will trigger the raw bucket processing
         # - when a scraper task completes that will trigger the raw bucket processing
-        if "buffer_processing" in event.job_id:
+        if "submission_processing" in event.job_id:
+            # submissions queued while the task was finishing are not missed
+            if has_queued_submissions():
+                schedule_job("submission_processing")
+            schedule_job("buffer_processing", date=datetime.datetime.now() + datetime.timedelta(seconds=30))
+
+        elif "buffer_processing" in event.job_id:
             for sat in SATELLITES:
                 schedule_job("raw_bucket_processing", sat)
 
@@ -166,7 +261,8 @@ class Scheduler(metaclass=Singleton):
 
     def submitted_job_listener(self, event) -> None:
         """Listens to submitted jobs"""
-        self.running_jobs.add(event.job_id)
+        with self.jobs_lock:
+            self.running_jobs.add(event.job_id)
         logger.info("Scheduler submitted job: %s", event.job_id)
 
     def get_pending_jobs(self) -> set:
@@ -179,28 +275,48 @@ class Scheduler(metaclass=Singleton):
 
     # pylint:disable=R0913
     def add_job_to_schedule(self, function: Callable, args: list, job_id: str,
-                            date: datetime = None, interval: int = None) -> None:
-        """Add a job to the schedule if not already scheduled."""
+                            date: datetime = None, interval: int = None, executor: str = "default") -> None:
+        """Add a job to the schedule if not already scheduled, otherwise merge the arguments with
+        those of the scheduled job. A one-off job requested while the same job is running is run again
+        when it finishes."""
         if interval is not None:
             trigger = IntervalTrigger(minutes=interval, start_date=date)
         else:
             trigger = DateTrigger(run_date=date)
 
-        if job_id not in self.running_jobs and job_id not in self.pending_jobs:
-            self.scheduler.add_job(
-                function,
-                args=args,
-                id=job_id,
-                trigger=trigger,
-            )
-        elif job_id in self.pending_jobs:
+        with self.jobs_lock:
+            pending = job_id in self.pending_jobs
+            running = job_id in self.running_jobs
+            if running and not pending and interval is None:
+                if job_id in self.rerun_jobs:
+                    args = merge_job_args(job_id, self.rerun_jobs[job_id][1], args)
+                self.rerun_jobs[job_id] = (function, args, executor)
+                return
+
+        if pending:
+            job = self.scheduler.get_job(job_id)
+            if job is not None:
+                self.scheduler.modify_job(job_id, args=merge_job_args(job_id, job.args, args))
             self.scheduler.reschedule_job(job_id, trigger=trigger)
+        elif not running:
+            try:
+                self.scheduler.add_job(
+                    function,
+                    args=args,
+                    id=job_id,
+                    trigger=trigger,
+                    executor=executor,
+                )
+            except ConflictingIdError:
+                # added concurrently by another thread
+                self.scheduler.reschedule_job(job_id, trigger=trigger)
 
     def start_scheduler(self) -> None:
         """Start the background scheduler"""
         if self.scheduler.state == STATE_STOPPED:
             logger.info("Scheduler started")
             self.scheduler.start()
+            self.add_job_to_schedule(check_queues, [], "queue_check", datetime.datetime.now(), QUEUE_CHECK_INTERVAL)
 
     def pause_scheduler(self) -> None:
         """Pause the background scheduler"""
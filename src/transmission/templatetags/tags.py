@@ -10,3 +10,15 @@ def url_replace(request, field, value):
     request_url = request.GET.copy()
     request_url[field] = value
     return request_url.urlencode()
+
+
+@register.simple_tag
+def url_replace_cursor(request, field, value):
+    """Same as url_replace, for the keyset pagination cursors:
+    the other cursor is removed from the url, such that only one is used"""
+    request_url = request.GET.copy()
+    for cursor in ["after", "before", "page"]:
+        request_url.pop(cursor, None)
+    if value is not None:
+        request_url[field] = value
+    return request_url.urlencode()
@@ -0,0 +1,7 @@
+"""Helpers shared by the tests"""
+from datetime import datetime, timezone
+# pylint: disable=all
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
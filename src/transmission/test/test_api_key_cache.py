@@ -0,0 +1,73 @@
+"""Test the API key cache"""
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.test import TestCase
+
+from members.models import APIKey, Member
+from transmission.models import Downlink
+from transmission.processing.api_key_cache import MEMBER_VERSION_CACHE_PREFIX, get_submitter_from_api_key
+from transmission.processing.save_raw_data import store_frames
+# pylint: disable=all
+
+
+class TestApiKeyCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = Member.objects.create_user(username='user', email='user@email.com')
+        self.user.user_permissions.add(Permission.objects.get(codename='add_downlink'))
+        self.api_key, self.key = APIKey.objects.create_key(name='user', username=self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_key_is_resolved_once(self):
+        submitter = get_submitter_from_api_key(self.key)
+        self.assertEqual(submitter.username, 'user')
+        self.assertEqual(submitter.UUID, self.user.UUID)
+        self.assertTrue(submitter.has_perm('transmission.add_downlink'))
+        self.assertFalse(submitter.has_perm('transmission.add_uplink'))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_submitter_from_api_key(self.key), submitter)
+
+    def test_invalid_key(self):
+        with self.assertRaises(APIKey.DoesNotExist):
+            get_submitter_from_api_key(self.key + 'x')
+
+    def test_revoked_key_is_invalidated(self):
+        get_submitter_from_api_key(self.key)
+
+        self.api_key.revoked = True
+        self.api_key.save()
+
+        with self.assertRaises(APIKey.DoesNotExist):
+            get_submitter_from_api_key(self.key)
+
+    def test_permission_change_is_invalidated(self):
+        get_submitter_from_api_key(self.key)
+
+        self.user.user_permissions.add(Permission.objects.get(codename='add_uplink'))
+
+        self.assertTrue(get_submitter_from_api_key(self.key).has_perm('transmission.add_uplink'))
+
+    def test_evicted_version_does_not_match_cached_entries(self):
+        get_submitter_from_api_key(self.key)
+
+        # the version is evicted, then bumped by a revocation
+        cache.delete(MEMBER_VERSION_CACHE_PREFIX + 'user')
+        self.api_key.revoked = True
+        self.api_key.save()
+
+        with self.assertRaises(APIKey.DoesNotExist):
+            get_submitter_from_api_key(self.key)
+
+    def test_member_lookup_once_per_submission(self):
+        submitter = get_submitter_from_api_key(self.key)
+        frames = [{"timestamp": "2021-12-19T02:20:14.959630Z", "frame": "AA"} for _ in range(10)]
+
+        # only the bulk insert, within a savepoint
+        with self.assertNumQueries(3):
+            store_frames(frames, submitter)
+
+        self.assertEqual(len(Downlink.objects.all()), 10)
+        self.assertEqual(Downlink.objects.first().observer, str(self.user.UUID))
@@ -0,0 +1,67 @@
+"""Test the frames export"""
+import csv
+import io
+import json
+from unittest.mock import patch
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from members.models import Member
+from transmission.processing.save_raw_data import store_frames
+from transmission.models import Downlink
+# pylint: disable=all
+
+
+class TestExportFrames(TestCase):
+    def setUp(self):
+        self.user = Member.objects.create_superuser(username='user', email='user@email.com',
+                                                    password='delfispace4242', verified=True)
+        self.client = Client()
+        self.client.post(reverse('login'), {'username': 'user', 'password': 'delfispace4242'})
+
+        frames = [{"timestamp": f"2021-12-19T02:20:{i:02d}Z", "frame": "8EA49EAA", "frequency": 2455.66}
+                  for i in range(5)]
+        store_frames(frames, "user")
+        Downlink.objects.filter(timestamp__second__lt=2).update(processed=True)
+
+    def export(self, export_format, **params):
+        response = self.client.get(reverse('export_frames', args=["downlink"]), dict(format=export_format, **params))
+        content = b"".join(response.streaming_content).decode() if response.status_code == 200 else None
+        return response, content
+
+    def test_export_csv(self):
+        response, content = self.export("csv")
+
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["frame"], "8EA49EAA")
+        self.assertEqual(rows[0]["observer"], str(self.user.UUID))
+        self.assertEqual(rows[0]["timestamp"], "2021-12-19T02:20:00+00:00")
+
+    def test_export_ndjson_with_filter(self):
+        response, content = self.export("ndjson", processed="true")
+
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(all(row["processed"] for row in rows))
+        self.assertEqual(rows[1]["frequency"], 2455.66)
+
+    @patch('transmission.processing.export_frames.pyarrow', None)
+    def test_parquet_without_pyarrow(self):
+        response, _ = self.export("parquet")
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.export("xml")[0].status_code, 400)
+        self.assertEqual(self.client.get(reverse('export_frames', args=["foo"])).status_code, 400)
+
+    def test_export_without_permissions(self):
+        Member.objects.create_user(username='other', email='other@email.com', password='delfispace4242',
+                                   verified=True)
+        client = Client()
+        client.post(reverse('login'), {'username': 'other', 'password': 'delfispace4242'})
+
+        response = client.get(reverse('export_frames', args=["downlink"]))
+        self.assertEqual(response.status_code, 403)
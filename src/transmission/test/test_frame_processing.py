@@ -1,20 +1,32 @@
 """Test views html templates"""
+import gzip
+import hashlib
+import json
 
 from django.test import Client, TestCase, RequestFactory, tag
 from django.contrib.messages.storage.fallback import FallbackStorage
+from django.forms import ValidationError
+from django.urls import reverse
 
 from transmission.models import Downlink, Satellite, Uplink
-from transmission.processing.bookkeep_new_data_time_range import combine_time_ranges
-from transmission.processing.satellites import SATELLITES
-from transmission.processing.save_raw_data import process_uplink_and_downlink, store_frames
+from transmission.processing.save_raw_data import process_frames, process_uplink_and_downlink, store_frames, \
+    store_frames_stream
 from transmission.views import delete_processed_frames, process
 
-from members.models import Member
+from members.models import APIKey, Member
 
 from unittest.mock import patch
 # pylint: disable=all
 
 
+def store_all_frames(frames, link):
+    return {"delfi_pq": frames}, []
+
+
+def store_no_frames(frames, link):
+    return {}, []
+
+
 class TestFrameSubmission(TestCase):
     def setUp(self):
         self.factory = RequestFactory()
@@ -25,11 +37,6 @@ class TestFrameSubmission(TestCase):
         self.user.save()
         Satellite.objects.create(sat='delfipq', norad_id=1).save()
 
-    def tearDown(self) -> None:
-        for sat in SATELLITES:
-            combine_time_ranges(sat, 'uplink')
-            combine_time_ranges(sat, 'downlink')
-
     def testSubmitFramesBatch(self):
         # add 3 valid frames from delfi_pq
         f1 = { "qos": 98.6, "sat": "delfipq", "timestamp": "2021-12-19T02:20:14.959630Z", "frequency": 2455.66,
@@ -66,6 +73,95 @@ class TestFrameSubmission(TestCase):
 
         self.assertEqual(len(Uplink.objects.all()), 3)
 
+    def testFramesAreStoredAsBytes(self):
+        store_frames({"timestamp": "2021-12-19T02:20:14.959630Z", "frame": "8ea49eaa9c88e088"}, "user")
+
+        frame = Downlink.objects.get()
+        self.assertEqual(bytes(frame.frame), bytes.fromhex("8EA49EAA9C88E088"))
+        self.assertEqual(frame.frame_hash, hashlib.sha256(bytes.fromhex("8EA49EAA9C88E088")).hexdigest())
+        # HEX is only used at the API boundary
+        self.assertEqual(frame.to_dictionary()["frame"], "8EA49EAA9C88E088")
+
+        # incomplete bytes are rejected
+        with self.assertRaises(ValidationError):
+            store_frames({"timestamp": "2021-12-19T02:20:14.959630Z", "frame": "8EA"}, "user")
+
+    @patch('transmission.processing.save_raw_data.SUBMISSION_CHUNK_SIZE', 2)
+    def testSubmitFramesStream(self):
+        frames = [{"timestamp": "2021-12-19T02:20:14.959630Z", "frame": "8EA49EAA9C88E088988C92A0A26103F0"}
+                  for _ in range(5)]
+
+        self.assertEqual(store_frames_stream(iter(frames), "user"), 5)
+        self.assertEqual(len(Downlink.objects.all()), 5)
+
+        # an invalid frame after the first chunks rolls back the whole submission
+        frames.append({"timestamp": "2021-12-19T02:20:14.959630Z", "frame": "not hex"})
+        with self.assertRaises(ValidationError):
+            store_frames_stream(iter(frames), "user")
+        self.assertEqual(len(Downlink.objects.all()), 5)
+
+    def testSubmitFramesRequest(self):
+        _, key = APIKey.objects.create_key(name='user', username=self.user)
+        frames = [{"timestamp": "2021-12-19T02:20:14.959630Z", "frame": "8EA49EAA9C88E088988C92A0A26103F0"}
+                  for _ in range(3)]
+
+        with patch('transmission.views.schedule_job'):
+            response = self.client.post(reverse('submit_frame'), data=json.dumps(frames),
+                                        content_type='application/json', HTTP_AUTHORIZATION=key)
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(Downlink.objects.all()), 3)
+
+            response = self.client.post(reverse('submit_frame'), data='[{"frame": ',
+                                        content_type='application/json', HTTP_AUTHORIZATION=key)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()["message"], "Invalid JSON structure")
+
+    def testSubmitFramesNdjsonRequest(self):
+        _, key = APIKey.objects.create_key(name='user', username=self.user)
+        frame = {"timestamp": "2021-12-19T02:20:14.959630Z", "frame": "8EA49EAA9C88E088988C92A0A26103F0"}
+        lines = [json.dumps(frame), "", json.dumps(dict(frame, frame="not hex")), "{invalid", json.dumps(frame),
+                 json.dumps({"timestamp": "2021-12-19T02:20:14.959630Z"})]
+
+        with patch('transmission.views.schedule_job'):
+            response = self.client.post(reverse('submit_frame'), data=gzip.compress("\n".join(lines).encode()),
+                                        content_type='application/x-ndjson', HTTP_CONTENT_ENCODING='gzip',
+                                        HTTP_AUTHORIZATION=key)
+
+            # the valid lines are stored, the invalid lines are reported
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(Downlink.objects.all()), 2)
+            self.assertEqual([error["line"] for error in response.json()["errors"]], [3, 4, 6])
+            self.assertEqual(response.json()["errors"][1]["message"], "Invalid JSON structure")
+
+            response = self.client.post(reverse('submit_frame'), data="{invalid",
+                                        content_type='application/x-ndjson', HTTP_AUTHORIZATION=key)
+            self.assertEqual(response.status_code, 400)
+
+            response = self.client.post(reverse('submit_frame'), data=json.dumps(frame),
+                                        content_type='application/json', HTTP_CONTENT_ENCODING='br',
+                                        HTTP_AUTHORIZATION=key)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(len(Downlink.objects.all()), 2)
+
+    def testSubmitCompressedJsonRequest(self):
+        _, key = APIKey.objects.create_key(name='user', username=self.user)
+        frames = [{"timestamp": "2021-12-19T02:20:14.959630Z", "frame": "8EA49EAA9C88E088988C92A0A26103F0"}] * 3
+
+        with patch('transmission.views.schedule_job'):
+            response = self.client.post(reverse('submit_frame'), data=gzip.compress(json.dumps(frames).encode()),
+                                        content_type='application/json', HTTP_CONTENT_ENCODING='gzip',
+                                        HTTP_AUTHORIZATION=key)
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(Downlink.objects.all()), 3)
+
+            # truncated compressed data
+            response = self.client.post(reverse('submit_frame'),
+                                        data=gzip.compress(json.dumps(frames).encode())[:-10],
+                                        content_type='application/json', HTTP_CONTENT_ENCODING='gzip',
+                                        HTTP_AUTHORIZATION=key)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(len(Downlink.objects.all()), 3)
+
 class TestFramesProcessing(TestCase):
     def setUp(self):
         self.factory = RequestFactory()
@@ -91,16 +187,12 @@ class TestFramesProcessing(TestCase):
             store_frames(f, "user")
 
     def tearDown(self):
-        for sat in SATELLITES:
-            combine_time_ranges(sat, 'uplink')
-            combine_time_ranges(sat, 'downlink')
-
         self.client.logout()
 
 
-    @patch('transmission.processing.save_raw_data.store_frame_to_influxdb')
-    def test_bad_request(self, mock_store_frame_to_influxdb):
-        mock_store_frame_to_influxdb.return_value = (True, 'delfi_pq')
+    @patch('transmission.processing.save_raw_data.store_frames_to_influxdb')
+    def test_bad_request(self, mock_store_frames_to_influxdb):
+        mock_store_frames_to_influxdb.side_effect = store_all_frames
 
         self.assertEqual(len(Downlink.objects.all()), 3)
         self.assertEqual(len(Uplink.objects.all()), 3)
@@ -123,9 +215,9 @@ class TestFramesProcessing(TestCase):
         self.assertEqual(len(Uplink.objects.all()), 3)
 
 
-    @patch('transmission.processing.save_raw_data.store_frame_to_influxdb')
-    def test_delete_processed_frames(self, mock_store_frame_to_influxdb):
-        mock_store_frame_to_influxdb.return_value = (True, 'delfi_pq')
+    @patch('transmission.processing.save_raw_data.store_frames_to_influxdb')
+    def test_delete_processed_frames(self, mock_store_frames_to_influxdb):
+        mock_store_frames_to_influxdb.side_effect = store_all_frames
 
         self.assertEqual(len(Downlink.objects.all()), 3)
         self.assertEqual(len(Uplink.objects.all()), 3)
@@ -161,9 +253,9 @@ class TestFramesProcessing(TestCase):
         self.assertEqual(res.status_code, 302)
 
 
-    @patch('transmission.processing.save_raw_data.store_frame_to_influxdb')
-    def test_delete_no_processed_frames(self, mock_store_frame_to_influxdb):
-        mock_store_frame_to_influxdb.return_value = (False, None)
+    @patch('transmission.processing.save_raw_data.store_frames_to_influxdb')
+    def test_delete_no_processed_frames(self, mock_store_frames_to_influxdb):
+        mock_store_frames_to_influxdb.side_effect = store_no_frames
 
         self.assertEqual(len(Downlink.objects.all()), 3)
         self.assertEqual(len(Uplink.objects.all()), 3)
@@ -187,13 +279,13 @@ class TestFramesProcessing(TestCase):
         self.assertEqual(len(Uplink.objects.all()), 3)
 
 
-    @patch('transmission.processing.save_raw_data.store_frame_to_influxdb')
-    def test_delete_processed_frames_without_permissions(self, mock_store_frame_to_influxdb):
+    @patch('transmission.processing.save_raw_data.store_frames_to_influxdb')
+    def test_delete_processed_frames_without_permissions(self, mock_store_frames_to_influxdb):
         unauthorized_user = Member.objects.create_user(username='unauthorized_user', email='unauthorized_user@email.com')
         unauthorized_user.set_password('delfispace4242')
         unauthorized_user.save()
 
-        mock_store_frame_to_influxdb.return_value = (True, 'delfi_pq')
+        mock_store_frames_to_influxdb.side_effect = store_all_frames
         self.assertEqual(len(Downlink.objects.all()), 3)
         self.assertEqual(len(Uplink.objects.all()), 3)
 
@@ -214,10 +306,10 @@ class TestFramesProcessing(TestCase):
         self.assertEqual(len(Downlink.objects.all()), 3)
         self.assertEqual(len(Uplink.objects.all()), 3)
 
-    @patch('transmission.processing.save_raw_data.store_frame_to_influxdb')
-    def test_frames_processing_request(self, mock_store_frame_to_influxdb):
+    @patch('transmission.processing.save_raw_data.store_frames_to_influxdb')
+    def test_frames_processing_request(self, mock_store_frames_to_influxdb):
 
-        mock_store_frame_to_influxdb.return_value = (True, "delfi_pq")
+        mock_store_frames_to_influxdb.side_effect = store_all_frames
         # request to process frames
         request = self.factory.post(path='transmission/process-frames/', content_type='application/json')
         setattr(request, 'session', 'session')
@@ -237,10 +329,10 @@ class TestFramesProcessing(TestCase):
         self.assertEqual(len(Uplink.objects.all().filter(processed=True)), 3)
 
 
-    @patch('transmission.processing.save_raw_data.store_frame_to_influxdb')
-    def test_frames_processing_request_bad_request(self, mock_store_frame_to_influxdb):
+    @patch('transmission.processing.save_raw_data.store_frames_to_influxdb')
+    def test_frames_processing_request_bad_request(self, mock_store_frames_to_influxdb):
 
-        mock_store_frame_to_influxdb.return_value = (True, 'delfi_pq')
+        mock_store_frames_to_influxdb.side_effect = store_all_frames
         request = self.factory.post(path='transmission/process-frames/', content_type='application/json')
         setattr(request, 'session', 'session')
         setattr(request, '_messages', FallbackStorage(request))
@@ -257,10 +349,10 @@ class TestFramesProcessing(TestCase):
         self.assertEqual(len(Uplink.objects.all().filter(processed=True)), 0)
 
 
-    @patch('transmission.processing.save_raw_data.store_frame_to_influxdb')
-    def test_frames_processing_request_forbidden(self, mock_store_frame_to_influxdb):
+    @patch('transmission.processing.save_raw_data.store_frames_to_influxdb')
+    def test_frames_processing_request_forbidden(self, mock_store_frames_to_influxdb):
 
-        mock_store_frame_to_influxdb.return_value = (True, 'delfi_pq')
+        mock_store_frames_to_influxdb.side_effect = store_all_frames
 
         unauthorized_user = Member.objects.create_user(username='unauthorized_user', email='unauthorized_user@email.com')
         unauthorized_user.set_password('delfispace4242')
@@ -282,12 +374,38 @@ class TestFramesProcessing(TestCase):
         self.assertEqual(len(Downlink.objects.all().filter(processed=True)), 0)
         self.assertEqual(len(Uplink.objects.all().filter(processed=True)), 0)
 
+    @patch('transmission.processing.save_raw_data.PROCESS_FRAMES_CHUNK_SIZE', 2)
+    @patch('transmission.processing.save_raw_data.store_frames_to_influxdb')
+    def test_frames_are_processed_in_chunks(self, mock_store_frames_to_influxdb):
+        # the first frame of every chunk is invalid
+        mock_store_frames_to_influxdb.side_effect = lambda frames, link: ({"delfi_pq": frames[1:]}, frames[:1])
+
+        processed = process_frames(Downlink.objects.all().filter(processed=False), "downlink")
+
+        self.assertEqual(processed, 1)
+        self.assertEqual(mock_store_frames_to_influxdb.call_count, 2)
+        self.assertEqual(len(Downlink.objects.all().filter(processed=True, invalid=False)), 1)
+        self.assertEqual(len(Downlink.objects.all().filter(processed=False, invalid=True)), 2)
+        # uplink frames are not touched
+        self.assertEqual(len(Uplink.objects.all().filter(processed=False, invalid__isnull=True)), 3)
+
+    @patch('transmission.processing.save_raw_data.get_satellite_from_frame', return_value="delfi_pq")
+    @patch('transmission.processing.save_raw_data.save_raw_frames_to_influxdb')
+    def test_duplicate_frames_are_marked_processed(self, mock_save_raw_frames_to_influxdb, _):
+        # the frames are already stored in influxdb, none of them is written again
+        mock_save_raw_frames_to_influxdb.return_value = []
+
+        processed = process_frames(Downlink.objects.all().filter(processed=False), "downlink")
+
+        self.assertEqual(processed, 3)
+        # duplicates are not read again by the next processing
+        self.assertEqual(len(Downlink.objects.all().filter(processed=False)), 0)
+        self.assertEqual(len(Downlink.objects.all().filter(invalid=True)), 0)
+
     @tag('XMLRequired')
-    @patch('transmission.processing.influxdb_api.commit_frame')
-    @patch('transmission.processing.influxdb_api.save_raw_frame_to_influxdb')
-    def test_valid_frames_processing(self, mock_commit_frame, mock_save_raw_frame_to_influxdb):
-        mock_save_raw_frame_to_influxdb.return_value = (True, 'delfi_pq')
-        mock_commit_frame.return_value = True
+    @patch('transmission.processing.save_raw_data.save_raw_frames_to_influxdb')
+    def test_valid_frames_processing(self, mock_save_raw_frames_to_influxdb):
+        mock_save_raw_frames_to_influxdb.side_effect = lambda satellite, link, telemetry: telemetry
 
         request = self.factory.post(path='transmission/process-frames/', content_type='application/json')
         setattr(request, 'session', 'session')
@@ -309,11 +427,9 @@ class TestFramesProcessing(TestCase):
         self.assertEqual(len(Uplink.objects.all().filter(invalid=True)), 0)
 
     @tag('XMLRequired')
-    @patch('transmission.processing.influxdb_api.commit_frame')
-    @patch('transmission.processing.influxdb_api.save_raw_frame_to_influxdb')
-    def test_invalid_frames_processing(self, mock_commit_frame, mock_save_raw_frame_to_influxdb):
-        mock_save_raw_frame_to_influxdb.return_value = (True, 'delfi_pq')
-        mock_commit_frame.return_value = True
+    @patch('transmission.processing.save_raw_data.save_raw_frames_to_influxdb')
+    def test_invalid_frames_processing(self, mock_save_raw_frames_to_influxdb):
+        mock_save_raw_frames_to_influxdb.side_effect = lambda satellite, link, telemetry: telemetry
 
         request = self.factory.post(path='transmission/process-frames/', content_type='application/json')
         setattr(request, 'session', 'session')
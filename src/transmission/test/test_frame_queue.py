@@ -0,0 +1,107 @@
+"""Test the queue of raw frames waiting to be parsed"""
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from transmission.models import QueuedFrame
+from transmission.processing.frame_queue import complete_frames, dequeue_frames, enqueue_frames, \
+    enqueue_time_range, get_retry_delay, has_due_frames, requeue_failed_frames, requeue_frames, retry_frames
+from transmission.test.helpers import utc
+# pylint: disable=all
+
+frames = [
+    {"timestamp": "2022-01-01T10:00:00Z", "frame": "AA", "observer": "observer"},
+    {"timestamp": "2022-01-01T10:00:00Z", "frame": "BB", "observer": "observer"},
+    {"timestamp": "2022-01-01T10:05:00Z", "frame": "AA", "operator": "operator"},
+]
+
+
+class TestFrameQueue(TestCase):
+
+    def setUp(self):
+        enqueue_frames("delfi_pq", "downlink", frames)
+
+    def test_enqueue_is_idempotent(self):
+        enqueue_frames("delfi_pq", "downlink", frames)
+        enqueue_frames("delfi_pq", "uplink", frames[:1])
+
+        self.assertEqual(QueuedFrame.objects.filter(link="downlink").count(), 3)
+        self.assertEqual(QueuedFrame.objects.filter(link="uplink").count(), 1)
+        self.assertEqual(QueuedFrame.objects.get(timestamp__minute=5).observer, "operator")
+
+    def test_dequeued_frames_are_leased(self):
+        entries = dequeue_frames("delfi_pq", "downlink", 2)
+
+        self.assertEqual(len(entries), 2)
+        self.assertTrue(all(entry.attempts == 1 for entry in entries))
+        # leased frames are not dequeued again until they are acknowledged or the lease expires
+        self.assertEqual(len(dequeue_frames("delfi_pq", "downlink", 10)), 1)
+        self.assertEqual(dequeue_frames("delfi_pq", "downlink", 10), [])
+
+        complete_frames(entries)
+        self.assertEqual(QueuedFrame.objects.count(), 1)
+
+    def test_retry_with_backoff(self):
+        entries = dequeue_frames("delfi_pq", "downlink", 10)
+
+        retry_frames([(entry, "invalid frame") for entry in entries])
+
+        entry = QueuedFrame.objects.get(pk=entries[0].pk)
+        self.assertEqual(entry.status, QueuedFrame.RETRY)
+        self.assertEqual(entry.last_error, "invalid frame")
+        self.assertGreater(entry.next_attempt, timezone.now() + timedelta(seconds=get_retry_delay(1) - 5))
+        self.assertEqual(dequeue_frames("delfi_pq", "downlink", 10), [])
+        self.assertEqual(get_retry_delay(3), 4 * get_retry_delay(1))
+
+    @patch("transmission.processing.frame_queue.FRAME_QUEUE_MAX_ATTEMPTS", 2)
+    @patch("transmission.processing.frame_queue.FRAME_QUEUE_RETRY_DELAY", 0)
+    def test_dead_letter(self):
+        for _ in range(2):
+            entries = dequeue_frames("delfi_pq", "downlink", 10)
+            retry_frames([(entry, "invalid frame") for entry in entries])
+
+        self.assertEqual(QueuedFrame.objects.filter(status=QueuedFrame.DEAD).count(), 3)
+        self.assertEqual(dequeue_frames("delfi_pq", "downlink", 10), [])
+
+        # failed frames can be requeued manually
+        self.assertEqual(requeue_failed_frames("delfi_pq", "downlink"), 3)
+        self.assertEqual(len(dequeue_frames("delfi_pq", "downlink", 10)), 3)
+
+    @patch("transmission.processing.frame_queue.FRAME_QUEUE_MAX_ATTEMPTS", 1)
+    def test_requeued_frames_are_reset(self):
+        entries = dequeue_frames("delfi_pq", "downlink", 10)
+        retry_frames([(entry, "invalid frame") for entry in entries])
+        self.assertFalse(has_due_frames("delfi_pq"))
+
+        # the frames fail again in a reprocessing
+        requeue_frames("delfi_pq", "downlink", frames[:1])
+
+        entry = QueuedFrame.objects.get(frame="AA", timestamp__minute=0)
+        self.assertEqual((entry.status, entry.attempts), (QueuedFrame.PENDING, 0))
+        self.assertTrue(has_due_frames("delfi_pq"))
+        self.assertEqual(len(dequeue_frames("delfi_pq", "downlink", 10)), 1)
+
+    def test_leased_frames_are_due_when_the_lease_expires(self):
+        dequeue_frames("delfi_pq", "downlink", 10)
+        self.assertFalse(has_due_frames("delfi_pq"))
+
+        QueuedFrame.objects.update(next_attempt=timezone.now())
+
+        self.assertTrue(has_due_frames("delfi_pq"))
+
+    def test_enqueue_time_range(self):
+        records = [MagicMock(values={"_time": utc(2022, 1, 1, 11), "frame": "CC", "operator": "operator"}),
+                   MagicMock(values={"_time": utc(2022, 1, 1, 12), "frame": "DD"}),
+                   MagicMock(values={"_time": utc(2022, 1, 1, 12, 30), "operator": "operator"})]
+        query_api = MagicMock()
+        query_api.query_stream.return_value = iter(records)
+
+        frames_count = enqueue_time_range(query_api, "delfi_pq", "uplink", utc(2022, 1, 1, 11), utc(2022, 1, 1, 12))
+
+        # records without a frame are skipped, the end of the time range is included
+        self.assertEqual(frames_count, 2)
+        self.assertIn("stop: 2022-01-01T12:00:01Z", query_api.query_stream.call_args.kwargs["query"])
+        self.assertEqual(QueuedFrame.objects.filter(link="uplink").count(), 2)
+        self.assertEqual(QueuedFrame.objects.get(frame="CC").observer, "operator")
@@ -0,0 +1,108 @@
+"""Test influxdb helpers"""
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+from django.test import SimpleTestCase, TestCase
+from influxdb_client.client.exceptions import InfluxDBError
+
+from transmission.models import QueuedFrame, RawFrameFingerprint
+from transmission.processing.frame_index import add_fingerprints, get_frame_fingerprint, rebuild_frame_index
+from transmission.processing.influxdb_api import PointBatch, commit_frames
+# pylint: disable=all
+
+
+class TestPointBatch(SimpleTestCase):
+
+    def test_flush_when_batch_size_reached(self):
+        write_api = MagicMock()
+        batch = PointBatch(write_api, "delfi_pq_downlink", batch_size=4, flush_interval=3600)
+
+        self.assertEqual(batch.add("t1", [{"p": 1}, {"p": 2}]), ([], []))
+        write_api.write.assert_not_called()
+
+        written, failed = batch.add("t2", [{"p": 3}, {"p": 4}])
+        self.assertEqual(written, ["t1", "t2"])
+        self.assertEqual(failed, [])
+        # all points are sent in one request
+        write_api.write.assert_called_once()
+        self.assertEqual(len(write_api.write.call_args[0][2]), 4)
+
+    def test_flush_empty_batch(self):
+        write_api = MagicMock()
+        batch = PointBatch(write_api, "delfi_pq_downlink")
+
+        self.assertEqual(batch.flush(), ([], []))
+        write_api.write.assert_not_called()
+
+    def test_only_failing_frames_are_reported(self):
+        write_api = MagicMock()
+
+        def write(bucket, org, points):
+            # reject any request containing the bad point
+            if {"p": "bad"} in points:
+                raise InfluxDBError(message="bad point")
+
+        write_api.write.side_effect = write
+        batch = PointBatch(write_api, "delfi_pq_downlink", batch_size=100, flush_interval=3600)
+        batch.add("t1", [{"p": 1}])
+        batch.add("t2", [{"p": "bad"}])
+        batch.add("t3", [{"p": 3}])
+
+        written, failed = batch.flush()
+        self.assertEqual(written, ["t1", "t3"])
+        self.assertEqual(failed, ["t2"])
+
+
+class TestCommitFrames(TestCase):
+
+    def test_only_new_frames_are_stored(self):
+        write_api = MagicMock()
+        add_fingerprints([get_frame_fingerprint("delfi_pq", "downlink", datetime(2022, 1, 1, 10, 0, 1), "AA")])
+        frames = [
+            {"timestamp": "2022-01-01T10:00:00Z", "frame": "AA"},  # stored 1 second later
+            {"timestamp": "2022-01-01T10:00:00Z", "frame": "BB"},
+            {"timestamp": "2022-01-01T10:05:00Z", "frame": "BB"},
+            {"timestamp": "2022-01-01T10:05:00Z", "frame": "BB"},  # duplicate within the batch
+        ]
+
+        stored = commit_frames(write_api, "delfi_pq", "downlink", frames)
+
+        self.assertEqual(stored, [frames[1], frames[2]])
+        # one write for all new frames
+        write_api.write.assert_called_once()
+        self.assertEqual(len(write_api.write.call_args[0][2]), 2)
+        # the new frames are queued for processing
+        self.assertEqual(QueuedFrame.objects.filter(satellite="delfi_pq", link="downlink").count(), 2)
+        # the new frames are indexed
+        self.assertEqual(RawFrameFingerprint.objects.count(), 3)
+        self.assertEqual(commit_frames(write_api, "delfi_pq", "downlink", frames), [])
+
+    def test_frames_are_indexed_per_satellite_and_link(self):
+        write_api = MagicMock()
+        frame = {"timestamp": "2022-01-01T10:00:00Z", "frame": "AA"}
+
+        self.assertEqual(len(commit_frames(write_api, "delfi_pq", "downlink", [dict(frame)])), 1)
+        self.assertEqual(len(commit_frames(write_api, "delfi_pq", "uplink", [dict(frame)])), 1)
+        self.assertEqual(len(commit_frames(write_api, "delfi_c3", "downlink", [dict(frame)])), 1)
+        self.assertEqual(len(commit_frames(write_api, "delfi_c3", "downlink", [dict(frame)])), 0)
+
+    def test_fingerprints_ignore_hex_case(self):
+        add_fingerprints([get_frame_fingerprint("delfi_pq", "downlink", datetime(2022, 1, 1, 10, 0, 0), "aabb")])
+
+        self.assertEqual(commit_frames(MagicMock(), "delfi_pq", "downlink",
+                                       [{"timestamp": "2022-01-01T10:00:00Z", "frame": "AABB"}]), [])
+
+    def test_rebuild_frame_index(self):
+        query_api = MagicMock()
+        records = []
+        for second in range(3):
+            record = MagicMock()
+            record.get_time.return_value = datetime(2022, 1, 1, 10, 0, second, tzinfo=timezone.utc)
+            record.get_value.return_value = "AA"
+            records.append(record)
+        query_api.query_stream.return_value = iter(records)
+
+        self.assertEqual(rebuild_frame_index(query_api, "delfi_pq", "downlink"), 3)
+        self.assertEqual(RawFrameFingerprint.objects.count(), 3)
+        self.assertEqual(commit_frames(MagicMock(), "delfi_pq", "downlink",
+                                       [{"timestamp": "2022-01-01T10:00:01Z", "frame": "AA"}]), [])
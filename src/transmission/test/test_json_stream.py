@@ -0,0 +1,89 @@
+"""Test the streaming JSON parser"""
+import gzip
+import io
+import json
+
+from django.core.exceptions import BadRequest
+from django.http import UnreadablePostError
+from django.test import SimpleTestCase
+
+from transmission.processing.json_stream import DECOMPRESSION_ERRORS, iter_json_values, iter_lines, \
+    open_submission_stream
+# pylint: disable=all
+
+
+def parse(text, read_size=4):
+    return list(iter_json_values(io.BytesIO(text.encode()), read_size=read_size))
+
+
+class TestJsonStream(SimpleTestCase):
+
+    def test_array_items(self):
+        frames = [{"frame": "AA" * i, "timestamp": "2022-01-01T10:00:00Z", "qos": 98.6 + i} for i in range(20)]
+
+        # values are split over many blocks
+        self.assertEqual(parse(json.dumps(frames)), frames)
+        self.assertEqual(parse(json.dumps(frames, indent=2), read_size=1), frames)
+        self.assertEqual(parse(json.dumps(frames), read_size=1024), frames)
+
+    def test_numbers_split_over_blocks(self):
+        self.assertEqual(parse("[1234567, 89]", read_size=3), [1234567, 89])
+        self.assertEqual(parse("1234567", read_size=3), [1234567])
+
+    def test_single_document_and_ndjson(self):
+        self.assertEqual(parse('{"frame": "AA"}'), [{"frame": "AA"}])
+        self.assertEqual(parse('{"frame": "AA"}\n{"frame": "BB"}\n'), [{"frame": "AA"}, {"frame": "BB"}])
+
+    def test_empty(self):
+        self.assertEqual(parse("[]"), [])
+        self.assertEqual(parse(" [ ] "), [])
+
+    def test_no_value(self):
+        for text in ["", " \n "]:
+            with self.assertRaises(json.JSONDecodeError):
+                parse(text)
+
+    def test_unicode_split_over_blocks(self):
+        self.assertEqual(parse('[{"application": "δelfi"}]', read_size=1), [{"application": "δelfi"}])
+
+    def test_invalid_json(self):
+        for text in ['[{"frame": "AA"}', '[{"frame": "AA"} {"frame": "BB"}]', '[{"frame": }]',
+                     '[{"frame": "AA"}] x', '{"frame": "AA"']:
+            with self.assertRaises(json.JSONDecodeError):
+                parse(text)
+
+    def test_items_are_parsed_lazily(self):
+        values = iter_json_values(io.BytesIO(b'[{"frame": "AA"}, invalid'), read_size=4)
+
+        # the valid items are returned before the invalid part is reached
+        self.assertEqual(next(values), {"frame": "AA"})
+        with self.assertRaises(json.JSONDecodeError):
+            next(values)
+
+
+class TestSubmissionStream(SimpleTestCase):
+
+    def test_iter_lines(self):
+        lines = list(iter_lines(io.BytesIO(b'{"a": 1}\r\n\n{"b": 2}\n{"c": 3}'), read_size=3))
+
+        self.assertEqual(lines, [(1, b'{"a": 1}'), (2, b''), (3, b'{"b": 2}'), (4, b'{"c": 3}')])
+
+    def test_gzip_stream(self):
+        stream = open_submission_stream(io.BytesIO(gzip.compress(b'[{"frame": "AA"}]')), "gzip")
+
+        self.assertEqual(list(iter_json_values(stream)), [{"frame": "AA"}])
+
+    def test_unsupported_encoding(self):
+        with self.assertRaises(BadRequest):
+            open_submission_stream(io.BytesIO(b""), "br")
+
+    def test_corrupted_gzip_stream(self):
+        stream = open_submission_stream(io.BytesIO(b"not gzip data"), "gzip")
+
+        with self.assertRaises(DECOMPRESSION_ERRORS):
+            list(iter_json_values(stream))
+
+    def test_read_errors_are_not_decompression_errors(self):
+        # e.g. the client disconnected while the request body was read
+        self.assertFalse(issubclass(UnreadablePostError, DECOMPRESSION_ERRORS))
+        self.assertFalse(issubclass(OSError, DECOMPRESSION_ERRORS))
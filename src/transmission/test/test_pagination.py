@@ -0,0 +1,76 @@
+"""Test keyset pagination of the frames tables"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from members.models import Member
+from transmission.models import Downlink
+from transmission.pagination import LAST_PAGE_CURSOR, paginate_keyset
+# pylint: disable=all
+
+
+class TestKeysetPagination(TestCase):
+    def setUp(self):
+        start = datetime(2022, 1, 1, tzinfo=timezone.utc)
+        frames = []
+        for i in range(25):
+            frame = Downlink(observer="observer", processed=i % 2 == 0, timestamp=start + timedelta(minutes=i // 2))
+            frame.set_frame("AA")
+            frames.append(frame)
+        # inserted out of order, with 2 frames per timestamp
+        Downlink.objects.bulk_create(frames[::-1])
+        self.ordered_ids = list(Downlink.objects.order_by("timestamp", "id").values_list("id", flat=True))
+
+    def test_forward_and_backward(self):
+        queryset = Downlink.objects.all()
+
+        pages = [paginate_keyset(queryset, "timestamp", 10)]
+        while pages[-1].has_next:
+            pages.append(paginate_keyset(queryset, "timestamp", 10, after=pages[-1].next_cursor))
+
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual([frame.id for page in pages for frame in page], self.ordered_ids)
+        self.assertFalse(pages[0].has_previous)
+        self.assertTrue(pages[2].has_previous)
+
+        previous_page = paginate_keyset(queryset, "timestamp", 10, before=pages[2].previous_cursor)
+        self.assertEqual([frame.id for frame in previous_page], [frame.id for frame in pages[1]])
+        self.assertTrue(previous_page.has_previous)
+        self.assertTrue(previous_page.has_next)
+
+    def test_last_page(self):
+        page = paginate_keyset(Downlink.objects.all(), "timestamp", 10, before=LAST_PAGE_CURSOR)
+
+        self.assertEqual([frame.id for frame in page], self.ordered_ids[-10:])
+        self.assertTrue(page.has_previous)
+        self.assertFalse(page.has_next)
+
+    def test_filtered_queryset_and_count(self):
+        page = paginate_keyset(Downlink.objects.filter(processed=True), "timestamp", 10, with_count=True)
+
+        self.assertEqual(page.count, 13)
+        self.assertTrue(all(frame.processed for frame in page))
+        self.assertIsNone(paginate_keyset(Downlink.objects.all(), "timestamp", 10).count)
+
+    def test_invalid_cursor(self):
+        page = paginate_keyset(Downlink.objects.all(), "timestamp", 10, after="invalid")
+
+        self.assertEqual([frame.id for frame in page], self.ordered_ids[:10])
+
+    @patch('transmission.views.QUERY_ROW_LIMIT', 10)
+    def test_frames_table_pages(self):
+        Member.objects.create_superuser(username='user', email='user@email.com', password='delfispace4242',
+                                        verified=True)
+        client = Client()
+        client.post(reverse('login'), {'username': 'user', 'password': 'delfispace4242'})
+
+        response = client.get(reverse('get_frames_table', args=["downlink"]), {"processed": "true", "count": "1"})
+        self.assertEqual(response.status_code, 200)
+        page = response.context["page_obj"]
+        self.assertEqual(page.count, 13)
+
+        response = client.get(reverse('get_frames_table', args=["downlink"]),
+                              {"processed": "true", "after": page.next_cursor})
+        self.assertEqual(len(response.context["page_obj"]), 3)
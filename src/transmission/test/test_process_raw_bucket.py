@@ -0,0 +1,108 @@
+"""Test raw bucket processing"""
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase, TestCase
+
+from transmission.models import QueuedFrame
+from transmission.processing import process_raw_bucket
+from transmission.processing.frame_queue import enqueue_frames
+from transmission.processing.XTCEParser import XTCEException, parseBulkDecoderOutput
+# pylint: disable=all
+
+
+def make_records(count):
+    start = datetime(2022, 1, 1)
+    records = []
+    for i in range(count):
+        record = MagicMock()
+        record.values = {"_time": start + timedelta(seconds=i), "frame": "00" if i % 5 else "FF",
+                         "observer": "observer"}
+        records.append(record)
+    return iter(records)
+
+
+def parse_frames(satellite, frames):
+    return [XTCEException("invalid frame") if frame == "FF" else {"frame": "Frame", "f": {"value": "1", "status": "Valid"}}
+            for frame in frames]
+
+
+@patch("transmission.processing.process_raw_bucket.frame_queue")
+@patch("transmission.processing.process_raw_bucket.parse_frames", side_effect=parse_frames)
+@patch("transmission.processing.process_raw_bucket.write_api")
+@patch("transmission.processing.process_raw_bucket.query_api")
+class TestProcessRetrievedFrames(TestCase):
+
+    @patch("transmission.processing.process_raw_bucket.FRAMES_CHUNK_SIZE", 10)
+    def test_frames_are_processed_in_chunks(self, query_api, write_api, _, frame_queue):
+        query_api.query_stream.return_value = make_records(25)
+
+        processed, total = process_raw_bucket.process_retrieved_frames("delfi_pq", "downlink", "0", "now()")
+
+        self.assertEqual(total, 25)
+        # every 5th frame fails to parse
+        self.assertEqual(processed, 20)
+        # the parsed frames are written once per chunk
+        self.assertEqual(write_api.write.call_count, 3)
+        # the failed frames are queued for retrying
+        self.assertEqual(frame_queue.requeue_frames.call_count, 3)
+        self.assertEqual(sum(len(call.args[2]) for call in frame_queue.requeue_frames.call_args_list), 5)
+        self.assertEqual(frame_queue.requeue_frames.call_args_list[0].args[2][0]["timestamp"], datetime(2022, 1, 1))
+
+
+class TestBulkDecoderOutput(SimpleTestCase):
+
+    def test_parse_bulk_decoder_output(self):
+        decoded = "F\tRadioFrame\nV\tvoltage\t3.3\tValid\nV\ttemperature\t-80\tToo Low\nE\tinvalid frame\nF\tEmpty\n"
+
+        telemetry = parseBulkDecoderOutput(decoded)
+
+        self.assertEqual(len(telemetry), 3)
+        self.assertEqual(telemetry[0], {"frame": "RadioFrame",
+                                        "voltage": {"value": "3.3", "status": "Valid"},
+                                        "temperature": {"value": "-80", "status": "Too Low"}})
+        self.assertIsInstance(telemetry[1], XTCEException)
+        self.assertEqual(telemetry[2], {"frame": "Empty"})
+
+
+@patch("transmission.processing.process_raw_bucket.parse_frames", side_effect=parse_frames)
+@patch("transmission.processing.process_raw_bucket.write_api")
+@patch("transmission.processing.process_raw_bucket.query_api")
+class TestProcessQueuedFrames(TestCase):
+
+    def setUp(self):
+        frames = [{"timestamp": f"2022-01-01T00:00:{i:02d}Z", "frame": "00" if i % 5 else "FF", "observer": "observer"}
+                  for i in range(12)]
+        enqueue_frames("delfi_pq", "downlink", frames)
+
+    @patch("transmission.processing.process_raw_bucket.FRAMES_CHUNK_SIZE", 5)
+    def test_queued_frames_are_processed(self, query_api, write_api, _):
+        processed, total = process_raw_bucket._process_raw_bucket("delfi_pq", "downlink", False, False)
+
+        self.assertEqual((processed, total), (9, 12))
+        # no query of the raw bucket and no write back of processed flags
+        query_api.query_stream.assert_not_called()
+        self.assertTrue(all(call.args[0] == "delfi_pq_downlink" for call in write_api.write.call_args_list))
+        # only the failed frames are left, to be retried later
+        self.assertEqual(QueuedFrame.objects.filter(status=QueuedFrame.RETRY).count(), 3)
+        self.assertEqual(QueuedFrame.objects.count(), 3)
+        self.assertEqual(process_raw_bucket._process_raw_bucket("delfi_pq", "downlink", False, False), (0, 0))
+
+    def test_failed_frames_are_retried(self, query_api, write_api, parse):
+        process_raw_bucket._process_raw_bucket("delfi_pq", "downlink", False, False)
+        parse.reset_mock()
+
+        processed, total = process_raw_bucket._process_raw_bucket("delfi_pq", "downlink", False, True)
+
+        self.assertEqual((processed, total), (0, 3))
+        self.assertEqual(parse.call_args.args[1], ["FF", "FF", "FF"])
+        self.assertEqual(QueuedFrame.objects.filter(status=QueuedFrame.RETRY).count(), 3)
+
+    @patch("transmission.processing.process_raw_bucket.reprocess_raw_bucket", return_value=(0, 0))
+    def test_requested_reprocessing_is_resumed(self, reprocess_raw_bucket, *_):
+        process_raw_bucket._process_raw_bucket("delfi_pq", "downlink", True, False)
+        self.assertFalse(reprocess_raw_bucket.call_args.kwargs["restart"])
+
+        # the reprocessing starts over if requested
+        process_raw_bucket._process_raw_bucket("delfi_pq", "downlink", True, False, True)
+        self.assertTrue(reprocess_raw_bucket.call_args.kwargs["restart"])
@@ -0,0 +1,91 @@
+"""Test the sharded reprocessing of entire raw data buckets"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase, TestCase
+
+from transmission.models import ReprocessingShard
+from transmission.processing.reprocessing import ReprocessingError, get_shards, get_shards_executor, \
+    reprocess_raw_bucket
+from transmission.test.helpers import utc
+# pylint: disable=all
+
+
+def process_range(satellite, link, start, stop):
+    if start == "2022-01-08T00:00:00Z":
+        raise IOError("unavailable")
+    return 9, 10
+
+
+# the mocks cannot be passed to worker processes
+@patch("transmission.processing.reprocessing.REPROCESSING_PROCESSES", 0)
+@patch("transmission.processing.reprocessing.get_bucket_time_range",
+       return_value=(utc(2022, 1, 2, 10), utc(2022, 1, 20, 12)))
+class TestReprocessing(TestCase):
+
+    @patch("transmission.processing.reprocessing.REPROCESSING_SHARD_DAYS", 7)
+    def test_shards(self, _):
+        # weeks since the epoch start on thursday
+        self.assertEqual(get_shards(utc(2022, 1, 2, 10), utc(2022, 1, 20, 12)),
+                         [(utc(2021, 12, 30), utc(2022, 1, 6)), (utc(2022, 1, 6), utc(2022, 1, 13)),
+                          (utc(2022, 1, 13), utc(2022, 1, 20)), (utc(2022, 1, 20), utc(2022, 1, 27))])
+
+    @patch("transmission.processing.reprocessing.REPROCESSING_SHARD_DAYS", 1)
+    def test_shards_are_processed_in_parallel(self, _):
+        process = MagicMock(return_value=(9, 10))
+
+        processed, total = reprocess_raw_bucket(MagicMock(), "delfi_pq", "downlink", process)
+
+        # 19 daily shards from 2022-01-02 to 2022-01-20
+        self.assertEqual((processed, total), (19 * 9, 19 * 10))
+        self.assertEqual(process.call_count, 19)
+        self.assertIn(("delfi_pq", "downlink", "2022-01-02T00:00:00Z", "2022-01-03T00:00:00Z"),
+                      [call.args for call in process.call_args_list])
+        self.assertEqual(ReprocessingShard.objects.filter(status=ReprocessingShard.DONE).count(), 19)
+
+    @patch("transmission.processing.reprocessing.REPROCESSING_SHARD_DAYS", 1)
+    def test_interrupted_reprocessing_is_resumed(self, get_bucket_time_range):
+        with self.assertRaises(ReprocessingError) as error:
+            reprocess_raw_bucket(MagicMock(), "delfi_pq", "downlink", process_range)
+
+        # the failed shard stays pending, the other shards are processed
+        self.assertEqual((error.exception.processed_frames, error.exception.total_frames), (18 * 9, 18 * 10))
+        pending = ReprocessingShard.objects.get(status=ReprocessingShard.PENDING)
+        self.assertEqual(pending.start, utc(2022, 1, 8))
+
+        process = MagicMock(return_value=(10, 10))
+        self.assertEqual(reprocess_raw_bucket(MagicMock(), "delfi_pq", "downlink", process), (10, 10))
+        # only the pending shard is processed
+        process.assert_called_once_with("delfi_pq", "downlink", "2022-01-08T00:00:00Z", "2022-01-09T00:00:00Z")
+        self.assertEqual(get_bucket_time_range.call_count, 1)
+
+        # all shards are done, the next reprocessing starts over
+        self.assertEqual(reprocess_raw_bucket(MagicMock(), "delfi_pq", "downlink", process), (190, 190))
+        self.assertEqual(ReprocessingShard.objects.count(), 19)
+
+    @patch("transmission.processing.reprocessing.REPROCESSING_SHARD_DAYS", 1)
+    def test_restart(self, _):
+        with self.assertRaises(ReprocessingError):
+            reprocess_raw_bucket(MagicMock(), "delfi_pq", "downlink", process_range)
+        self.assertEqual(ReprocessingShard.objects.filter(status=ReprocessingShard.PENDING).count(), 1)
+
+        process = MagicMock(return_value=(1, 1))
+        self.assertEqual(reprocess_raw_bucket(MagicMock(), "delfi_pq", "downlink", process, restart=True), (19, 19))
+
+    def test_empty_bucket(self, get_bucket_time_range):
+        get_bucket_time_range.return_value = None
+
+        self.assertEqual(reprocess_raw_bucket(MagicMock(), "delfi_pq", "downlink", MagicMock()), (0, 0))
+
+
+class TestShardsExecutor(SimpleTestCase):
+
+    def test_shards_are_processed_by_threads_by_default(self):
+        with get_shards_executor() as executor:
+            self.assertIsInstance(executor, ThreadPoolExecutor)
+
+    @patch("transmission.processing.reprocessing.REPROCESSING_PROCESSES", 2)
+    def test_shards_are_processed_by_worker_processes(self):
+        # the parser of a satellite is locked, threads parse one frame at a time
+        with get_shards_executor() as executor:
+            self.assertIsInstance(executor, ProcessPoolExecutor)
@@ -0,0 +1,73 @@
+"""Test the telemetry rollups"""
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+from influxdb_client.client.exceptions import InfluxDBError
+
+from transmission.processing.rollups import backfill_rollups, build_rollup_query, get_rollup_ranges, \
+    update_rollups
+from transmission.test.helpers import utc
+# pylint: disable=all
+
+
+class TestRollups(SimpleTestCase):
+
+    def test_rollup_ranges(self):
+        timestamps = ["2022-01-01T10:15:00Z", "2022-01-01T10:45:00Z", datetime(2022, 1, 1, 11, 5),
+                      "2022-01-01T14:00:00Z"]
+
+        # consecutive windows are rolled up together
+        self.assertEqual(get_rollup_ranges(timestamps, "1h"), [(utc(2022, 1, 1, 10), utc(2022, 1, 1, 12)),
+                                                               (utc(2022, 1, 1, 14), utc(2022, 1, 1, 15))])
+        self.assertEqual(get_rollup_ranges(timestamps, "1d"), [(utc(2022, 1, 1), utc(2022, 1, 2))])
+
+    def test_rollup_query(self):
+        query = build_rollup_query("delfi_c3", "downlink", "1d", utc(2022, 1, 1), utc(2022, 1, 2))
+
+        self.assertIn('from(bucket: "delfi_c3_downlink")', query)
+        self.assertIn('range(start: 2022-01-01T00:00:00Z, stop: 2022-01-02T00:00:00Z)', query)
+        self.assertIn('to(bucket: "delfi_c3_downlink_1d"', query)
+        for aggregate in ["min", "max", "mean", "count"]:
+            self.assertIn(f'aggregateWindow(every: 1d, fn: {aggregate}, createEmpty: false, timeSrc: "_start")',
+                          query)
+            self.assertIn(f'set(key: "aggregate", value: "{aggregate}")', query)
+
+    def test_update_rollups(self):
+        query_api = MagicMock()
+
+        update_rollups(query_api, "delfi_pq", "downlink", ["2022-01-01T10:15:00Z", "2022-01-02T10:15:00Z"])
+
+        queries = [call.args[0] for call in query_api.query.call_args_list]
+        # 2 separate hourly windows, the 2 consecutive daily windows are rolled up at once
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(len([query for query in queries if "delfi_pq_downlink_1h" in query]), 2)
+
+        query_api.reset_mock()
+        update_rollups(query_api, "delfi_pq", "downlink", [])
+        query_api.query.assert_not_called()
+
+    def test_failed_rollup_is_logged(self):
+        query_api = MagicMock()
+        query_api.query.side_effect = InfluxDBError(message="unavailable")
+
+        with self.assertLogs(level="ERROR"):
+            update_rollups(query_api, "delfi_pq", "downlink", ["2022-01-01T10:15:00Z"])
+
+    @patch("transmission.processing.rollups.ROLLUP_BACKFILL_DAYS", 10)
+    def test_backfill(self):
+        query_api = MagicMock()
+
+        slices = backfill_rollups(query_api, "delfi_c3", "downlink", utc(2022, 1, 1, 12), utc(2022, 1, 25))
+
+        # whole days from the start, 2 intervals per slice
+        self.assertEqual(slices, 3)
+        self.assertEqual(query_api.query.call_count, 6)
+        self.assertIn("range(start: 2022-01-01T00:00:00Z, stop: 2022-01-11T00:00:00Z)",
+                      query_api.query.call_args_list[0].args[0])
+
+    def test_backfill_empty_bucket(self):
+        query_api = MagicMock()
+        query_api.query.return_value = []
+
+        self.assertEqual(backfill_rollups(query_api, "delfi_c3", "downlink"), 0)
@@ -0,0 +1,55 @@
+"""Test frame pre-classification"""
+from unittest.mock import MagicMock
+
+from django.test import SimpleTestCase
+
+from transmission.processing.satellite_index import SatelliteIndex, get_ax25_source_callsign
+from transmission.processing.XTCEParser import XTCEException
+# pylint: disable=all
+
+DELFI_PQ_FRAME = bytes.fromhex("8EA49EAA9C88E088988C92A0A26103F000081B015002000300000000000000000000000000000000000000000000")
+DELFI_C3_FRAME = bytes.fromhex("A8989B4040400088988C9286660103F0E108C10001000000000000000000000000")
+DELFI_NEXT_FRAME = bytes.fromhex("A8989A40404000888C9C66B0A80003F0890FFDAD776500001E601983C008C39C10D029")
+
+
+class TestSatelliteIndex(SimpleTestCase):
+
+    def test_ax25_source_callsign(self):
+        self.assertEqual(get_ax25_source_callsign(DELFI_PQ_FRAME), "DLFIPQ")
+        self.assertEqual(get_ax25_source_callsign(DELFI_C3_FRAME), "DLFIC3")
+        self.assertEqual(get_ax25_source_callsign(DELFI_NEXT_FRAME), "DFN3XT")
+        # too short or not an AX.25 UI frame
+        self.assertIsNone(get_ax25_source_callsign(DELFI_PQ_FRAME[:10]))
+        self.assertIsNone(get_ax25_source_callsign(bytes(20)))
+
+    def test_only_candidates_are_parsed(self):
+        delfi_pq_parser = MagicMock()
+        delfi_c3_parser = MagicMock()
+        index = SatelliteIndex({"delfi_pq": delfi_pq_parser, "delfi_c3": delfi_c3_parser, "da_vinci": None})
+
+        self.assertEqual(index.get_satellite(DELFI_C3_FRAME), "delfi_c3")
+        delfi_pq_parser.processTMFrame.assert_not_called()
+
+        # frames of unknown satellites are rejected without parsing
+        self.assertIsNone(index.get_satellite(DELFI_NEXT_FRAME))
+        self.assertIsNone(index.get_satellite(bytes(20)))
+        delfi_pq_parser.processTMFrame.assert_not_called()
+        delfi_c3_parser.processTMFrame.assert_called_once()
+
+    def test_invalid_candidate_frame(self):
+        delfi_pq_parser = MagicMock()
+        delfi_pq_parser.processTMFrame.side_effect = XTCEException("invalid frame")
+        index = SatelliteIndex({"delfi_pq": delfi_pq_parser})
+
+        self.assertIsNone(index.get_satellite(DELFI_PQ_FRAME))
+
+    def test_unindexed_satellite_is_learned(self):
+        parser = MagicMock()
+        index = SatelliteIndex({"new_sat": parser})
+
+        # without a known callsign, the satellite is a candidate for any frame
+        self.assertEqual(index.get_candidates(DELFI_NEXT_FRAME), ["new_sat"])
+        self.assertEqual(index.get_satellite(DELFI_NEXT_FRAME), "new_sat")
+        # after the first parsed frame, only frames with the same callsign are candidates
+        self.assertEqual(index.get_candidates(DELFI_NEXT_FRAME), ["new_sat"])
+        self.assertEqual(index.get_candidates(DELFI_PQ_FRAME), [])
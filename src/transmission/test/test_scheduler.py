@@ -0,0 +1,125 @@
+"""Test the parallel job scheduling"""
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from apscheduler.schedulers.base import STATE_STOPPED
+from apscheduler.triggers.interval import IntervalTrigger
+from django.test import SimpleTestCase
+
+from transmission.processing import process_raw_bucket
+from transmission.processing.bucket_worker import run_raw_bucket_processing
+from transmission.scheduler import Scheduler, check_queues, merge_bucket_processing_args, schedule_job
+# pylint: disable=all
+
+
+class TestSchedulerJobs(SimpleTestCase):
+
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.patcher = patch.object(self.scheduler, "scheduler", MagicMock())
+        self.patcher.start()
+        self.scheduler.running_jobs.clear()
+        self.scheduler.pending_jobs.clear()
+        self.scheduler.rerun_jobs.clear()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_job_requested_while_running_is_rerun(self):
+        function = MagicMock()
+        self.scheduler.submitted_job_listener(SimpleNamespace(job_id="delfi_pq_bucket_processing"))
+
+        self.scheduler.add_job_to_schedule(function, ["delfi_pq"], "delfi_pq_bucket_processing")
+        self.scheduler.scheduler.add_job.assert_not_called()
+
+        self.scheduler.executed_job_listener(SimpleNamespace(job_id="delfi_pq_bucket_processing"))
+        self.scheduler.scheduler.add_job.assert_called_once()
+        self.assertEqual(self.scheduler.scheduler.add_job.call_args.kwargs["id"], "delfi_pq_bucket_processing")
+        self.assertEqual(self.scheduler.get_running_jobs(), set())
+
+    def test_bucket_jobs_requested_while_running_are_merged(self):
+        self.scheduler.submitted_job_listener(SimpleNamespace(job_id="delfi_pq_bucket_processing"))
+
+        schedule_job("reprocess_entire_raw_bucket", "delfi_pq")
+        schedule_job("raw_bucket_processing", "delfi_pq", "downlink")
+        self.scheduler.scheduler.add_job.assert_not_called()
+
+        # the reprocessing of both links is not replaced by the processing of the downlink
+        self.scheduler.executed_job_listener(SimpleNamespace(job_id="delfi_pq_bucket_processing"))
+        self.assertEqual(self.scheduler.scheduler.add_job.call_args.kwargs["args"],
+                         ["delfi_pq", None, True, False, False])
+
+    def test_pending_bucket_job_is_merged(self):
+        self.scheduler.add_job_listener(SimpleNamespace(job_id="delfi_pq_bucket_processing"))
+        self.scheduler.scheduler.get_job.return_value = SimpleNamespace(args=["delfi_pq", "uplink", False, True])
+
+        schedule_job("raw_bucket_processing", "delfi_pq", "downlink")
+
+        self.scheduler.scheduler.modify_job.assert_called_once_with("delfi_pq_bucket_processing",
+                                                                    args=["delfi_pq", None, False, True, False])
+
+    def test_merge_bucket_processing_args(self):
+        self.assertEqual(merge_bucket_processing_args(["delfi_pq", "downlink"], ["delfi_pq", "downlink"]),
+                         ["delfi_pq", "downlink", False, False, False])
+        self.assertEqual(merge_bucket_processing_args(["delfi_pq", "downlink", False, True], ["delfi_pq", None]),
+                         ["delfi_pq", None, False, True, False])
+        self.assertEqual(merge_bucket_processing_args(["delfi_pq", "uplink"], ["delfi_pq", "downlink", True, False]),
+                         ["delfi_pq", None, True, False, False])
+        self.assertEqual(merge_bucket_processing_args(["delfi_pq", "downlink", True, False, True],
+                                                      ["delfi_pq", "downlink", True, False, False]),
+                         ["delfi_pq", "downlink", True, False, True])
+
+    def test_reprocessing_restart_is_a_job_argument(self):
+        schedule_job("reprocess_entire_raw_bucket", "delfi_pq", "downlink", restart=True)
+
+        self.assertEqual(self.scheduler.scheduler.add_job.call_args.kwargs["args"],
+                         ["delfi_pq", "downlink", True, False, True])
+
+    @patch("transmission.scheduler.SCHEDULER_PROCESSES", 2)
+    def test_bucket_processing_in_process_pool(self):
+        schedule_job("raw_bucket_processing", "delfi_pq")
+
+        args, kwargs = self.scheduler.scheduler.add_job.call_args
+        self.assertEqual(args[0], run_raw_bucket_processing)
+        self.assertEqual(kwargs["executor"], "processpool")
+        self.assertEqual(kwargs["args"], ["delfi_pq", None])
+
+    def test_queues_are_checked_from_start(self):
+        self.scheduler.scheduler.state = STATE_STOPPED
+
+        self.scheduler.start_scheduler()
+
+        self.scheduler.scheduler.start.assert_called_once()
+        kwargs = self.scheduler.scheduler.add_job.call_args.kwargs
+        self.assertEqual(kwargs["id"], "queue_check")
+        self.assertIsInstance(kwargs["trigger"], IntervalTrigger)
+
+    @patch("transmission.scheduler.has_due_frames", return_value=False)
+    @patch("transmission.scheduler.has_queued_submissions", return_value=True)
+    def test_queued_submissions_are_processed(self, *_):
+        check_queues()
+
+        self.assertEqual(self.scheduler.scheduler.add_job.call_args.kwargs["id"], "submission_processing")
+
+    @patch("transmission.scheduler.has_due_frames", side_effect=lambda satellite: satellite == "delfi_c3")
+    @patch("transmission.scheduler.has_queued_submissions", return_value=False)
+    def test_due_frames_are_processed(self, *_):
+        check_queues()
+
+        self.scheduler.scheduler.add_job.assert_called_once()
+        kwargs = self.scheduler.scheduler.add_job.call_args.kwargs
+        self.assertEqual((kwargs["id"], kwargs["args"]), ("delfi_c3_bucket_processing", ["delfi_c3", None]))
+
+
+class TestParallelLinks(SimpleTestCase):
+
+    @patch("transmission.processing.process_raw_bucket._process_raw_bucket", return_value=(0, 0))
+    def test_links_are_processed_concurrently(self, _process_raw_bucket):
+        process_raw_bucket.process_raw_bucket("delfi_pq")
+
+        self.assertEqual(sorted(call.args[1] for call in _process_raw_bucket.call_args_list), ["downlink", "uplink"])
+
+    @patch("transmission.processing.process_raw_bucket._process_raw_bucket", side_effect=IOError("unavailable"))
+    def test_errors_are_raised(self, _):
+        with self.assertRaises(IOError):
+            process_raw_bucket.process_raw_bucket("delfi_pq")
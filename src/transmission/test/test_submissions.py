@@ -0,0 +1,132 @@
+"""Test asynchronous frame submissions"""
+import gzip
+import json
+from unittest.mock import patch
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from members.models import APIKey, Member
+from transmission.models import Downlink, FrameSubmission, Uplink
+from transmission.processing.submissions import process_queued_submissions
+# pylint: disable=all
+
+FRAME = {"timestamp": "2021-12-19T02:20:14.959630Z", "frame": "8EA49EAA9C88E088988C92A0A26103F000081B0150020003"}
+
+
+@patch('transmission.views.schedule_job')
+class TestAsyncSubmission(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = Member.objects.create_user(username='user', email='user@email.com')
+        self.user.user_permissions.add(Permission.objects.get(codename='add_downlink'))
+        _, self.key = APIKey.objects.create_key(name='user', username=self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def submit(self, body, key=None):
+        return self.client.post(reverse('submit_frame_async'), data=body, content_type='application/json',
+                                HTTP_AUTHORIZATION=key or self.key)
+
+    def get_status(self, submission_id, key=None):
+        return self.client.get(reverse('get_submission_status', args=[submission_id]),
+                               HTTP_AUTHORIZATION=key or self.key)
+
+    def test_submission_is_queued_and_processed(self, schedule_job):
+        response = self.submit(json.dumps([FRAME, FRAME]))
+
+        self.assertEqual(response.status_code, 202)
+        submission_id = response.json()["submission_id"]
+        schedule_job.assert_called_once_with("submission_processing")
+        # nothing is stored before the queue is processed
+        self.assertEqual(len(Downlink.objects.all()), 0)
+        self.assertEqual(self.get_status(submission_id).json()["submission"]["status"], "queued")
+
+        self.assertEqual(process_queued_submissions(), 1)
+
+        self.assertEqual(len(Downlink.objects.all()), 2)
+        status = self.get_status(submission_id).json()["submission"]
+        self.assertEqual(status["status"], "processed")
+        self.assertEqual(status["frames_saved"], 2)
+        # the queue is empty
+        self.assertEqual(process_queued_submissions(), 0)
+
+    def test_invalid_submissions_fail(self, _):
+        invalid_json = self.submit("[{").json()["submission_id"]
+        forbidden = self.submit(json.dumps([FRAME, dict(FRAME, link="uplink")])).json()["submission_id"]
+
+        self.assertEqual(process_queued_submissions(), 2)
+
+        status = self.get_status(invalid_json).json()["submission"]
+        self.assertEqual((status["status"], status["message"]), ("failed", "Invalid JSON structure"))
+        status = self.get_status(forbidden).json()["submission"]
+        self.assertEqual((status["status"], status["message"]), ("failed", "Permission denied"))
+        # a failed submission stores no frames
+        self.assertEqual(len(Downlink.objects.all()), 0)
+        self.assertEqual(len(Uplink.objects.all()), 0)
+
+    def test_ndjson_submission(self, _):
+        body = gzip.compress((json.dumps(FRAME) + "\n{invalid\n" + json.dumps(FRAME)).encode())
+        response = self.client.post(reverse('submit_frame_async'), data=body, content_type='application/x-ndjson',
+                                    HTTP_CONTENT_ENCODING='gzip', HTTP_AUTHORIZATION=self.key)
+
+        process_queued_submissions()
+
+        status = self.get_status(response.json()["submission_id"]).json()["submission"]
+        self.assertEqual(status["status"], "processed")
+        self.assertEqual(status["frames_saved"], 2)
+        self.assertEqual(status["errors"], [{"line": 2, "message": "Invalid JSON structure"}])
+
+    def test_database_error_fails_submission(self, _):
+        self.submit(json.dumps(FRAME))
+        process_queued_submissions()
+        stored_frame = Downlink.objects.get()
+
+        body = (json.dumps(FRAME) + "\n" + json.dumps(FRAME)).encode()
+        ndjson = self.client.post(reverse('submit_frame_async'), data=body, content_type='application/x-ndjson',
+                                  HTTP_AUTHORIZATION=self.key).json()["submission_id"]
+        valid = self.submit(json.dumps(FRAME)).json()["submission_id"]
+
+        bulk_create = Downlink.objects.bulk_create
+        failures = [True]
+
+        def bulk_create_stored_frames(frames, *args, **kwargs):
+            # the frames of the first submission get the primary key of a stored frame
+            if failures and frames:
+                failures.pop()
+                for frame in frames:
+                    frame.pk = stored_frame.pk
+            return bulk_create(frames, *args, **kwargs)
+
+        with patch.object(Downlink.objects, 'bulk_create', side_effect=bulk_create_stored_frames):
+            self.assertEqual(process_queued_submissions(), 2)
+
+        status = self.get_status(ndjson).json()["submission"]
+        self.assertEqual(status["status"], "failed")
+        self.assertTrue(status["message"].startswith("IntegrityError"))
+        self.assertEqual(status["frames_saved"], 0)
+        # the queue is not blocked by the failed submission
+        self.assertEqual(self.get_status(valid).json()["submission"]["status"], "processed")
+        self.assertEqual(len(Downlink.objects.all()), 2)
+
+    def test_unauthorized_submission(self, schedule_job):
+        response = self.submit(json.dumps(FRAME), key="invalid.key")
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(len(FrameSubmission.objects.all()), 0)
+        schedule_job.assert_not_called()
+
+    def test_empty_submission(self, _):
+        self.assertEqual(self.submit("").status_code, 400)
+
+    def test_status_of_other_members_submission(self, _):
+        submission_id = self.submit(json.dumps(FRAME)).json()["submission_id"]
+        other_user = Member.objects.create_user(username='other', email='other@email.com')
+        _, other_key = APIKey.objects.create_key(name='other', username=other_user)
+
+        self.assertEqual(self.get_status(submission_id, key=other_key).status_code, 404)
+        self.assertEqual(self.get_status(submission_id, key="invalid.key").status_code, 401)
@@ -0,0 +1,122 @@
+"""Test the telemetry query cache"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from transmission.processing.telemetry_cache import get_cached_telemetry, get_months, get_time_chunks, \
+    invalidate_telemetry_cache, version_cache
+# pylint: disable=all
+
+START = datetime(2022, 1, 31, tzinfo=timezone.utc)
+
+
+def fetch_hourly(start, stop):
+    """Columns with one row at the end of every hour window"""
+    times = []
+    time = start.replace(minute=0) + timedelta(hours=1)
+    while time <= stop:
+        times.append(time)
+        time += timedelta(hours=1)
+    return {"time": times, "voltage": [float(time.hour) for time in times]}
+
+
+@patch("transmission.processing.telemetry_cache.TELEMETRY_CACHE_CHUNK_WINDOWS", 12)
+class TestTelemetryCache(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_time_chunks(self):
+        chunks = get_time_chunks(START + timedelta(hours=3), START + timedelta(hours=30), 3600)
+
+        # chunks of 12 hours aligned to the epoch
+        self.assertEqual(chunks, [(START + timedelta(hours=3), START + timedelta(hours=12)),
+                                  (START + timedelta(hours=12), START + timedelta(hours=24)),
+                                  (START + timedelta(hours=24), START + timedelta(hours=30))])
+        self.assertEqual(get_months(START, START + timedelta(days=2)), ["2022-01", "2022-02"])
+        self.assertEqual(get_months(datetime(2022, 12, 5, tzinfo=timezone.utc),
+                                    datetime(2023, 1, 1, tzinfo=timezone.utc)), ["2022-12"])
+
+    def test_cached_chunks_are_reused(self):
+        fetch = MagicMock(side_effect=fetch_hourly)
+
+        first = get_cached_telemetry("delfi_pq", "downlink", ["voltage"], START, START + timedelta(hours=24),
+                                     3600, "mean", fetch)
+        # consecutive missing chunks are fetched in one query
+        fetch.assert_called_once_with(START, START + timedelta(hours=24))
+        self.assertEqual(first, fetch_hourly(START, START + timedelta(hours=24)))
+
+        fetch.reset_mock()
+        second = get_cached_telemetry("delfi_pq", "downlink", ["voltage"], START + timedelta(hours=12),
+                                      START + timedelta(hours=36), 3600, "mean", fetch)
+        # only the last chunk is missing
+        fetch.assert_called_once_with(START + timedelta(hours=24), START + timedelta(hours=36))
+        self.assertEqual(second, fetch_hourly(START + timedelta(hours=12), START + timedelta(hours=36)))
+
+    def test_different_queries_are_not_shared(self):
+        fetch = MagicMock(side_effect=fetch_hourly)
+
+        get_cached_telemetry("delfi_pq", "downlink", ["voltage"], START, START + timedelta(hours=12), 3600, "mean",
+                             fetch)
+        get_cached_telemetry("delfi_pq", "downlink", ["voltage"], START, START + timedelta(hours=12), 3600, "max",
+                             fetch)
+        get_cached_telemetry("delfi_c3", "downlink", ["voltage"], START, START + timedelta(hours=12), 3600, "mean",
+                             fetch)
+
+        self.assertEqual(fetch.call_count, 3)
+
+    def test_invalidation(self):
+        fetch = MagicMock(side_effect=fetch_hourly)
+        # the first two chunks are in January, the last in February
+        get_cached_telemetry("delfi_pq", "downlink", ["voltage"], START, START + timedelta(hours=36), 3600, "mean",
+                             fetch)
+
+        # telemetry of another link or month does not invalidate the chunks
+        invalidate_telemetry_cache("delfi_pq", "uplink", ["2022-01-31T05:00:00Z"])
+        invalidate_telemetry_cache("delfi_pq", "downlink", [datetime(2022, 3, 1)])
+        fetch.reset_mock()
+        get_cached_telemetry("delfi_pq", "downlink", ["voltage"], START, START + timedelta(hours=36), 3600, "mean",
+                             fetch)
+        fetch.assert_not_called()
+
+        invalidate_telemetry_cache("delfi_pq", "downlink", ["2022-02-01T05:00:00Z"])
+        get_cached_telemetry("delfi_pq", "downlink", ["voltage"], START, START + timedelta(hours=36), 3600, "mean",
+                             fetch)
+        fetch.assert_called_once_with(START + timedelta(hours=24), START + timedelta(hours=36))
+
+    def test_versions_are_shared_between_processes(self):
+        invalidate_telemetry_cache("delfi_pq", "downlink", ["2022-01-31T05:00:00Z"])
+
+        # the versions are in the database cache, not in the cache of this process
+        self.assertIsNotNone(version_cache.get("telemetry_version:delfi_pq:downlink:2022-01"))
+        self.assertIsNone(cache.get("telemetry_version:delfi_pq:downlink:2022-01"))
+
+    def test_evicted_version_does_not_revive_stale_chunks(self):
+        fetch = MagicMock(side_effect=fetch_hourly)
+        get_cached_telemetry("delfi_pq", "downlink", ["voltage"], START, START + timedelta(hours=12), 3600, "mean",
+                             fetch)
+
+        invalidate_telemetry_cache("delfi_pq", "downlink", ["2022-01-31T05:00:00Z"])
+        version_cache.delete("telemetry_version:delfi_pq:downlink:2022-01")
+        get_cached_telemetry("delfi_pq", "downlink", ["voltage"], START, START + timedelta(hours=12), 3600, "mean",
+                             fetch)
+
+        self.assertEqual(fetch.call_count, 2)
+
+    @patch("transmission.processing.telemetry_cache.cache")
+    def test_recent_chunks_expire(self, cache_mock):
+        cache_mock.get_many.return_value = {}
+        cache_mock.get.return_value = "version"
+        now = datetime.now(timezone.utc)
+
+        get_cached_telemetry("delfi_pq", "downlink", ["voltage"], now - timedelta(days=30), now, 24 * 3600, "mean",
+                             fetch_hourly)
+
+        timeouts = [call.args[2] for call in cache_mock.set.call_args_list]
+        # historical chunks are cached until invalidated
+        self.assertEqual(timeouts[0], None)
+        self.assertEqual(timeouts[-1], 60)
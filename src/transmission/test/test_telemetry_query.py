@@ -0,0 +1,138 @@
+"""Test the downsampled telemetry query"""
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.core.exceptions import BadRequest
+from django.test import TestCase
+from django.urls import reverse
+
+from transmission.processing.telemetry_query import build_telemetry_query, get_rollup_interval, get_window_seconds, \
+    query_telemetry
+# pylint: disable=all
+
+START = datetime(2022, 1, 1, tzinfo=timezone.utc)
+STOP = datetime(2022, 1, 2, tzinfo=timezone.utc)
+
+
+def make_records(count):
+    records = []
+    for i in range(count):
+        record = MagicMock()
+        record.values = {"_time": datetime(2022, 1, 1, i, tzinfo=timezone.utc), "voltage": float(i)}
+        if i % 2 == 0:
+            record.values["current"] = 0.5
+        records.append(record)
+    return iter(records)
+
+
+class TestTelemetryQuery(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_aggregate_window(self):
+        # rounded up to the next window duration
+        self.assertEqual(get_window_seconds(START, STOP, 1000), 120)
+        self.assertEqual(get_window_seconds(START, STOP, 24), 3600)
+        # windows are at least 1 second
+        self.assertEqual(get_window_seconds(START, START.replace(second=10), 1000), 1)
+        # and whole weeks for long time ranges
+        self.assertEqual(get_window_seconds(START, STOP.replace(year=2032), 100), 6 * 7 * 24 * 3600)
+
+    def test_flux_query(self):
+        query = build_telemetry_query("delfi_pq", "downlink", ["voltage", "current"], START, STOP, "60s", "max")
+
+        self.assertIn('from(bucket: "delfi_pq_downlink")', query)
+        self.assertIn('range(start: 2022-01-01T00:00:00.000000Z, stop: 2022-01-02T00:00:00.000000Z)', query)
+        self.assertIn('r["_field"] == "voltage" or r["_field"] == "current"', query)
+        self.assertIn('aggregateWindow(every: 60s, fn: max, createEmpty: false)', query)
+
+    def test_rollup_interval(self):
+        self.assertEqual(get_rollup_interval(1800, "mean"), None)
+        self.assertEqual(get_rollup_interval(3600, "mean"), "1h")
+        self.assertEqual(get_rollup_interval(6 * 3600, "max"), "1h")
+        self.assertEqual(get_rollup_interval(24 * 3600, "count"), "1d")
+        self.assertEqual(get_rollup_interval(7 * 24 * 3600, "min"), "1d")
+        # the rollups hold no medians
+        self.assertEqual(get_rollup_interval(24 * 3600, "median"), None)
+
+    def test_rollup_flux_query(self):
+        query = build_telemetry_query("delfi_pq", "downlink", ["voltage"], START, STOP, "86400s", "max", "1d")
+
+        self.assertIn('from(bucket: "delfi_pq_downlink_1d")', query)
+        self.assertIn('r["aggregate"] == "max"', query)
+        self.assertIn('aggregateWindow(every: 86400s, fn: max, createEmpty: false)', query)
+
+        query = build_telemetry_query("delfi_pq", "downlink", ["voltage"], START, STOP, "7200s", "count", "1h")
+        self.assertIn('from(bucket: "delfi_pq_downlink_1h")', query)
+        self.assertIn('aggregateWindow(every: 7200s, fn: sum, createEmpty: false)', query)
+
+        # the mean is weighted by the counts
+        query = build_telemetry_query("delfi_pq", "downlink", ["voltage"], START, STOP, "3600s", "mean", "1h")
+        self.assertIn('r["aggregate"] == "mean" or r["aggregate"] == "count"', query)
+        self.assertIn('r._value_total / r._value_count', query)
+
+    @patch('transmission.processing.telemetry_query.fetch_telemetry_columns')
+    def test_long_queries_read_the_rollups(self, fetch_telemetry_columns):
+        fetch_telemetry_columns.return_value = {"time": [], "voltage": []}
+
+        query_telemetry("delfi_pq", ["voltage"], START, START.replace(year=2023), points=365, use_cache=False)
+        self.assertEqual(fetch_telemetry_columns.call_args.args[-1], "1d")
+
+        query_telemetry("delfi_pq", ["voltage"], START, STOP, points=1000, use_cache=False)
+        self.assertEqual(fetch_telemetry_columns.call_args.args[-1], None)
+
+    @patch('transmission.processing.telemetry_query.get_influx_db_read_and_query_api')
+    def test_columnar_result(self, get_api):
+        query_api = MagicMock()
+        query_api.query_stream.return_value = make_records(3)
+        get_api.return_value = (None, query_api)
+
+        result = query_telemetry("delfi_pq", ["voltage", "current"], START, STOP, points=24, use_cache=False)
+
+        self.assertEqual(result["window"], "3600s")
+        self.assertEqual(result["columns"]["voltage"], [0.0, 1.0, 2.0])
+        self.assertEqual(result["columns"]["current"], [0.5, None, 0.5])
+        self.assertEqual(len(result["columns"]["time"]), 3)
+
+    def test_invalid_queries(self):
+        invalid_queries = [
+            dict(satellite="unknown", parameters=["voltage"]),
+            dict(satellite="delfi_pq", parameters=[]),
+            dict(satellite="delfi_pq", parameters=['voltage") or (r) => true']),
+            dict(satellite="delfi_pq", parameters=["voltage"], points=0),
+            dict(satellite="delfi_pq", parameters=["voltage"], aggregate="drop"),
+            dict(satellite="delfi_pq", parameters=["voltage"], stop=START),
+        ]
+        for query in invalid_queries:
+            arguments = dict(start=START, stop=STOP)
+            arguments.update(query)
+            with self.assertRaises(BadRequest):
+                query_telemetry(**arguments)
+
+    @patch('transmission.processing.telemetry_query.get_influx_db_read_and_query_api')
+    def test_telemetry_endpoint(self, get_api):
+        query_api = MagicMock()
+        query_api.query_stream.return_value = make_records(2)
+        get_api.return_value = (None, query_api)
+
+        response = self.client.get(reverse('get_telemetry', args=["delfi_pq"]),
+                                   {"parameters": "voltage,current", "start": "2022-01-01T00:00:00Z",
+                                    "stop": "2022-01-02T00:00:00Z", "points": "24"})
+
+        self.assertEqual(response.status_code, 200)
+        telemetry = response.json()["telemetry"]
+        self.assertEqual(telemetry["columns"]["time"], ["2022-01-01T00:00:00.000000Z", "2022-01-01T01:00:00.000000Z"])
+        self.assertEqual(telemetry["columns"]["current"], [0.5, None])
+
+    def test_telemetry_endpoint_bad_request(self):
+        response = self.client.get(reverse('get_telemetry', args=["delfi_pq"]),
+                                   {"parameters": "voltage", "start": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse('get_telemetry', args=["delfi_pq"]),
+                                   {"parameters": "voltage", "start": "2022-01-01", "points": "many"})
+        self.assertEqual(response.status_code, 400)
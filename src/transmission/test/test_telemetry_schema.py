@@ -0,0 +1,100 @@
+"""Test the frame schema of the parsed telemetry"""
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase
+
+from transmission.processing import process_raw_bucket
+from transmission.processing.telemetry_schema import decode_status_bitmap, encode_status_bitmap, \
+    field_records_to_frame_points, get_telemetry_bucket, migrate_time_range, telemetry_to_frame_points
+# pylint: disable=all
+
+TELEMETRY = {"frame": "RadioFrame",
+             "voltage": {"value": "3.3", "status": "Valid"},
+             "temperature": {"value": "-80", "status": "Too Low"},
+             "mode": {"value": "SAFE", "status": "Too High"}}
+
+
+def make_record(measurement, time, field, value, status="Valid"):
+    record = MagicMock()
+    record.values = {"_measurement": measurement, "_time": time, "_field": field, "_value": value, "status": status}
+    return record
+
+
+class TestFrameSchema(TestCase):
+
+    def test_status_bitmap(self):
+        statuses = {"voltage": "Valid", "temperature": "Too Low", "mode": "Too High", "current": None}
+
+        bitmap = encode_status_bitmap(statuses)
+
+        # fields ordered by name: current (unknown), mode, temperature, voltage
+        self.assertEqual(bitmap, format(0b00011011, "x"))
+        decoded = decode_status_bitmap(bitmap, ["voltage", "temperature", "mode", "current", "observer"])
+        self.assertEqual(decoded, {"current": "Unknown", "mode": "Too High", "temperature": "Too Low",
+                                   "voltage": "Valid"})
+
+    def test_one_point_per_frame(self):
+        points = telemetry_to_frame_points("delfi_pq", "2022-01-01T00:00:00Z", "observer", TELEMETRY)
+
+        self.assertEqual(len(points), 1)
+        self.assertEqual(points[0]["measurement"], "DelfiPqRadioFrame")
+        self.assertEqual(points[0]["tags"], {})
+        fields = points[0]["fields"]
+        self.assertEqual((fields["voltage"], fields["temperature"], fields["mode"]), (3.3, -80.0, "SAFE"))
+        self.assertEqual(fields["observer"], "observer")
+        self.assertEqual(decode_status_bitmap(fields["status_bitmap"], fields)["temperature"], "Too Low")
+
+        self.assertEqual(telemetry_to_frame_points("delfi_pq", "2022-01-01T00:00:00Z", "observer", {}), [])
+
+    def test_bucket(self):
+        self.assertEqual(get_telemetry_bucket("delfi_pq", "downlink", "field"), "delfi_pq_downlink")
+        self.assertEqual(get_telemetry_bucket("delfi_pq", "downlink", "frame"), "delfi_pq_downlink_frames")
+
+    def test_field_records_to_frame_points(self):
+        first = datetime(2022, 1, 1, tzinfo=timezone.utc)
+        second = datetime(2022, 1, 1, 0, 1, tzinfo=timezone.utc)
+        records = [make_record("A", first, "observer", "observer"), make_record("A", first, "voltage", 3.3),
+                   make_record("A", first, "temperature", -80.0, "Too Low"), make_record("A", second, "voltage", 3.2),
+                   make_record("B", first, "mode", "SAFE")]
+
+        points = field_records_to_frame_points(records)
+
+        self.assertEqual([(point["measurement"], point["time"]) for point in points],
+                         [("A", first), ("A", second), ("B", first)])
+        self.assertEqual(points[0]["fields"]["observer"], "observer")
+        self.assertEqual(points[0]["fields"]["voltage"], 3.3)
+        self.assertEqual(decode_status_bitmap(points[0]["fields"]["status_bitmap"], points[0]["fields"]),
+                         {"temperature": "Too Low", "voltage": "Valid"})
+        self.assertNotIn("observer", points[1]["fields"])
+
+    def test_migrate_time_range(self):
+        query_api = MagicMock()
+        write_api = MagicMock()
+        time = datetime(2022, 1, 1, tzinfo=timezone.utc)
+        query_api.query_stream.return_value = iter([make_record("A", time, "voltage", 3.3),
+                                                    make_record("A", time, "current", 0.5)])
+
+        count = migrate_time_range(query_api, write_api, "delfi_pq", "downlink", time, datetime(2022, 1, 2))
+
+        self.assertEqual(count, 1)
+        self.assertIn('from(bucket: "delfi_pq_downlink")', query_api.query_stream.call_args.kwargs["query"])
+        bucket, _, points = write_api.write.call_args.args
+        self.assertEqual(bucket, "delfi_pq_downlink_frames")
+        self.assertEqual(points[0]["fields"]["current"], 0.5)
+
+    @patch("transmission.processing.process_raw_bucket.TELEMETRY_SCHEMA", "frame")
+    @patch("transmission.processing.telemetry_schema.TELEMETRY_SCHEMA", "frame")
+    @patch("transmission.processing.process_raw_bucket.query_api")
+    @patch("transmission.processing.process_raw_bucket.write_api")
+    @patch("transmission.processing.process_raw_bucket.parse_frames")
+    def test_processing_in_frame_schema(self, parse_frames, write_api, _):
+        parse_frames.return_value = [TELEMETRY, TELEMETRY]
+        rows = [{"_time": datetime(2022, 1, 1, 0, minute), "frame": "00", "observer": "observer"} for minute in (0, 1)]
+
+        process_raw_bucket.process_frames_chunk("delfi_pq", "downlink", rows, "observer")
+
+        bucket, _, points = write_api.write.call_args.args
+        self.assertEqual(bucket, "delfi_pq_downlink_frames")
+        # one point per frame
+        self.assertEqual(len(points), 2)
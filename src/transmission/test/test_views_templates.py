@@ -7,8 +7,6 @@ from django.contrib.auth import authenticate, login
 from django.http import HttpRequest, SimpleCookie
 from django.urls import reverse
 from transmission.models import Downlink, Satellite, Uplink
-from transmission.processing.bookkeep_new_data_time_range import combine_time_ranges
-from transmission.processing.satellites import SATELLITES
 from transmission.processing.save_raw_data import store_frames
 from transmission.views import submit_frame, submit_job, modify_scheduler
 
@@ -338,9 +336,6 @@ class TestTableViews(TestCase):
         Satellite.objects.create(sat='delfic3', norad_id=1).save()
 
     def tearDown(self):
-        for sat in SATELLITES:
-            combine_time_ranges(sat, 'uplink')
-            combine_time_ranges(sat, 'downlink')
         self.client.logout()
 
     def test_requested_tables(self):
@@ -398,10 +393,6 @@ class TestSubmitFrames(TestCase):
         Satellite.objects.create(sat='delfic3', norad_id=1).save()
 
     def tearDown(self):
-        for sat in SATELLITES:
-            combine_time_ranges(sat, 'uplink')
-            combine_time_ranges(sat, 'downlink')
-
         self.client.logout()
 
     def test_submit_get_request_not_allowed(self):
@@ -438,6 +429,27 @@ class TestSubmitFrames(TestCase):
 
         self.assertEqual(response.status_code, 400)
 
+    def test_submit_empty_body(self):
+        request_key = self.factory.get(path='members/key/', content_type='application/json')
+
+        user = Member.objects.get(username='user')
+        force_authenticate(request_key, user=user)
+
+        request_key.user = user
+        response_key = generate_key(request_key).content
+
+        for body, content_type in [("", "application/json"), (" \n ", "application/json"),
+                                   ("\n\n", "application/x-ndjson")]:
+            request = self.factory.post(path='submit_frame', data=body, content_type=content_type)
+            request.user = user
+            request.META['HTTP_AUTHORIZATION'] = json.loads(response_key)['generated_key']
+
+            response = submit_frame(request)
+
+            self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(len(Downlink.objects.all()), 0)
+
     def test_submit_frame_is_not_hex(self):
 
         self.assertEqual(len(Downlink.objects.all()), 0)  # downlink table empty
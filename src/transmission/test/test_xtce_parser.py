@@ -0,0 +1,50 @@
+"""Test the bulk frame decoding of the XTCE parser against the per-frame decoding"""
+import json
+
+from django.test import SimpleTestCase, tag
+
+from transmission.processing.XTCEParser import XTCEException, get_parser
+# pylint: disable=all
+
+INVALID_FRAMES = ["8EB49EAA9C88E088988C92A0A26103F000081B015002000300000000000000000000000000000000000000000000",
+                  "8EB49EAA9C88E088988C92A0A26103F000082801500200040093000E00000000AB0078993702FFEDFC10250027FFDDFF8D011A000000000000FFB4"]
+
+
+def decode_frame_by_frame(parser, frames):
+    results = []
+    for frame in frames:
+        try:
+            results.append(parser.processTMFrame(frame))
+        except XTCEException as ex:
+            results.append(ex)
+    return results
+
+
+@tag('XMLRequired')
+class TestBulkDecoder(SimpleTestCase):
+
+    def assertSameResults(self, bulk, single):
+        self.assertEqual(len(bulk), len(single))
+        for bulk_result, single_result in zip(bulk, single):
+            if isinstance(single_result, XTCEException):
+                self.assertIsInstance(bulk_result, XTCEException)
+                self.assertEqual(bulk_result.message, single_result.message)
+            else:
+                self.assertEqual(bulk_result, single_result)
+
+    def test_bulk_decoding_matches_frame_by_frame_decoding(self):
+        with open("delfipq/delfi-pq.txt", encoding="utf-8") as file:
+            frames = [bytes.fromhex(frame["frame"]) for frame in json.load(file)[:500]]
+        frames += [bytes.fromhex(frame) for frame in INVALID_FRAMES]
+        parser = get_parser("delfi_pq")
+
+        bulk = parser.processTMFrames(frames)
+        single = decode_frame_by_frame(parser, frames)
+
+        self.assertSameResults(bulk, single)
+        # the sample contains decodable frames and the invalid frames are reported as errors
+        self.assertTrue(any(isinstance(result, dict) for result in bulk))
+        self.assertTrue(all(isinstance(result, XTCEException) for result in bulk[-len(INVALID_FRAMES):]))
+
+    def test_no_frames(self):
+        self.assertEqual(get_parser("delfi_pq").processTMFrames([]), [])
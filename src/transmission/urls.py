@@ -8,8 +8,12 @@ urlpatterns = [
     path('transmission/<link>/', views.get_frames_table, name='get_frames_table'),
     path('transmission/process-frames/<link>/', views.process, name='process'),
     path('transmission/delete-processed-frames/<link>/', views.delete_processed_frames, name='delete_processed_frames'),
+    path('transmission/export/<link>/', views.export_frames, name='export_frames'),
     # path('TLEs/', views.get_tle_table, name='get_tle_table'),
     path('submit/', csrf_exempt(views.submit_frame), name='submit_frame'),
+    path('submit/async/', csrf_exempt(views.submit_frame_async), name='submit_frame_async'),
+    path('submit/status/<uuid:submission_id>/', views.get_submission_status, name='get_submission_status'),
+    path('telemetry/<satellite>/', views.get_telemetry, name='get_telemetry'),
     path('schedule-job/', views.submit_job, name='submit_job'),
     path('modify-scheduler/<command>/', views.modify_scheduler, name='modify_scheduler'),
 
@@ -1,26 +1,32 @@
 """API request handling. Map requests to the corresponding HTMLs."""
-from datetime import timedelta, datetime
+from datetime import timedelta, datetime, timezone
 from http import HTTPStatus
-import json
 from json.decoder import JSONDecodeError
-from django.core.paginator import Paginator
 from django.forms import ValidationError
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import BadRequest, PermissionDenied
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.http.response import JsonResponse, HttpResponseBadRequest, HttpResponseForbidden
 from django.shortcuts import redirect, render, reverse
 from rest_framework_api_key.permissions import HasAPIKey
 from rest_framework.decorators import permission_classes
+from influxdb_client.client.exceptions import InfluxDBError
+from urllib3.exceptions import HTTPError
 from django_logger import logger
 from members.models import APIKey
 from transmission.forms.forms import SubmitJob
 from transmission.processing.add_dummy_data import add_dummy_downlink_frames
 from transmission.scheduler import Scheduler, schedule_job
-from .models import Uplink, Downlink, TLE
+from .models import Uplink, Downlink, TLE, FrameSubmission
 from .filters import TelemetryDownlinkFilter, TelemetryUplinkFilter, TLEFilter
-from .processing.save_raw_data import process_frames, store_frames
+from .pagination import get_approximate_count, paginate_keyset
+from .processing.api_key_cache import get_submitter_from_api_key
+from .processing.export_frames import EXPORT_CONTENT_TYPES, export_frames_stream, is_export_format_available
+from .processing.save_raw_data import process_frames, store_submission
+from .processing.submissions import queue_submission
+from .processing.telemetry_query import TELEMETRY_CONTENT_TYPES, TELEMETRY_QUERY_DEFAULT_POINTS, \
+    is_telemetry_format_available, parse_query_time, query_telemetry, telemetry_to_arrow, telemetry_to_json
 
 QUERY_ROW_LIMIT = 100
 
@@ -28,7 +34,9 @@ QUERY_ROW_LIMIT = 100
 @permission_classes([HasAPIKey, ])
 def submit_frame(request):  # pylint:disable=R0911
     """Add frames to Uplink/Downlink table. The input is a list of json objects embedded in to the
-    HTTP request."""
+    HTTP request, or one json object per line with the application/x-ndjson content type.
+    The request body can be gzip or zstd compressed (Content-Encoding header).
+    The invalid lines of an NDJSON submission are rejected and listed in the response."""
 
     #  TO DO: Add uplink/downlink identifier in the http request
     api_key_name = ""
@@ -39,20 +47,30 @@ def submit_frame(request):  # pylint:disable=R0911
             # retrieve the user agent (if present, empty otherwise)
             user_agent = request.META.get('HTTP_USER_AGENT', '')
 
-            # search for the username matching the API key
-            api_key_name = APIKey.objects.get_from_key(key)
-            # retrieve the JSON frame just submitted
-            frame_to_add = json.loads(request.body)
-            # add the frame to the database
-            number_of_saved_frames = store_frames(frame_to_add, username=api_key_name, application=user_agent)
+            # search for the member matching the API key (cached)
+            submitter = get_submitter_from_api_key(key)
+            api_key_name = submitter.username
+            # parse the submitted frames (JSON or NDJSON, optionally compressed) one by one
+            # while adding them to the database
+            number_of_saved_frames, rejected_lines = store_submission(
+                request, username=submitter, application=user_agent, content_type=request.content_type,
+                content_encoding=request.META.get("HTTP_CONTENT_ENCODING", ''))
 
             logger.info("%s made a frame submission: %s frames saved.",
                         api_key_name, number_of_saved_frames)
 
-            try:
-                schedule_job("buffer_processing", date=datetime.now() + timedelta(seconds=30))
-            except ValidationError as _:
-                pass
+            if number_of_saved_frames > 0:
+                try:
+                    schedule_job("buffer_processing", date=datetime.now() + timedelta(seconds=30))
+                except ValidationError as _:
+                    pass
+
+            if rejected_lines:
+                status = HTTPStatus.CREATED if number_of_saved_frames > 0 else HTTPStatus.BAD_REQUEST
+                return JsonResponse({"result": "success" if number_of_saved_frames > 0 else "failure",
+                                     "message": f"{number_of_saved_frames} frames saved, invalid lines rejected",
+                                     "errors": rejected_lines},
+                                    status=status)
 
             return JsonResponse({"result": "success",
                                  "message": f"Successful, {number_of_saved_frames} frames saved"},
@@ -102,6 +120,68 @@ def submit_frame(request):  # pylint:disable=R0911
     return JsonResponse({"result": "failure", "message": "Method not allowed"}, status=HTTPStatus.METHOD_NOT_ALLOWED)
 
 
+@permission_classes([HasAPIKey, ])
+def submit_frame_async(request):
+    """Queue a frame submission and acknowledge it immediately. The submission is only
+    authenticated here, the frames are validated and stored by a background job.
+    The response contains the submission id used to query the submission status."""
+
+    if request.method == 'POST':
+        try:
+            key = request.META.get("HTTP_AUTHORIZATION", '')
+            user_agent = request.META.get('HTTP_USER_AGENT', '')
+
+            submitter = get_submitter_from_api_key(key)
+            if len(request.body) == 0:
+                return JsonResponse({"result": "failure", "message": "Empty submission"},
+                                    status=HTTPStatus.BAD_REQUEST)
+
+            submission = queue_submission(submitter, request.body, application=user_agent,
+                                          content_type=request.content_type,
+                                          content_encoding=request.META.get("HTTP_CONTENT_ENCODING", ''))
+            logger.info("%s queued submission %s", submitter.username, submission.id)
+
+            try:
+                schedule_job("submission_processing")
+            except ValidationError as _:
+                pass
+
+            return JsonResponse({"result": "success",
+                                 "message": "Submission queued",
+                                 "submission_id": str(submission.id),
+                                 "status_url": reverse('get_submission_status', args=[submission.id])},
+                                status=HTTPStatus.ACCEPTED)
+
+        except APIKey.DoesNotExist as _:  # pylint:disable=C0103
+            logger.error("API key authentication error during frame submission")
+            return JsonResponse({"result": "failure", "message": "Unauthorized request"},
+                                status=HTTPStatus.UNAUTHORIZED)
+
+    return JsonResponse({"result": "failure", "message": "Method not allowed"}, status=HTTPStatus.METHOD_NOT_ALLOWED)
+
+
+@permission_classes([HasAPIKey, ])
+def get_submission_status(request, submission_id):
+    """Report the processing status of a queued submission of the API key owner."""
+
+    if request.method == 'GET':
+        try:
+            submitter = get_submitter_from_api_key(request.META.get("HTTP_AUTHORIZATION", ''))
+            submission = FrameSubmission.objects.get(id=submission_id, username=submitter.username)
+
+            return JsonResponse({"result": "success", "submission": submission.to_dictionary()})
+
+        except APIKey.DoesNotExist as _:  # pylint:disable=C0103
+            return JsonResponse({"result": "failure", "message": "Unauthorized request"},
+                                status=HTTPStatus.UNAUTHORIZED)
+
+        except FrameSubmission.DoesNotExist as _:  # pylint:disable=C0103
+            return JsonResponse({"result": "failure", "message": "Submission not found"},
+                                status=HTTPStatus.NOT_FOUND)
+
+    return JsonResponse({"result": "failure", "message": "Method not allowed"}, status=HTTPStatus.METHOD_NOT_ALLOWED)
+
+
 def add_dummy_downlink(request):
     """Add dummy frames to Downlink table as admin user."""
 
@@ -148,7 +228,7 @@ def process(request, link):
 
     if link == "uplink" and user.has_perm("transmission.view_uplink"):
         frames = Uplink.objects.all().filter(processed=False)
-        logger.info("%s frames processing triggered: %s frames to process", link, len(frames))
+        logger.info("%s frames processing triggered: %s frames to process", link, frames.count())
 
         processed_frame_count = process_frames(frames, link)
         logger.info("%s %s frames were successfully processed", processed_frame_count, link)
@@ -157,7 +237,7 @@ def process(request, link):
 
     elif link == "downlink" and user.has_perm("transmission.view_downlink"):
         frames = Downlink.objects.all().filter(processed=False)
-        logger.info("%s frames processing triggered: %s frames to process", link, len(frames))
+        logger.info("%s frames processing triggered: %s frames to process", link, frames.count())
 
         processed_frame_count = process_frames(frames, link)
         logger.info("%s %s frames were successfully processed", processed_frame_count, link)
@@ -171,15 +251,23 @@ def process(request, link):
     return redirect('get_frames_table', link)
 
 
+def paginate_table(request, table_filter, key_field):
+    """Keyset paginates a filtered table on (key_field, id) using the after/before cursors of the request.
+    The rows are only counted if requested (count=1)."""
+
+    return paginate_keyset(table_filter.qs, key_field, QUERY_ROW_LIMIT,
+                           after=request.GET.get('after'), before=request.GET.get('before'),
+                           with_count=request.GET.get('count') == '1')
+
+
 def paginate_telemetry_table(request, telemetry_filter, table_name):
     """Paginates a telemetry table and renders the filtering form"""
 
-    data = telemetry_filter.qs
-    paginator = Paginator(data, QUERY_ROW_LIMIT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate_table(request, telemetry_filter, 'timestamp')
+    approximate_count = get_approximate_count(telemetry_filter.qs) if page_obj.count is None else None
 
-    context = {'telemetry_filter': telemetry_filter, 'page_obj': page_obj, 'table_name': table_name}
+    context = {'telemetry_filter': telemetry_filter, 'page_obj': page_obj, 'table_name': table_name,
+               'approximate_count': approximate_count, 'parquet_export': is_export_format_available('parquet')}
     return render(request, "transmission/table.html", context)
 
 @login_required(login_url='/login')
@@ -203,6 +291,72 @@ def get_frames_table(request, link):
     return HttpResponseForbidden()
 
 
+@login_required(login_url='/login')
+def export_frames(request, link):
+    """Stream the uplink/downlink frames matching the table filters as CSV, NDJSON or Parquet (format parameter)"""
+
+    export_format = request.GET.get('format', 'csv')
+    if request.method != "GET" or link not in ['uplink', 'downlink'] or export_format not in EXPORT_CONTENT_TYPES:
+        return HttpResponseBadRequest()
+
+    if not is_export_format_available(export_format):
+        return HttpResponseBadRequest(f"{export_format} export is not available on this server.")
+
+    if link == "downlink" and request.user.has_perm('transmission.view_downlink'):
+        frames = TelemetryDownlinkFilter(request.GET, queryset=Downlink.objects.all().order_by('timestamp', 'id')).qs
+    elif link == "uplink" and request.user.has_perm('transmission.view_uplink'):
+        frames = TelemetryUplinkFilter(request.GET, queryset=Uplink.objects.all().order_by('timestamp', 'id')).qs
+    else:
+        logger.warning("%s was denied permission to export uplink or downlink frames.", request.user)
+        return HttpResponseForbidden()
+
+    logger.info("%s exported %s frames as %s", request.user, link, export_format)
+    response = StreamingHttpResponse(export_frames_stream(frames, link, export_format),
+                                     content_type=EXPORT_CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{link}_frames.{export_format}"'
+    return response
+
+
+def get_telemetry(request, satellite):
+    """Return processed telemetry parameters of a satellite downsampled by influxdb, as columnar JSON or Arrow.
+    GET parameters: parameters (comma separated), start and stop (ISO 8601, stop defaults to now),
+    points (maximum number of points per parameter), aggregate (mean, min, max, ...),
+    link (downlink or uplink) and format (json or arrow)."""
+
+    if request.method != "GET":
+        return JsonResponse({"result": "failure", "message": "Method not allowed"},
+                            status=HTTPStatus.METHOD_NOT_ALLOWED)
+
+    result_format = request.GET.get('format', 'json')
+    try:
+        if not is_telemetry_format_available(result_format):
+            raise BadRequest(f"Format {result_format} is not available")
+
+        parameters = [parameter for parameter in request.GET.get('parameters', '').split(",") if parameter]
+        start = parse_query_time(request.GET.get('start'))
+        stop = parse_query_time(request.GET.get('stop'), default=datetime.now(timezone.utc))
+        try:
+            points = int(request.GET.get('points', TELEMETRY_QUERY_DEFAULT_POINTS))
+        except ValueError as ex:
+            raise BadRequest("Invalid number of points") from ex
+
+        result = query_telemetry(satellite, parameters, start, stop, points=points,
+                                 aggregate=request.GET.get('aggregate', 'mean'),
+                                 link=request.GET.get('link', 'downlink'))
+
+    except BadRequest as ex:
+        return JsonResponse({"result": "failure", "message": str(ex)}, status=HTTPStatus.BAD_REQUEST)
+
+    except (InfluxDBError, HTTPError) as ex:
+        logger.error("%s: telemetry query failed: %s", satellite, ex)
+        return JsonResponse({"result": "failure", "message": "Telemetry query failed"},
+                            status=HTTPStatus.BAD_GATEWAY)
+
+    if result_format == "arrow":
+        return HttpResponse(telemetry_to_arrow(result), content_type=TELEMETRY_CONTENT_TYPES["arrow"])
+    return JsonResponse({"result": "success", "telemetry": telemetry_to_json(result)})
+
+
 def get_tle_table(request):
     """Queries and filters the TLEs table"""
     if request.method != "GET":
@@ -211,10 +365,7 @@ def get_tle_table(request):
     frames = TLE.objects.all().order_by('valid_from')
     tle_filter = TLEFilter(request.GET, queryset=frames)
 
-    data = tle_filter.qs
-    paginator = Paginator(data, QUERY_ROW_LIMIT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate_table(request, tle_filter, 'valid_from')
 
     context = {'telemetry_filter': tle_filter, 'page_obj': page_obj, 'table_name': 'TLE'}
     return render(request, "transmission/tle_table.html", context)
@@ -268,9 +419,10 @@ def submit_job(request):
             link = form_data["link"]
             date = form_data["datetime"]
             interval = form_data["interval"]
+            restart = form_data["restart"]
 
             try:
-                schedule_job(job_type, sat, link, date, interval)
+                schedule_job(job_type, sat, link, date, interval, restart)
                 messages.info(request, f"{sat} {job_type} {form_data['link']} submitted")
 
             except ValidationError as exception: